@@ -1,13 +1,28 @@
+import asyncio
+import logging
 import os
+import time
 import uuid
-import requests
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
+import httpx
 from fastapi import HTTPException, Request, status
 from fastapi.responses import JSONResponse
 from models import User, UserSession, SessionData
 
-# Emergent Auth URL
-EMERGENT_AUTH_URL = "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data"
+logger = logging.getLogger(__name__)
+
+# Emergent Auth URL (point it at auth_stub_server.py for local testing)
+EMERGENT_AUTH_URL = os.environ.get(
+    "EMERGENT_AUTH_URL",
+    "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data"
+)
+AUTH_HTTP_TIMEOUT = float(os.environ.get("AUTH_HTTP_TIMEOUT", 10))  # seconds per attempt
+AUTH_HTTP_RETRIES = int(os.environ.get("AUTH_HTTP_RETRIES", 2))  # extra attempts on errors and 5xx
+AUTH_HTTP_RETRY_DELAY = float(os.environ.get("AUTH_HTTP_RETRY_DELAY", 0.5))  # seconds, doubled per retry
+
+# Shared keep-alive client for the auth service
+_http_client = None
 
 # Database will be passed from server.py
 db = None
@@ -17,70 +32,139 @@ def set_database(database):
     global db
     db = database
 
+# Authenticated sessions: token -> (User, cache expiry as epoch seconds), least recently used first
+AUTH_CACHE_SIZE = int(os.environ.get("AUTH_CACHE_SIZE", 1024))
+AUTH_CACHE_TTL = float(os.environ.get("AUTH_CACHE_TTL", 300))  # seconds
+_session_cache = OrderedDict()
+
+def _cached_user(session_token: str):
+    """Cached user of a session token, or None"""
+    entry = _session_cache.get(session_token)
+    if entry is None:
+        return None
+    user, expires = entry
+    if expires <= time.time():
+        del _session_cache[session_token]
+        return None
+    _session_cache.move_to_end(session_token)
+    return user
+
+def _cache_user(session_token: str, user: User, session_expires_at: datetime):
+    """Remember a validated session until the TTL or the session expiry"""
+    if AUTH_CACHE_SIZE <= 0:
+        return
+    _session_cache[session_token] = (user, min(time.time() + AUTH_CACHE_TTL, session_expires_at.timestamp()))
+    _session_cache.move_to_end(session_token)
+    while len(_session_cache) > AUTH_CACHE_SIZE:
+        _session_cache.popitem(last=False)
+
+def invalidate_session_cache(session_token: str = None):
+    """Forget a cached session (all sessions if no token is given)"""
+    if session_token is None:
+        _session_cache.clear()
+    else:
+        _session_cache.pop(session_token, None)
+
+def _get_http_client():
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=AUTH_HTTP_TIMEOUT)
+    return _http_client
+
+async def close_http_client():
+    """Close the auth service client (on shutdown)"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+async def fetch_session_data(session_id: str) -> httpx.Response:
+    """
+    Exchange a session_id with Emergent Auth without blocking the event loop.
+    Connection errors, timeouts and 5xx answers are retried AUTH_HTTP_RETRIES
+    times; raises 503 if every attempt failed.
+    """
+    error = None
+    for attempt in range(AUTH_HTTP_RETRIES + 1):
+        if attempt:
+            await asyncio.sleep(AUTH_HTTP_RETRY_DELAY * 2 ** (attempt - 1))
+        try:
+            response = await _get_http_client().get(EMERGENT_AUTH_URL, headers={"X-Session-ID": session_id})
+        except httpx.HTTPError as e:
+            error = f"{type(e).__name__}: {e}"
+        else:
+            if response.status_code < 500:
+                return response
+            error = f"HTTP {response.status_code}"
+        logger.warning(f"Auth service attempt {attempt + 1} failed: {error}")
+    
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f"Auth service unavailable: {error}"
+    )
+
 async def process_google_session(session_id: str) -> SessionData:
     """
     Process session_id from Emergent Google OAuth and create user session.
     """
+    # Get user data from Emergent Auth
+    response = await fetch_session_data(session_id)
+    
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid session ID"
+        )
+    
     try:
-        # Get user data from Emergent Auth
-        headers = {"X-Session-ID": session_id}
-        response = requests.get(EMERGENT_AUTH_URL, headers=headers, timeout=10)
-        
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid session ID"
-            )
-        
         user_data = response.json()
-        user_id = user_data.get("id")
-        email = user_data.get("email")
-        name = user_data.get("name")
-        picture = user_data.get("picture")
-        
-        if not user_id or not email:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid user data from auth service"
-            )
-        
-        # Check if user exists, if not create
-        existing_user = await db.users.find_one({"_id": user_id})
-        if not existing_user:
-            user = User(
-                id=user_id,
-                email=email,
-                name=name,
-                picture=picture
-            )
-            await db.users.insert_one(user.dict(by_alias=True))
-        
-        # Create new session token
-        session_token = f"session_{uuid.uuid4().hex}"
-        expires_at = datetime.now(timezone.utc) + timedelta(days=7)
-        
-        session = UserSession(
-            id=f"sess_{uuid.uuid4().hex}",
-            user_id=user_id,
-            session_token=session_token,
-            expires_at=expires_at
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Auth service returned invalid data"
+        )
+    user_id = user_data.get("id")
+    email = user_data.get("email")
+    name = user_data.get("name")
+    picture = user_data.get("picture")
+    
+    if not user_id or not email:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid user data from auth service"
         )
-        
-        await db.user_sessions.insert_one(session.dict(by_alias=True))
-        
-        return SessionData(
+    
+    # Check if user exists, if not create
+    existing_user = await db.users.find_one({"_id": user_id})
+    if not existing_user:
+        user = User(
             id=user_id,
             email=email,
             name=name,
-            picture=picture,
-            session_token=session_token
-        )
-        
-    except requests.RequestException as e:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail=f"Auth service unavailable: {str(e)}"
+            picture=picture
         )
+        await db.users.insert_one(user.dict(by_alias=True))
+    
+    # Create new session token
+    session_token = f"session_{uuid.uuid4().hex}"
+    expires_at = datetime.now(timezone.utc) + timedelta(days=7)
+    
+    session = UserSession(
+        id=f"sess_{uuid.uuid4().hex}",
+        user_id=user_id,
+        session_token=session_token,
+        expires_at=expires_at
+    )
+    
+    await db.user_sessions.insert_one(session.dict(by_alias=True))
+    
+    return SessionData(
+        id=user_id,
+        email=email,
+        name=name,
+        picture=picture,
+        session_token=session_token
+    )
 
 async def get_current_user(request: Request) -> User:
     """
@@ -102,6 +186,11 @@ async def get_current_user(request: Request) -> User:
             detail="Not authenticated"
         )
     
+    # Sessions validated recently skip the database
+    user = _cached_user(session_token)
+    if user is not None:
+        return user
+    
     # Find session
     session = await db.user_sessions.find_one({"session_token": session_token})
     if not session:
@@ -116,6 +205,7 @@ async def get_current_user(request: Request) -> User:
         expires_at = expires_at.replace(tzinfo=timezone.utc)
     
     if expires_at < datetime.now(timezone.utc):
+        invalidate_session_cache(session_token)
         await db.user_sessions.delete_one({"_id": session["_id"]})
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -130,12 +220,15 @@ async def get_current_user(request: Request) -> User:
             detail="User not found"
         )
     
-    return User(**user_doc)
+    user = User(**user_doc)
+    _cache_user(session_token, user, expires_at)
+    return user
 
 async def logout_user(session_token: str):
     """
     Logout user by deleting session.
     """
+    invalidate_session_cache(session_token)
     result = await db.user_sessions.delete_one({"session_token": session_token})
     if result.deleted_count == 0:
         raise HTTPException(
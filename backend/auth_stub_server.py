@@ -0,0 +1,58 @@
+"""
+Local stand-in for the Emergent Auth session-data endpoint
+
+Run it and point the backend at it to test Google login without the real
+service:
+    python auth_stub_server.py --port 8099
+    EMERGENT_AUTH_URL=http://127.0.0.1:8099/auth/v1/env/oauth/session-data
+
+Any X-Session-ID returns a user derived from it, except these prefixes:
+    invalid-...  401 (rejected session)
+    error-...    500 (retried by the backend)
+    slow-...     answers after --delay seconds (exercises the timeout)
+"""
+import argparse
+import asyncio
+import hashlib
+
+import uvicorn
+from fastapi import FastAPI, Header
+from fastapi.responses import JSONResponse
+
+def create_app(delay: float = 15.0):
+    """Stub auth app; delay is used for slow-... session ids"""
+    app = FastAPI(title="Auth stub")
+    app.state.requests = 0
+
+    @app.get("/auth/v1/env/oauth/session-data")
+    async def session_data(x_session_id: str = Header(None)):
+        app.state.requests += 1
+        if not x_session_id or x_session_id.startswith("invalid-"):
+            return JSONResponse(status_code=401, content={"detail": "Invalid session"})
+        if x_session_id.startswith("error-"):
+            return JSONResponse(status_code=500, content={"detail": "Stub failure"})
+        if x_session_id.startswith("slow-"):
+            await asyncio.sleep(delay)
+
+        user_id = "stub_" + hashlib.sha1(x_session_id.encode()).hexdigest()[:12]
+        return {
+            "id": user_id,
+            "email": f"{user_id}@stub.local",
+            "name": f"Stub User {user_id[-4:]}",
+            "picture": None,
+            "session_token": f"stub_session_{user_id}"
+        }
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Emergent Auth server for local testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--delay", type=float, default=15.0, help="seconds before answering slow-... sessions")
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args.delay), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
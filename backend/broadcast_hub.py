@@ -0,0 +1,376 @@
+"""
+WebSocket broadcast hub
+Streams a dashboard snapshot and batched deltas without blocking the tracker
+"""
+import asyncio
+import json
+import logging
+import os
+import uuid
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+SLOW_CLIENT_POLICIES = ('coalesce', 'drop')
+
+# Version of the snapshot/delta message format
+PROTOCOL_VERSION = 1
+
+def _json_default(value):
+    """Serialize datetimes (and anything else) found in documents"""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+def _dumps(message: dict):
+    return json.dumps(message, default=_json_default)
+
+def _merge_delta(target: dict, frame: dict):
+    """Fold a later delta frame into an earlier one"""
+    target['seq'] = frame['seq']
+    cabins = {cabin['cabin_no']: cabin for cabin in target.get('cabins', [])}
+    for cabin in frame.get('cabins', []):
+        cabins.setdefault(cabin['cabin_no'], {}).update(cabin)
+    for cabin_no in frame.get('removed_cabins', []):
+        cabins.pop(cabin_no, None)
+    if cabins:
+        target['cabins'] = list(cabins.values())
+    if frame.get('removed_cabins'):
+        target['removed_cabins'] = sorted(set(target.get('removed_cabins', [])) | set(frame['removed_cabins']))
+    if 'stats' in frame:
+        target['stats'] = frame['stats']
+    if frame.get('alerts'):
+        target['alerts'] = target.get('alerts', []) + frame['alerts']
+    if frame.get('resolved_alerts'):
+        target['resolved_alerts'] = target.get('resolved_alerts', []) + frame['resolved_alerts']
+    if frame.get('sessions'):
+        target['sessions'] = target.get('sessions', 0) + frame['sessions']
+    if frame.get('report_jobs'):
+        jobs = {job['id']: job for job in target.get('report_jobs', [])}
+        jobs.update((job['id'], job) for job in frame['report_jobs'])
+        target['report_jobs'] = list(jobs.values())
+
+class _Client:
+    """Outbound state of one WebSocket connection"""
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.outbox = deque()  # (seq or None, message text)
+        self.wakeup = asyncio.Event()
+        self.merged = None  # coalesced delta waiting for outbox space
+        self.needs_snapshot = True
+        self.writer = None
+
+class BroadcastHub:
+    """
+    Stream dashboard state to WebSocket clients.
+
+    A new client first gets a snapshot (cabins, stats, active alerts) with
+    the sequence number current when its read started. Changes published in
+    between are collected and sent once per tick as a single delta frame
+    with the next sequence number. Frames flushed while a snapshot is read
+    follow it and may repeat changes it already holds; clients merge cabins
+    and stats and skip alerts whose id they know. The last frames are kept
+    in a ring buffer, so a client that reconnects with
+    ?since=<seq>&epoch=<epoch> only receives what it missed; otherwise it
+    gets a new snapshot.
+
+    Publishing never awaits. Every client has a bounded outbox and its own
+    writer task, so a slow browser only delays itself. When an outbox is
+    full the slow client policy applies: 'coalesce' folds further frames
+    into one merged delta sent once there is room, 'drop' discards them and
+    sends the client a fresh snapshot instead.
+    """
+
+    def __init__(self):
+        self.queue_size = int(os.environ.get('WS_CLIENT_QUEUE_SIZE', 256))
+        self.send_timeout = float(os.environ.get('WS_SEND_TIMEOUT', 10))  # seconds
+        self.tick_interval = float(os.environ.get('WS_TICK_INTERVAL', 1))  # seconds
+        self.policy = os.environ.get('WS_SLOW_CLIENT_POLICY', 'coalesce')
+        if self.policy not in SLOW_CLIENT_POLICIES:
+            logger.warning(f"Unknown WS_SLOW_CLIENT_POLICY '{self.policy}', using 'coalesce'")
+            self.policy = 'coalesce'
+
+        # Sequence numbers restart with the process, the epoch tells them apart
+        self.epoch = uuid.uuid4().hex[:12]
+        self._seq = 0
+        self._history = deque(maxlen=int(os.environ.get('WS_RESUME_BUFFER', 300)))
+
+        self._clients = {}  # websocket -> _Client
+        self._cabins = {}  # cabin_no -> fields as last broadcast
+        self._stats = None  # stats as last broadcast
+        self._snapshot_provider = None
+        self._stats_provider = None
+        self._tick_task = None
+        self._reset_tick()
+
+        self._sent = 0
+        self._dropped = 0
+        self._coalesced = 0
+        self._snapshots = 0
+
+    def set_providers(self, snapshot, stats):
+        """
+        snapshot: async () -> {'cabins': [...], 'stats': {...}, 'alerts': [...]}
+        stats: async () -> stats dict
+        """
+        self._snapshot_provider = snapshot
+        self._stats_provider = stats
+
+    def start(self):
+        """Start sending one delta frame per tick"""
+        if self._tick_task is None:
+            self._tick_task = asyncio.create_task(self._tick_loop())
+
+    async def stop(self):
+        """Stop the tick loop and all client writers"""
+        if self._tick_task:
+            self._tick_task.cancel()
+            try:
+                await self._tick_task
+            except asyncio.CancelledError:
+                pass
+            self._tick_task = None
+        for websocket in list(self._clients):
+            self.disconnect(websocket)
+
+    def __len__(self):
+        return len(self._clients)
+
+    def stats(self):
+        """Client and message counters"""
+        return {
+            'clients': len(self._clients),
+            'policy': self.policy,
+            'seq': self._seq,
+            'sent': self._sent,
+            'snapshots': self._snapshots,
+            'dropped': self._dropped,
+            'coalesced': self._coalesced
+        }
+
+    # ----- Clients -----
+
+    def connect(self, websocket, since: int = None, epoch: str = None):
+        """
+        Register an accepted WebSocket and start its writer
+        since/epoch: last sequence number the client applied, to resume
+        """
+        client = _Client(websocket)
+        self._clients[websocket] = client
+
+        if since is not None and epoch == self.epoch:
+            missed = [item for item in self._history if item[0] > since]
+            oldest = self._history[0][0] if self._history else self._seq + 1
+            # Resume only if nothing between since and the buffer was lost
+            if since == self._seq or (oldest <= since + 1 and len(missed) <= self.queue_size):
+                client.outbox.extend(missed)
+                client.needs_snapshot = False
+
+        client.writer = asyncio.create_task(self._writer(client))
+
+    def disconnect(self, websocket):
+        """Forget a WebSocket and stop its writer"""
+        client = self._clients.pop(websocket, None)
+        if client and client.writer and client.writer is not asyncio.current_task():
+            client.writer.cancel()
+
+    def send(self, websocket, message: dict):
+        """Queue a message for one client (e.g. a heartbeat reply)"""
+        client = self._clients.get(websocket)
+        if client:
+            if len(client.outbox) >= self.queue_size:
+                self._dropped += 1
+                return
+            client.outbox.append((None, _dumps(message)))
+            client.wakeup.set()
+
+    def resync_all(self):
+        """Send every client a fresh snapshot (e.g. after a reset)"""
+        self._cabins = {}
+        self._stats = None
+        self._reset_tick()
+        for client in self._clients.values():
+            client.outbox.clear()
+            client.merged = None
+            client.needs_snapshot = True
+            client.wakeup.set()
+
+    # ----- Publishing (collected until the next tick) -----
+
+    def publish_cabin(self, cabin_data: dict):
+        """
+        Add the fields of a cabin that changed since the last broadcast
+        Returns: the changed fields (empty if nothing changed)
+        """
+        cabin_no = cabin_data['cabin_no']
+        last = self._cabins.get(cabin_no, {})
+        changed = {key: value for key, value in cabin_data.items()
+                   if key not in last or last[key] != value}
+        if not changed:
+            return {}
+
+        self._cabins[cabin_no] = {**last, **changed}
+        self._tick['cabins'].setdefault(cabin_no, {'cabin_no': cabin_no}).update(changed)
+        self._tick['removed_cabins'].discard(cabin_no)
+        return changed
+
+    def forget_cabin(self, cabin_no: int):
+        """Tell clients a cabin was removed"""
+        self._cabins.pop(cabin_no, None)
+        self._tick['cabins'].pop(cabin_no, None)
+        self._tick['removed_cabins'].add(cabin_no)
+
+    def publish_alert(self, alert: dict):
+        """Add a newly created alert"""
+        self._tick['alerts'].append(alert)
+
+    def resolve_alerts(self, cabin_no: int, alert_type: str):
+        """Tell clients that a cabin's alerts of a type were resolved"""
+        self._tick['resolved_alerts'].append({'cabin_no': cabin_no, 'type': alert_type})
+
+    def publish_session(self):
+        """Note that a session was recorded (stats and charts change)"""
+        self._tick['sessions'] += 1
+
+    def publish_report_job(self, job: dict):
+        """Add the latest state of a report rendering job"""
+        self._tick['report_jobs'][job['id']] = job
+
+    # ----- Tick -----
+
+    def _reset_tick(self):
+        self._tick = {
+            'cabins': {},
+            'removed_cabins': set(),
+            'alerts': [],
+            'resolved_alerts': [],
+            'sessions': 0,
+            'report_jobs': {}
+        }
+
+    async def _tick_loop(self):
+        while True:
+            await asyncio.sleep(self.tick_interval)
+            try:
+                await self.flush_tick()
+            except Exception as e:
+                logger.error(f"Error sending WebSocket delta: {e}")
+
+    async def flush_tick(self):
+        """Turn the changes collected since the last tick into one delta frame"""
+        tick = self._tick
+        self._reset_tick()
+
+        frame = {}
+        if tick['cabins']:
+            frame['cabins'] = list(tick['cabins'].values())
+        if tick['removed_cabins']:
+            frame['removed_cabins'] = sorted(tick['removed_cabins'])
+        if tick['alerts']:
+            frame['alerts'] = tick['alerts']
+        if tick['resolved_alerts']:
+            frame['resolved_alerts'] = tick['resolved_alerts']
+        if tick['sessions']:
+            frame['sessions'] = tick['sessions']
+        if tick['report_jobs']:
+            frame['report_jobs'] = list(tick['report_jobs'].values())
+
+        # Stats only change with cabins or sessions
+        if self._stats_provider and (frame.get('cabins') or frame.get('removed_cabins') or tick['sessions']):
+            stats = await self._stats_provider()
+            if stats != self._stats:
+                self._stats = stats
+                frame['stats'] = stats
+
+        if not frame:
+            return None
+
+        self._seq += 1
+        frame = {'type': 'delta', 'seq': self._seq, **frame}
+        message = _dumps(frame)
+        self._history.append((self._seq, message))
+
+        for client in list(self._clients.values()):
+            self._offer(client, frame, message)
+        return frame
+
+    def _offer(self, client: _Client, frame: dict, message: str):
+        if client.needs_snapshot:
+            # The coming snapshot will include this frame
+            return
+
+        # Once frames are being merged, later ones are merged too so the
+        # client never sees an older state after a newer one
+        if client.merged is None and len(client.outbox) < self.queue_size:
+            client.outbox.append((frame['seq'], message))
+            client.wakeup.set()
+            return
+
+        if self.policy == 'coalesce':
+            if client.merged is None:
+                client.merged = json.loads(message)
+            else:
+                _merge_delta(client.merged, frame)
+            self._coalesced += 1
+        else:
+            client.outbox.clear()
+            client.needs_snapshot = True
+            self._dropped += 1
+        client.wakeup.set()
+
+    # ----- Writer -----
+
+    async def _snapshot_message(self, seq: int):
+        data = await self._snapshot_provider() if self._snapshot_provider else {}
+        self._snapshots += 1
+        return _dumps({
+            'type': 'snapshot',
+            'version': PROTOCOL_VERSION,
+            'epoch': self.epoch,
+            'seq': seq,
+            **data
+        })
+
+    async def _next_message(self, client: _Client):
+        while True:
+            if client.needs_snapshot:
+                # Frames flushed while the provider is awaited are queued
+                # behind the snapshot; a change it already holds is applied twice
+                client.needs_snapshot = False
+                seq = self._seq
+                message = await self._snapshot_message(seq)
+                if client.needs_snapshot:
+                    # Dropped or resynced during the read
+                    continue
+                # Frames up to the snapshot's sequence number are included in it
+                kept = [item for item in client.outbox if item[0] is None or item[0] > seq]
+                client.outbox.clear()
+                client.outbox.extend(kept)
+                return message
+            if client.outbox:
+                return client.outbox.popleft()[1]
+            if client.merged is not None:
+                merged, client.merged = client.merged, None
+                return _dumps(merged)
+            client.wakeup.clear()
+            await client.wakeup.wait()
+
+    async def _writer(self, client: _Client):
+        try:
+            while True:
+                message = await self._next_message(client)
+                await asyncio.wait_for(client.websocket.send_text(message), self.send_timeout)
+                self._sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"Closing WebSocket client: {e!r}")
+            self.disconnect(client.websocket)
+            try:
+                await client.websocket.close()
+            except Exception:
+                pass
+
+# Global broadcast hub instance
+broadcast_hub = BroadcastHub()
@@ -0,0 +1,223 @@
+"""
+In-memory cabin state store
+Authoritative copy of all cabins, shared by the tracker and the API
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# MongoDB database instance (will be set from server.py)
+db = None
+
+def set_database(database):
+    """Set the database instance from server.py"""
+    global db
+    db = database
+
+# Fields whose change alone is only written once it exceeds the granularity
+TIME_FIELDS = ('last_activity', 'updated_at', 'current_session_duration')
+
+def _within_granularity(old, new, granularity: float):
+    """True if a time field moved by less than the granularity (seconds)"""
+    if isinstance(old, datetime) and isinstance(new, datetime):
+        if old.tzinfo is None:
+            old = old.replace(tzinfo=timezone.utc)
+        if new.tzinfo is None:
+            new = new.replace(tzinfo=timezone.utc)
+        return abs((new - old).total_seconds()) < granularity
+    if isinstance(old, (int, float)) and isinstance(new, (int, float)):
+        return abs(new - old) < granularity
+    return old == new
+
+class CabinStore:
+    """
+    Keeps every cabin document in memory, keyed by cabin_no.
+
+    The store is loaded once at startup and every change goes through it,
+    so reads never touch storage. All cabin changes must use this store
+    (not db.cabins directly) while the server runs.
+
+    Changes are written through by default. Tracker updates use
+    write_behind: they are buffered per cabin and flushed in one bulk write
+    per flush_interval. A buffered change that only moves time fields by
+    less than timestamp_granularity is held back until it grows past it.
+    """
+
+    def __init__(self):
+        self._cabins = {}  # cabin_no -> cabin document
+        self._persisted = {}  # cabin_no -> cabin as last written to the database
+        self._pending = {}  # cabin_no -> buffered $set fields
+        self._flush_task = None
+
+        self.flush_interval = float(os.environ.get('CABIN_FLUSH_INTERVAL', 5))  # seconds
+        self.timestamp_granularity = float(os.environ.get('CABIN_TIMESTAMP_GRANULARITY', 60))  # seconds
+        self._update_count = 0
+        self._write_count = 0
+
+    async def load(self):
+        """Load all cabins from the database"""
+        cabins = await db.cabins.find().to_list(None)
+        self._cabins = {cabin['cabin_no']: cabin for cabin in cabins}
+        self._persisted = {cabin['cabin_no']: dict(cabin) for cabin in cabins}
+        self._pending = {}
+        logger.info(f"Cabin store loaded {len(self._cabins)} cabins")
+
+    def start(self):
+        """Start the periodic write-behind flush"""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the flush loop and write everything still buffered"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush(force=True)
+
+    def get(self, cabin_no: int):
+        """Return a copy of the cabin document, or None"""
+        cabin = self._cabins.get(cabin_no)
+        return dict(cabin) if cabin is not None else None
+
+    def all(self):
+        """Return copies of all cabins sorted by cabin_no"""
+        return [dict(self._cabins[cabin_no]) for cabin_no in sorted(self._cabins)]
+
+    def __len__(self):
+        return len(self._cabins)
+
+    def stats(self):
+        """Update and write counters"""
+        return {
+            'updates': self._update_count,
+            'writes': self._write_count,
+            'pending': len(self._pending)
+        }
+
+    async def insert(self, cabin: dict):
+        """Add a new cabin"""
+        await db.cabins.insert_one(dict(cabin))
+        self._cabins[cabin['cabin_no']] = dict(cabin)
+        self._persisted[cabin['cabin_no']] = dict(cabin)
+        self._write_count += 1
+
+    async def update(self, cabin_no: int, fields: dict, write_behind: bool = False):
+        """
+        Apply a $set of fields to a cabin
+        Returns: the updated cabin (copy), or None if it does not exist
+        """
+        cabin = self._cabins.get(cabin_no)
+        if cabin is None:
+            return None
+
+        cabin.update(fields)
+        self._update_count += 1
+
+        if write_behind:
+            self._pending.setdefault(cabin_no, {}).update(fields)
+            return dict(cabin)
+
+        # Write through, together with anything still buffered for the cabin
+        fields = {**self._pending.pop(cabin_no, {}), **fields}
+        await db.cabins.update_one(self._db_filter(cabin), {'$set': fields})
+        self._persisted.setdefault(cabin_no, {}).update(fields)
+        self._write_count += 1
+        return dict(cabin)
+
+    async def delete(self, cabin_no: int):
+        """Remove a cabin, returns True if it existed"""
+        cabin = self._cabins.pop(cabin_no, None)
+        self._pending.pop(cabin_no, None)
+        self._persisted.pop(cabin_no, None)
+        if cabin is None:
+            return False
+
+        await db.cabins.delete_one(self._db_filter(cabin))
+        self._write_count += 1
+        return True
+
+    async def clear(self):
+        """Remove all cabins, returns how many were removed"""
+        count = len(self._cabins)
+        self._cabins = {}
+        self._pending = {}
+        self._persisted = {}
+        await db.cabins.delete_many({})
+        self._write_count += 1
+        return count
+
+    async def flush(self, force: bool = False):
+        """
+        Write buffered changes in one bulk write
+        force: also write changes below the timestamp granularity
+        Returns: number of cabins written
+        """
+        flushed = {}
+        operations = []
+        for cabin_no, fields in list(self._pending.items()):
+            changes = self._effective_changes(cabin_no, fields)
+            if not changes:
+                # Nothing differs from what is stored
+                del self._pending[cabin_no]
+                continue
+            if not force and self._only_small_time_changes(cabin_no, changes):
+                continue
+
+            del self._pending[cabin_no]
+            flushed[cabin_no] = changes
+            operations.append(UpdateOne(self._db_filter(self._cabins[cabin_no]), {'$set': changes}))
+
+        if not operations:
+            return 0
+
+        try:
+            await db.cabins.bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.error(f"Error flushing cabin updates: {e}")
+            # Keep the changes for the next flush (newer updates win)
+            for cabin_no, changes in flushed.items():
+                self._pending[cabin_no] = {**changes, **self._pending.get(cabin_no, {})}
+            return 0
+
+        for cabin_no, changes in flushed.items():
+            self._persisted.setdefault(cabin_no, {}).update(changes)
+        self._write_count += 1
+        return len(operations)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error in cabin flush loop: {e}")
+
+    def _effective_changes(self, cabin_no: int, fields: dict):
+        """Buffered fields whose value differs from the stored one"""
+        persisted = self._persisted.get(cabin_no, {})
+        return {key: value for key, value in fields.items()
+                if key not in persisted or persisted[key] != value}
+
+    def _only_small_time_changes(self, cabin_no: int, changes: dict):
+        persisted = self._persisted.get(cabin_no, {})
+        return all(
+            key in TIME_FIELDS and _within_granularity(persisted.get(key), value, self.timestamp_granularity)
+            for key, value in changes.items()
+        )
+
+    def _db_filter(self, cabin: dict):
+        # _id lookups avoid a collection scan under Mongita
+        if cabin.get('_id'):
+            return {'_id': cabin['_id']}
+        return {'cabin_no': cabin['cabin_no']}
+
+# Global cabin store instance
+cabin_store = CabinStore()
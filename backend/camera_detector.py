@@ -2,14 +2,56 @@
 Real-time camera-based detection system
 Analyzes ESP32-CAM images to detect if cabin is occupied
 """
+import os
+import asyncio
+from urllib.parse import urlsplit
 import cv2
+import httpx
 import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import EmptyPoolError
 from datetime import datetime, timezone
 import logging
 
 logger = logging.getLogger(__name__)
 
+# JPEG decode flags for reduced-resolution grayscale decoding (1 = full size, color)
+REDUCED_GRAYSCALE_FLAGS = {
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+# Motion detection engines selectable per cabin
+MOTION_ENGINES = ('frame_diff', 'running_average', 'mog2')
+
+def _bounded_wait_pool(pool_class, pool_timeout: float):
+    """Connection pool class that waits at most pool_timeout for a free connection"""
+    class BoundedWaitPool(pool_class):
+        def _get_conn(self, timeout=None):
+            return super()._get_conn(pool_timeout if timeout is None else timeout)
+    return BoundedWaitPool
+
+class _CameraAdapter(HTTPAdapter):
+    """
+    HTTPAdapter with a blocking pool that gives up after pool_timeout seconds.
+    requests never passes a pool timeout, so a blocked wait would otherwise
+    hold the executor thread without a deadline.
+    """
+    __attrs__ = HTTPAdapter.__attrs__ + ['pool_timeout']
+
+    def __init__(self, pool_timeout: float, **kwargs):
+        self.pool_timeout = pool_timeout
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: _bounded_wait_pool(pool_class, self.pool_timeout)
+            for scheme, pool_class in self.poolmanager.pool_classes_by_scheme.items()
+        }
+
 class CameraDetector:
     """Detect cabin occupancy from camera feed"""
     
@@ -21,65 +63,280 @@ class CameraDetector:
         self.previous_frames = {}  # Store previous frames for each cabin
         self.detection_history = {}  # Store detection history for smoothing
         
+        # Motion engine used when a cabin does not choose one
+        self.motion_engine = os.environ.get('MOTION_ENGINE', 'frame_diff')
+        if self.motion_engine not in MOTION_ENGINES:
+            logger.warning(f"Unknown MOTION_ENGINE={self.motion_engine}, using frame_diff")
+            self.motion_engine = 'frame_diff'
+        self.background_alpha = 0.05  # Learning rate of the running average background
+        self.background_history = 100  # Frames remembered by the MOG2 model
+        self.background_models = {}  # Store (engine, model) for each cabin
+        
+        # Decode frames at 1/N resolution in grayscale (1 = full size color)
+        self.decode_scale = int(os.environ.get('CAMERA_DECODE_SCALE', 1))
+        if self.decode_scale != 1 and self.decode_scale not in REDUCED_GRAYSCALE_FLAGS:
+            logger.warning(f"Unsupported CAMERA_DECODE_SCALE={self.decode_scale}, using full size")
+            self.decode_scale = 1
+        
+        # Keep-alive HTTP pool shared by all cabins
+        self.max_connections_per_camera = int(os.environ.get('CAMERA_MAX_CONNECTIONS', 2))
+        self.max_pooled_cameras = int(os.environ.get('CAMERA_POOL_SIZE', 256))
+        # Wait for a free connection at most this long, never past the tracker's per-cabin deadline
+        cabin_timeout = float(os.environ.get('TRACKER_CABIN_TIMEOUT', 8))
+        self.pool_timeout = min(float(os.environ.get('CAMERA_POOL_TIMEOUT', 3)), cabin_timeout)
+        self.session = self._create_session()
+        
+        # Async HTTP client, created lazily inside the running event loop
+        self.async_max_connections = int(os.environ.get('CAMERA_ASYNC_MAX_CONNECTIONS', 200))
+        self._async_client = None
+        self._host_slots = {}  # Per camera host semaphores for the async path
+    
+    def _create_session(self):
+        """
+        Create a requests session with one keep-alive pool per camera host.
+        pool_block makes extra requests wait (up to pool_timeout) for a free
+        connection instead of opening more sockets than the ESP32 network
+        stack can handle.
+        """
+        session = requests.Session()
+        adapter = _CameraAdapter(
+            self.pool_timeout,
+            pool_connections=self.max_pooled_cameras,
+            pool_maxsize=self.max_connections_per_camera,
+            pool_block=True
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+    
+    def connection_stats(self):
+        """
+        Connection reuse counters of the camera HTTP pool
+        Returns: {'requests': int, 'new_connections': int, 'reused_connections': int}
+        """
+        total_requests = 0
+        new_connections = 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                total_requests += pool.num_requests
+                new_connections += pool.num_connections
+        
+        return {
+            'requests': total_requests,
+            'new_connections': new_connections,
+            'reused_connections': max(total_requests - new_connections, 0)
+        }
+        
     def fetch_image(self, camera_url: str, timeout: int = 3):
         """Fetch image from ESP32-CAM"""
+        content = self.fetch_bytes(camera_url, timeout)
+        if content is None:
+            return None
+        return self.decode_image(content)
+    
+    def fetch_bytes(self, camera_url: str, timeout: int = 3):
+        """Fetch raw JPEG bytes from ESP32-CAM"""
         try:
-            response = requests.get(camera_url, timeout=timeout, stream=True)
+            # Body is read in full, which returns the connection to the pool
+            response = self.session.get(camera_url, timeout=timeout)
             if response.status_code == 200:
-                # Convert to numpy array
-                img_array = np.frombuffer(response.content, np.uint8)
-                img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-                return img
+                return response.content
             else:
                 logger.warning(f"Camera returned status {response.status_code}")
                 return None
+        except EmptyPoolError:
+            logger.warning(f"No free camera connection within {self.pool_timeout}s: {camera_url}")
+            return None
         except requests.exceptions.RequestException as e:
             logger.error(f"Error fetching image: {e}")
             return None
     
-    def detect_motion(self, cabin_no: int, current_frame):
+    def decode_image(self, content: bytes):
         """
-        Detect motion between current and previous frame
+        Decode JPEG bytes into an image.
+        With decode_scale > 1 libjpeg decodes straight to a reduced grayscale
+        frame, which skips most of the IDCT and color conversion work.
+        """
+        # Convert to numpy array
+        img_array = np.frombuffer(content, np.uint8)
+        flag = REDUCED_GRAYSCALE_FLAGS.get(self.decode_scale, cv2.IMREAD_COLOR)
+        return cv2.imdecode(img_array, flag)
+    
+    def to_grayscale(self, frame):
+        """Return a grayscale view of the frame (no copy if already gray)"""
+        if frame.ndim == 2:
+            return frame
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    
+    def _scaled_area(self, area: float):
+        """Convert a full-resolution pixel area to the decoded resolution"""
+        return area / (self.decode_scale ** 2)
+    
+    def _blur_kernel(self):
+        """21x21 blur at full size, shrunk with the decode scale (kept odd)"""
+        size = max(21 // self.decode_scale, 3)
+        return (size | 1, size | 1)
+    
+    def _get_async_client(self):
+        """Shared keep-alive client for the asyncio fetch path"""
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.async_max_connections,
+                    max_keepalive_connections=self.async_max_connections
+                )
+            )
+        return self._async_client
+    
+    async def fetch_bytes_async(self, camera_url: str, timeout: int = 3):
+        """Fetch raw JPEG bytes from ESP32-CAM without blocking a thread"""
+        # httpx only limits connections globally, so cap each camera host here
+        host = urlsplit(camera_url).netloc
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.max_connections_per_camera)
+        
+        try:
+            async with self._host_slots[host]:
+                response = await self._get_async_client().get(camera_url, timeout=timeout)
+            if response.status_code == 200:
+                return response.content
+            else:
+                logger.warning(f"Camera returned status {response.status_code}")
+                return None
+        except httpx.HTTPError as e:
+            logger.error(f"Error fetching image: {e}")
+            return None
+    
+    async def aclose(self):
+        """Close the async HTTP client"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+            self._host_slots = {}
+    
+    def detect_motion(self, cabin_no: int, current_frame, engine: str = None):
+        """
+        Detect motion with the given engine (default: self.motion_engine)
         Returns: (is_active, confidence)
         """
         if current_frame is None:
             return False, 0.0
         
-        # Convert to grayscale
-        gray = cv2.cvtColor(current_frame, cv2.COLOR_BGR2GRAY)
-        gray = cv2.GaussianBlur(gray, (21, 21), 0)
+        engine = engine or self.motion_engine
+        if engine == 'running_average':
+            return self._detect_motion_running_average(cabin_no, current_frame)
+        if engine == 'mog2':
+            return self._detect_motion_mog2(cabin_no, current_frame)
+        return self._detect_motion_frame_diff(cabin_no, current_frame)
+    
+    def _detect_motion_frame_diff(self, cabin_no: int, current_frame):
+        """
+        Detect motion between current and previous frame
+        Returns: (is_active, confidence)
+        """
+        # Convert to grayscale (accepts frames that are already gray)
+        gray = self.to_grayscale(current_frame)
+        gray = cv2.GaussianBlur(gray, self._blur_kernel(), 0)
         
-        # Check if we have previous frame
-        if cabin_no not in self.previous_frames:
+        # Check if we have a comparable previous frame
+        previous = self.previous_frames.get(cabin_no)
+        if previous is None or previous.shape != gray.shape:
             self.previous_frames[cabin_no] = gray
             return False, 0.0  # First frame, no comparison
         
         # Calculate difference
-        frame_delta = cv2.absdiff(self.previous_frames[cabin_no], gray)
+        frame_delta = cv2.absdiff(previous, gray)
         thresh = cv2.threshold(frame_delta, self.motion_threshold, 255, cv2.THRESH_BINARY)[1]
         
         # Dilate to fill gaps
-        thresh = cv2.dilate(thresh, None, iterations=2)
+        thresh = cv2.dilate(thresh, None, iterations=max(2 // self.decode_scale, 1))
         
         # Find contours
         contours, _ = cv2.findContours(thresh.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
+        # Areas are measured at decoded resolution, thresholds are full size
+        min_area = self._scaled_area(self.min_area)
+        
         # Calculate total motion area
         total_motion_area = 0
         for contour in contours:
             area = cv2.contourArea(contour)
-            if area >= self.min_area:
+            if area >= min_area:
                 total_motion_area += area
         
         # Store current frame for next comparison
         self.previous_frames[cabin_no] = gray
         
         # Determine if active based on motion
-        is_active = total_motion_area > self.min_area
-        confidence = min(total_motion_area / 10000.0, 1.0)  # Normalize to 0-1
+        is_active = total_motion_area > min_area
+        confidence = min(total_motion_area / self._scaled_area(10000.0), 1.0)  # Normalize to 0-1
+        
+        return is_active, confidence
+    
+    def _background_model(self, cabin_no: int, engine: str, gray):
+        """Return the cabin's background model, or None after (re)initialising it"""
+        entry = self.background_models.get(cabin_no)
+        if entry is not None and entry[0] == engine and entry[2] == gray.shape:
+            return entry[1]
+        
+        if engine == 'running_average':
+            model = gray.astype(np.float32)
+        else:
+            model = cv2.createBackgroundSubtractorMOG2(
+                history=self.background_history,
+                detectShadows=False
+            )
+            model.apply(gray, learningRate=1.0)
+        self.background_models[cabin_no] = (engine, model, gray.shape)
+        return None  # First frame, no comparison
+    
+    def _motion_from_mask(self, mask):
+        """Motion decision from a binary foreground mask using a pixel count"""
+        motion_area = cv2.countNonZero(mask)
+        min_area = self._scaled_area(self.min_area)
+        
+        is_active = motion_area > min_area
+        confidence = min(motion_area / self._scaled_area(10000.0), 1.0)  # Normalize to 0-1
         
         return is_active, confidence
     
+    def _detect_motion_running_average(self, cabin_no: int, current_frame):
+        """
+        Detect motion against a running-average background of the cabin
+        Returns: (is_active, confidence)
+        """
+        gray = cv2.GaussianBlur(self.to_grayscale(current_frame), self._blur_kernel(), 0)
+        
+        background = self._background_model(cabin_no, 'running_average', gray)
+        if background is None:
+            return False, 0.0
+        
+        frame_delta = cv2.absdiff(gray, cv2.convertScaleAbs(background))
+        mask = cv2.threshold(frame_delta, self.motion_threshold, 255, cv2.THRESH_BINARY)[1]
+        
+        # Blend the current frame into the background (in place)
+        cv2.accumulateWeighted(gray, background, self.background_alpha)
+        
+        return self._motion_from_mask(mask)
+    
+    def _detect_motion_mog2(self, cabin_no: int, current_frame):
+        """
+        Detect motion with a MOG2 background subtractor of the cabin
+        Returns: (is_active, confidence)
+        """
+        gray = cv2.GaussianBlur(self.to_grayscale(current_frame), self._blur_kernel(), 0)
+        
+        subtractor = self._background_model(cabin_no, 'mog2', gray)
+        if subtractor is None:
+            return False, 0.0
+        
+        mask = subtractor.apply(gray)
+        return self._motion_from_mask(mask)
+    
     def detect_brightness(self, frame):
         """
         Detect if lights are on (cabin occupied)
@@ -88,8 +345,8 @@ class CameraDetector:
         if frame is None:
             return 0.0
         
-        # Convert to grayscale
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        # Convert to grayscale (accepts frames that are already gray)
+        gray = self.to_grayscale(frame)
         
         # Calculate mean brightness
         mean_brightness = np.mean(gray)
@@ -99,7 +356,7 @@ class CameraDetector:
         
         return brightness_score
     
-    def analyze_cabin(self, cabin_no: int, camera_url: str):
+    def analyze_cabin(self, cabin_no: int, camera_url: str, motion_engine: str = None):
         """
         Complete cabin analysis
         Returns: {
@@ -114,21 +371,58 @@ class CameraDetector:
         frame = self.fetch_image(camera_url)
         
         if frame is None:
-            return {
-                'is_active': False,
-                'confidence': 0.0,
-                'method': 'camera_offline',
-                'brightness': 0.0,
-                'motion_detected': False,
-                'error': 'Camera offline or unreachable'
-            }
+            return self.offline_result()
+        
+        return self.analyze_frame(cabin_no, frame, motion_engine)
+    
+    async def analyze_cabin_async(self, cabin_no: int, camera_url: str, executor=None, motion_engine: str = None):
+        """
+        Same as analyze_cabin, but the frame is fetched on the event loop.
+        Only decoding and analysis run in the executor.
+        """
+        content = await self.fetch_bytes_async(camera_url)
+        
+        if content is None:
+            return self.offline_result()
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, self.analyze_content, cabin_no, content, motion_engine)
+    
+    def analyze_content(self, cabin_no: int, content: bytes, motion_engine: str = None):
+        """Decode fetched JPEG bytes and analyze the frame"""
+        frame = self.decode_image(content)
+        
+        if frame is None:
+            return self.offline_result('Camera sent an invalid image')
+        
+        return self.analyze_frame(cabin_no, frame, motion_engine)
+    
+    def offline_result(self, error: str = 'Camera offline or unreachable'):
+        """Result returned when no frame could be obtained"""
+        return {
+            'is_active': False,
+            'confidence': 0.0,
+            'method': 'camera_offline',
+            'brightness': 0.0,
+            'motion_detected': False,
+            'error': error
+        }
+    
+    def analyze_frame(self, cabin_no: int, frame, motion_engine: str = None):
+        """Run motion and brightness detection on a decoded frame"""
+        # One grayscale buffer shared by both detectors
+        gray = self.to_grayscale(frame)
         
         # Detect motion
-        motion_detected, motion_confidence = self.detect_motion(cabin_no, frame)
+        motion_detected, motion_confidence = self.detect_motion(cabin_no, gray, motion_engine)
         
         # Detect brightness
-        brightness = self.detect_brightness(frame)
+        brightness = self.detect_brightness(gray)
         
+        return self.build_result(cabin_no, motion_detected, motion_confidence, brightness)
+    
+    def build_result(self, cabin_no: int, motion_detected: bool, motion_confidence: float, brightness: float):
+        """Combine motion and brightness into a smoothed detection result"""
         # Decision logic: Active if motion detected OR lights are bright
         is_active = motion_detected or brightness > self.brightness_threshold
         
@@ -158,5 +452,114 @@ class CameraDetector:
             'timestamp': datetime.now(timezone.utc).isoformat()
         }
 
+class BatchFrameAnalyzer:
+    """
+    Analyze the frames of many cabins in one vectorized NumPy pass.
+    
+    Frames are downscaled into rows of a preallocated (cabins, height, width)
+    array; absdiff, threshold counts and mean brightness are then computed
+    for all rows at once. Area resampling acts as the blur, and motion area
+    is a pixel count (no dilate/contours), so results follow frame_diff
+    closely but not pixel for pixel. Thresholds and smoothing history are
+    shared with the wrapped CameraDetector. Cabins using another motion
+    engine are analyzed one by one with the detector's own models.
+    """
+    
+    def __init__(self, detector: CameraDetector, width: int = 160, height: int = 120):
+        self.detector = detector
+        self.width = width
+        self.height = height
+        self._slots = {}  # cabin_no -> row in the state arrays
+        self._previous = np.zeros((0, height, width), np.uint8)  # Last frame per slot
+        self._has_previous = np.zeros(0, bool)
+        self._batch = np.zeros((0, height, width), np.uint8)  # Current frames of a pass
+    
+    def _reserve(self, cabin_count: int, batch_size: int):
+        """Grow the preallocated arrays (doubling) when needed"""
+        if cabin_count > len(self._previous):
+            capacity = max(cabin_count, 2 * len(self._previous))
+            previous = np.zeros((capacity, self.height, self.width), np.uint8)
+            previous[:len(self._previous)] = self._previous
+            has_previous = np.zeros(capacity, bool)
+            has_previous[:len(self._has_previous)] = self._has_previous
+            self._previous, self._has_previous = previous, has_previous
+        
+        if batch_size > len(self._batch):
+            capacity = max(batch_size, 2 * len(self._batch))
+            self._batch = np.zeros((capacity, self.height, self.width), np.uint8)
+    
+    def analyze(self, frames: dict, engines: dict = None):
+        """
+        Analyze one sweep of frames
+        frames: {cabin_no: decoded frame or None}
+        engines: {cabin_no: motion engine} of cabins that choose one
+        Returns: {cabin_no: result dict as returned by analyze_cabin}
+        """
+        detector = self.detector
+        engines = engines or {}
+        results = {}
+        
+        # Offline cameras are answered directly
+        valid = []
+        for cabin_no, frame in frames.items():
+            engine = engines.get(cabin_no) or detector.motion_engine
+            if frame is None:
+                results[cabin_no] = detector.offline_result()
+            elif engine != 'frame_diff':
+                results[cabin_no] = detector.analyze_frame(cabin_no, frame, engine)
+                if cabin_no in self._slots:
+                    # Compare against a fresh frame if it switches back
+                    self._has_previous[self._slots[cabin_no]] = False
+            else:
+                valid.append((cabin_no, frame))
+        
+        if not valid:
+            return results
+        
+        for cabin_no, _ in valid:
+            if cabin_no not in self._slots:
+                self._slots[cabin_no] = len(self._slots)
+        
+        n = len(valid)
+        self._reserve(len(self._slots), n)
+        
+        # Stack downscaled grayscale frames into the batch buffer
+        rows = np.empty(n, np.intp)
+        full_pixels = np.empty(n, np.float64)
+        for i, (cabin_no, frame) in enumerate(valid):
+            rows[i] = self._slots[cabin_no]
+            full_pixels[i] = frame.shape[0] * frame.shape[1] * detector.decode_scale ** 2
+            cv2.resize(detector.to_grayscale(frame), (self.width, self.height),
+                       dst=self._batch[i], interpolation=cv2.INTER_AREA)
+        
+        current = self._batch[:n].reshape(n, -1)
+        previous = self._previous[rows].reshape(n, -1)
+        
+        # One pass for every cabin
+        frame_delta = cv2.absdiff(current, previous)
+        motion_area = np.count_nonzero(frame_delta > detector.motion_threshold, axis=1)
+        brightness = current.mean(axis=1) / 255.0
+        
+        # Full-resolution thresholds expressed in analysis pixels
+        area_scale = (self.width * self.height) / full_pixels
+        min_area = detector.min_area * area_scale
+        motion_detected = (motion_area > min_area) & self._has_previous[rows]
+        motion_confidence = np.minimum(motion_area / (10000.0 * area_scale), 1.0)
+        motion_confidence[~self._has_previous[rows]] = 0.0
+        
+        # Current frames become the reference for the next sweep
+        self._previous[rows] = self._batch[:n]
+        self._has_previous[rows] = True
+        
+        for i, (cabin_no, _) in enumerate(valid):
+            results[cabin_no] = detector.build_result(
+                cabin_no,
+                bool(motion_detected[i]),
+                float(motion_confidence[i]),
+                float(brightness[i])
+            )
+        
+        return results
+
 # Global detector instance
 detector = CameraDetector()
@@ -4,96 +4,934 @@ Mongita'yı async uyumlu wrapper ile kullanır
 """
 import os
 import asyncio
+import bisect
+import copy
+import heapq
+import itertools
+import threading
+from collections import deque
+from datetime import datetime, timezone
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.results import BulkWriteResult
+
+try:
+    from mongita.collection import _doc_matches_slow_filters
+    from mongita.results import DeleteResult, UpdateResult
+except ImportError:
+    # Mongita yoksa yalnızca MongoDB (Motor) kullanılır
+    _doc_matches_slow_filters = None
+
+_INDEX_TOP = (99,)  # her indeks değerinden büyük sınır
+_AFTER = 0  # (sıra, değer, _AFTER) aynı değerli tüm anahtarlardan sonra gelir
+_RANGE_OPS = ('$gt', '$gte', '$lt', '$lte')
+_SCAN_CHUNK = 100  # kilit altında bir seferde okunan doküman sayısı
+
+
+def _as_utc(value):
+    """Naive datetime'ları UTC kabul et (Mongita diskten naive döndürür)"""
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _index_value(value):
+    """
+    Değeri indekste sıralanabilir (tip sırası, değer) biçimine çevir.
+    Farklı tipler MongoDB'deki gibi birbirine karışmaz.
+    Desteklenmeyen tipler (liste, dict, ...) için TypeError.
+    """
+    if value is None:
+        return (0,)
+    if isinstance(value, bool):
+        return (4, value)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    if isinstance(value, datetime):
+        return (3, _as_utc(value))
+    raise TypeError(f"Indekslenemeyen değer: {type(value).__name__}")
+
+
+def _normalize_filter(filter_query):
+    """Filtredeki datetime değerlerini UTC'ye çevir"""
+    normalized = {}
+    for key, condition in filter_query.items():
+        if isinstance(condition, dict):
+            condition = {op: [_as_utc(v) for v in value] if isinstance(value, (list, tuple)) else _as_utc(value)
+                         for op, value in condition.items()}
+        else:
+            condition = _as_utc(condition)
+        normalized[key] = condition
+    return normalized
+
+
+def _has_datetime(filter_query):
+    """Filtrede datetime değeri var mı"""
+    for condition in filter_query.values():
+        values = condition.values() if isinstance(condition, dict) else [condition]
+        if any(isinstance(value, datetime) for value in values):
+            return True
+    return False
+
+
+def _matches(doc, filter_query):
+    """Dokümanın (UTC'ye çevrilmiş) filtreye uyup uymadığı"""
+    doc = {key: _as_utc(value) for key, value in doc.items()}
+    return _doc_matches_slow_filters(doc, filter_query)
+
+
+class SecondaryIndex:
+    """
+    Bir veya birden çok alan üzerinde bellek içi ikincil indeks.
+    
+    Anahtarlar sıralı tutulur; baştaki alanlarda eşitlik, sonraki ilk alanda
+    aralık ($gt/$gte/$lt/$lte) sorguları taramasız cevaplanır. Adaylar yine
+    de tam filtreyle doğrulanır.
+    """
+    
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self._ids_by_key = {}  # anahtar -> {_id}
+        self._keys = []  # sıralı anahtar listesi
+        self._key_by_id = {}  # _id -> anahtar
+        self._unindexed = set()  # indekslenemeyen değerli dokümanlar, her zaman aday
+    
+    def __len__(self):
+        return len(self._key_by_id) + len(self._unindexed)
+    
+    def clear(self):
+        self._ids_by_key = {}
+        self._keys = []
+        self._key_by_id = {}
+        self._unindexed = set()
+    
+    def build(self, docs):
+        """İndeksi dokümanlardan baştan oluştur (anahtarlar bir kez sıralanır)"""
+        self.clear()
+        for doc in docs:
+            try:
+                key = tuple(_index_value(doc.get(field)) for field in self.fields)
+            except TypeError:
+                self._unindexed.add(doc['_id'])
+                continue
+            self._ids_by_key.setdefault(key, set()).add(doc['_id'])
+            self._key_by_id[doc['_id']] = key
+        self._keys = sorted(self._ids_by_key)
+    
+    def add(self, doc):
+        """Dokümanı ekle (zaten varsa anahtarını güncelle)"""
+        doc_id = doc['_id']
+        self.remove(doc_id)
+        try:
+            key = tuple(_index_value(doc.get(field)) for field in self.fields)
+        except TypeError:
+            self._unindexed.add(doc_id)
+            return
+        
+        ids = self._ids_by_key.get(key)
+        if ids is None:
+            ids = self._ids_by_key[key] = set()
+            bisect.insort(self._keys, key)
+        ids.add(doc_id)
+        self._key_by_id[doc_id] = key
+    
+    def remove(self, doc_id):
+        self._unindexed.discard(doc_id)
+        key = self._key_by_id.pop(doc_id, None)
+        if key is None:
+            return
+        ids = self._ids_by_key[key]
+        ids.discard(doc_id)
+        if not ids:
+            del self._ids_by_key[key]
+            del self._keys[bisect.bisect_left(self._keys, key)]
+    
+    def plan(self, filter_query):
+        """
+        Filtreyi bu indeksle nasıl daraltabileceğimizi bul.
+        Returns: (kullanılan alan sayısı, eşitlik öneki, aralık koşulu veya None)
+        """
+        prefix = []
+        for field in self.fields:
+            if field not in filter_query:
+                break
+            condition = filter_query[field]
+            if isinstance(condition, dict) and set(condition) == {'$eq'}:
+                condition = condition['$eq']
+            
+            if not isinstance(condition, dict):
+                try:
+                    prefix.append(_index_value(condition))
+                except TypeError:
+                    break
+                continue
+            
+            if condition and all(op in _RANGE_OPS for op in condition):
+                try:
+                    bounds = {op: _index_value(value) for op, value in condition.items()}
+                except TypeError:
+                    break
+                # Aralık tek bir tip içinde olmalı
+                if len({bound[0] for bound in bounds.values()}) == 1 and all(len(b) == 2 for b in bounds.values()):
+                    return len(prefix) + 1, tuple(prefix), bounds
+            break
+        
+        return len(prefix), tuple(prefix), None
+    
+    def _range(self, prefix, bounds):
+        """Plana uyan anahtarların alt ve üst sınırı (bisect_left hedefleri)"""
+        if bounds is None:
+            return prefix, prefix + (_INDEX_TOP,)
+        
+        rank = next(iter(bounds.values()))[0]
+        if '$gt' in bounds:
+            low = prefix + (bounds['$gt'] + (_AFTER,),)
+        elif '$gte' in bounds:
+            low = prefix + (bounds['$gte'],)
+        else:
+            low = prefix + ((rank,),)
+        if '$lt' in bounds:
+            high = prefix + (bounds['$lt'],)
+        elif '$lte' in bounds:
+            high = prefix + (bounds['$lte'] + (_AFTER,),)
+        else:
+            high = prefix + ((rank + 1,),)
+        return low, high
+    
+    def candidates(self, prefix, bounds):
+        """Plana uyan doküman _id'leri (anahtar sırasıyla)"""
+        if bounds is None and len(prefix) == len(self.fields):
+            return list(self._ids_by_key.get(prefix, ())) + list(self._unindexed)
+        
+        low, high = self._range(prefix, bounds)
+        low = bisect.bisect_left(self._keys, low)
+        high = bisect.bisect_left(self._keys, high)
+        
+        # Anahtar sırasıyla (ör. start_time'a göre artan)
+        ids = []
+        for key in self._keys[low:high]:
+            ids.extend(self._ids_by_key[key])
+        return ids + list(self._unindexed)
+    
+    def sort_plan(self, filter_query, sort_spec):
+        """
+        Sıralama bu indeksin anahtar sırasından okunabiliyorsa
+        (ön ek, aralık, ters mi, _id ile eşitlik kırılır mı), yoksa None.
+        Eşitlikle sabitlenen alanlardan sonraki indeks alanları sıralama
+        alanlarıyla aynı sırada ve tek yönde olmalı; sonda ("_id", yön)
+        olabilir.
+        """
+        if self._unindexed:
+            return None
+        score, prefix, bounds = self.plan(filter_query)
+        fixed = set(self.fields[:len(prefix)])
+        spec = [(field, direction) for field, direction in sort_spec if field not in fixed]
+        directions = {direction for _, direction in spec}
+        by_id = bool(spec) and spec[-1][0] == '_id' and '_id' not in self.fields
+        if by_id:
+            spec = spec[:-1]
+        
+        fields = [field for field, _ in spec]
+        if not fields or len(directions) != 1 or tuple(fields) != self.fields[len(prefix):len(prefix) + len(fields)]:
+            return None
+        if by_id and len(prefix) + len(fields) != len(self.fields):
+            return None  # eşit sıralama değerleri birden çok anahtara yayılır
+        return prefix, bounds, directions.pop() == -1, by_id
+    
+    def iter_ordered(self, prefix, bounds, reverse, by_id, lock, chunk):
+        """
+        Plana uyan _id'ler anahtar sırasıyla, en çok chunk anahtarlık gruplar
+        halinde. Kilit yalnızca bir grup okunurken tutulur; sonraki grup son
+        anahtardan devam eder (araya giren yazmalar kaymaya yol açmaz).
+        """
+        low_target, high_target = self._range(prefix, bounds)
+        last = None
+        while True:
+            with lock:
+                low = bisect.bisect_left(self._keys, low_target)
+                high = bisect.bisect_left(self._keys, high_target)
+                if last is not None:
+                    if reverse:
+                        high = bisect.bisect_left(self._keys, last)
+                    else:
+                        low = bisect.bisect_right(self._keys, last)
+                keys = self._keys[max(low, high - chunk):high][::-1] if reverse else self._keys[low:min(high, low + chunk)]
+                ids = []
+                for key in keys:
+                    group = self._ids_by_key[key]
+                    ids.extend(sorted(group, key=_sort_value, reverse=reverse) if by_id else group)
+            if not keys:
+                return
+            yield ids
+            last = keys[-1]
+
+
+class CollectionIndexes:
+    """Bir koleksiyonun ikincil indeksleri ve bunları koruyan kilit"""
+    
+    def __init__(self):
+        self.indexes = {}  # isim -> SecondaryIndex
+        self.lock = threading.RLock()
+    
+    def __bool__(self):
+        return bool(self.indexes)
+    
+    def add(self, doc):
+        for index in self.indexes.values():
+            index.add(doc)
+    
+    def remove(self, doc_id):
+        for index in self.indexes.values():
+            index.remove(doc_id)
+    
+    def clear(self):
+        for index in self.indexes.values():
+            index.clear()
+    
+    def candidates(self, filter_query):
+        """
+        En çok alanı kullanan indeksle aday _id'leri bul.
+        Kullanılabilir indeks yoksa None (tam tarama gerekir).
+        """
+        condition = filter_query.get('_id')
+        if condition is not None and not isinstance(condition, dict):
+            return [condition]
+        
+        best = None
+        for index in self.indexes.values():
+            score, prefix, bounds = index.plan(filter_query)
+            if score and (best is None or score > best[0]):
+                best = (score, index, prefix, bounds)
+        if best is None:
+            return None
+        return best[1].candidates(best[2], best[3])
+    
+    def sort_plan(self, filter_query, sort_spec):
+        """Sıralamayı anahtar sırasıyla verebilen, en çok alanı kullanan indeks ve planı (yoksa None)"""
+        best = None
+        for index in self.indexes.values():
+            plan = index.sort_plan(filter_query, sort_spec)
+            if plan is not None and (best is None or len(plan[0]) + (plan[1] is not None) > best[0]):
+                best = (len(plan[0]) + (plan[1] is not None), index, plan)
+        return best and (best[1], best[2])
+
 
 class AsyncMongitaWrapper:
     """Mongita için async wrapper - Motor API'si ile uyumlu"""
     
-    def __init__(self, collection):
+    def __init__(self, collection, indexes=None):
         self._collection = collection
+        # İndeks durumu veritabanı nesnesinde yaşar, wrapper her erişimde yeniden oluşur
+        self._indexes = indexes if indexes is not None else CollectionIndexes()
     
-    def find(self, filter_query=None, *args, **kwargs):
-        """find operasyonu - returns async cursor"""
+    async def create_index(self, keys, **kwargs):
+        """
+        Bellek içi ikincil indeks oluştur (Mongita'nın kendi indeksi tek alanlıdır
+        ve her yazmada diske yazılır). keys: "alan" veya [(alan, yön), ...]
+        """
+        if isinstance(keys, str):
+            keys = [(keys, 1)]
+        fields = [field for field, _ in keys]
+        name = kwargs.get('name') or '_'.join(f"{field}_{direction}" for field, direction in keys)
+        
+        def build():
+            index = SecondaryIndex(fields)
+            with self._indexes.lock:
+                index.build(self._scan())
+                self._indexes.indexes[name] = index
+        
+        await asyncio.to_thread(build)
+        return name
+    
+    def find(self, filter_query=None, projection=None, sort=None, skip=0, limit=0):
+        """find operasyonu - returns lazy async cursor (Motor imzası)"""
         filter_query = filter_query if filter_query is not None else {}
-        cursor = self._collection.find(filter_query, *args, **kwargs)
-        return AsyncMongitaCursor(cursor, self._collection, filter_query)
+        # Dokümanlar kopyalanmadan akar, yalnızca döndürülenler kopyalanır
+        cursor = AsyncMongitaCursor(
+            lambda: self._iter_find(filter_query, copy_docs=False), projection, self._copy,
+            ordered_source=lambda sort_spec: self._iter_sorted(filter_query, sort_spec)
+        )
+        if sort:
+            cursor.sort(sort)
+        return cursor.skip(skip).limit(limit)
     
-    async def find_one(self, *args, **kwargs):
+    async def find_one(self, filter_query=None, *args, **kwargs):
         """find_one operasyonu"""
-        return await asyncio.to_thread(self._collection.find_one, *args, **kwargs)
+        if args or kwargs:
+            return await asyncio.to_thread(self._collection.find_one, filter_query, *args, **kwargs)
+        docs = await asyncio.to_thread(self._find, filter_query or {}, 1)
+        return docs[0] if docs else None
+    
+    def _scan(self):
+        """
+        Koleksiyondaki tüm dokümanlar, kopyalanmadan (yalnızca okumak için).
+        Mongita 1.2 motorunu doğrudan kullanır; find() her dokümanı deepcopy eder.
+        """
+        for doc_id in self._collection._engine.list_ids(self._collection._base_location):
+            doc = self._get(doc_id)
+            if doc is not None:
+                yield doc
+    
+    def _get(self, doc_id):
+        """_id ile doküman (yoksa None), kopyalanmadan"""
+        try:
+            return self._collection._engine.get_doc(self._collection.full_name, doc_id)
+        except KeyError:
+            return None
+    
+    def _iter_find(self, filter_query, copy_docs=True):
+        """
+        Filtreye uyan dokümanları tembel olarak üret, mümkünse indeksten
+        (tarama yapmadan). Kilit yalnızca küçük gruplar okunurken tutulur.
+        """
+        with self._indexes.lock:
+            candidates = self._indexes.candidates(filter_query)
+            if candidates is None:
+                candidates = self._collection._engine.list_ids(self._collection._base_location)
+        
+        filter_query = _normalize_filter(filter_query)
+        for start in range(0, len(candidates), _SCAN_CHUNK):
+            with self._indexes.lock:
+                chunk = []
+                for doc_id in candidates[start:start + _SCAN_CHUNK]:
+                    doc = self._get(doc_id)
+                    if doc is not None and _matches(doc, filter_query):
+                        chunk.append(copy.deepcopy(doc) if copy_docs else doc)
+            yield from chunk
+    
+    def _iter_sorted(self, filter_query, sort_spec):
+        """
+        Filtreye uyan dokümanlar sort_spec sırasıyla, bir indeksin anahtar
+        sırasından okunarak (bellekte sıralamadan). Uygun indeks yoksa None.
+        """
+        with self._indexes.lock:
+            plan = self._indexes.sort_plan(filter_query, sort_spec)
+        if plan is None:
+            return None
+        index, (prefix, bounds, reverse, by_id) = plan
+        filter_query = _normalize_filter(filter_query)
+        
+        def documents():
+            for ids in index.iter_ordered(prefix, bounds, reverse, by_id, self._indexes.lock, _SCAN_CHUNK):
+                with self._indexes.lock:
+                    chunk = []
+                    for doc_id in ids:
+                        doc = self._get(doc_id)
+                        if doc is not None and _matches(doc, filter_query):
+                            chunk.append(doc)
+                yield from chunk
+        return documents()
+    
+    def _copy(self, doc):
+        """Motorun önbelleğindeki dokümanın bağımsız kopyası"""
+        with self._indexes.lock:
+            return copy.deepcopy(doc)
+    
+    def _find(self, filter_query, limit=None):
+        """Filtreye uyan dokümanlar (liste)"""
+        return list(itertools.islice(self._iter_find(filter_query), limit or None))
     
     async def insert_one(self, *args, **kwargs):
         """insert_one operasyonu"""
-        return await asyncio.to_thread(self._collection.insert_one, *args, **kwargs)
+        return await asyncio.to_thread(self._insert_one, *args, **kwargs)
+    
+    def _insert_one(self, document):
+        with self._indexes.lock:
+            result = self._collection.insert_one(document)
+            if self._indexes:
+                self._indexes.add({**document, '_id': result.inserted_id})
+            return result
     
     async def insert_many(self, *args, **kwargs):
         """insert_many operasyonu"""
-        return await asyncio.to_thread(self._collection.insert_many, *args, **kwargs)
+        return await asyncio.to_thread(self._insert_many, *args, **kwargs)
+    
+    def _insert_many(self, documents, ordered=True):
+        with self._indexes.lock:
+            result = self._collection.insert_many(documents, ordered=ordered)
+            if self._indexes:
+                for document, doc_id in zip(documents, result.inserted_ids):
+                    self._indexes.add({**document, '_id': doc_id})
+            return result
     
     async def update_one(self, filter_query, update_query, **kwargs):
         """update_one operasyonu"""
         # Mongita upsert desteği
         if kwargs.get('upsert'):
-            existing = await asyncio.to_thread(self._collection.find_one, filter_query)
+            existing = await self.find_one(filter_query)
             if not existing:
                 # Insert new document
                 doc = filter_query.copy()
                 if '$set' in update_query:
                     doc.update(update_query['$set'])
-                return await asyncio.to_thread(self._collection.insert_one, doc)
+                return await self.insert_one(doc)
+            # Doküman var, Mongita upsert bayrağını desteklemez
+            kwargs.pop('upsert')
         
-        return await asyncio.to_thread(self._collection.update_one, filter_query, update_query, **kwargs)
+        return await asyncio.to_thread(self._update, filter_query, update_query, False, **kwargs)
     
     async def update_many(self, *args, **kwargs):
         """update_many operasyonu"""
-        return await asyncio.to_thread(self._collection.update_many, *args, **kwargs)
+        return await asyncio.to_thread(self._update, *args, True, **kwargs)
+    
+    def _update(self, filter_query, update_query, many, upsert=False, replace=False):
+        """update_one / update_many / replace_one, indeksleri güncel tutarak"""
+        if replace:
+            operation = self._collection.replace_one
+        else:
+            operation = self._collection.update_many if many else self._collection.update_one
+        
+        if not self._indexes and (replace or not upsert):
+            return operation(filter_query, update_query, upsert=upsert)
+        
+        with self._indexes.lock:
+            doc_ids = [doc['_id'] for doc in self._find(filter_query, None if many else 1)]
+            if not doc_ids:
+                if not upsert:
+                    return UpdateResult(0, 0)
+                if not replace:
+                    # Mongita update'lerde upsert yok: filtre alanları + $set ile ekle
+                    document = {key: value for key, value in filter_query.items()
+                                if not key.startswith('$') and not isinstance(value, dict)}
+                    document.update(update_query.get('$set', {}))
+                    return UpdateResult(0, 0, self._insert_one(document).inserted_id)
+                result = operation(filter_query, update_query, upsert=upsert)
+                if result.upserted_id is not None:
+                    self._indexes.add(self._collection.find_one({'_id': result.upserted_id}))
+                return result
+            
+            modified = 0
+            for doc_id in doc_ids:
+                if replace:
+                    result = self._collection.replace_one({'_id': doc_id}, update_query)
+                else:
+                    result = self._collection.update_one({'_id': doc_id}, update_query)
+                modified += result.modified_count
+                self._indexes.add(self._collection.find_one({'_id': doc_id}))
+            return UpdateResult(len(doc_ids), modified)
     
     async def delete_one(self, *args, **kwargs):
         """delete_one operasyonu"""
-        return await asyncio.to_thread(self._collection.delete_one, *args, **kwargs)
+        return await asyncio.to_thread(self._delete, *args, False, **kwargs)
     
     async def delete_many(self, *args, **kwargs):
         """delete_many operasyonu"""
-        return await asyncio.to_thread(self._collection.delete_many, *args, **kwargs)
+        return await asyncio.to_thread(self._delete, *args, True, **kwargs)
+    
+    def _delete(self, filter_query, many):
+        """delete_one / delete_many, indeksleri güncel tutarak"""
+        operation = self._collection.delete_many if many else self._collection.delete_one
+        if not self._indexes:
+            return operation(filter_query)
+        
+        with self._indexes.lock:
+            if many and not filter_query:
+                result = operation(filter_query)
+                self._indexes.clear()
+                return result
+            
+            doc_ids = [doc['_id'] for doc in self._find(filter_query, None if many else 1)]
+            for doc_id in doc_ids:
+                self._collection.delete_one({'_id': doc_id})
+                self._indexes.remove(doc_id)
+            return DeleteResult(len(doc_ids))
+    
+    async def bulk_write(self, requests, ordered=True):
+        """bulk_write operasyonu - tüm işlemler tek thread geçişinde yapılır"""
+        return await asyncio.to_thread(self._bulk_write, list(requests))
+    
+    def _bulk_write(self, requests):
+        """
+        pymongo işlem nesnelerini (UpdateOne, InsertOne, ...) sırayla uygula.
+        Kilit tüm işlemler için bir kez alınır; art arda gelen InsertOne'lar
+        tek insert_many ile yazılır.
+        """
+        result = {'nInserted': 0, 'nMatched': 0, 'nModified': 0, 'nRemoved': 0, 'nUpserted': 0, 'upserted': []}
+        
+        with self._indexes.lock:
+            groups = itertools.groupby(enumerate(requests), key=lambda item: isinstance(item[1], InsertOne))
+            for inserts, group in groups:
+                if inserts:
+                    documents = [op._doc for _, op in group]
+                    self._insert_many(documents)
+                    result['nInserted'] += len(documents)
+                    continue
+                
+                for index, op in group:
+                    if isinstance(op, (DeleteOne, DeleteMany)):
+                        result['nRemoved'] += self._delete(op._filter, isinstance(op, DeleteMany)).deleted_count
+                        continue
+                    
+                    if isinstance(op, ReplaceOne):
+                        res = self._update(op._filter, op._doc, False, upsert=op._upsert, replace=True)
+                    elif isinstance(op, UpdateOne):
+                        res = self._update(op._filter, op._doc, False, upsert=op._upsert)
+                    elif isinstance(op, UpdateMany):
+                        res = self._update(op._filter, op._doc, True, upsert=op._upsert)
+                    else:
+                        raise TypeError(f"Desteklenmeyen bulk_write işlemi: {op!r}")
+                    
+                    result['nMatched'] += res.matched_count
+                    result['nModified'] += res.modified_count
+                    if res.upserted_id is not None:
+                        result['nUpserted'] += 1
+                        result['upserted'].append({'index': index, '_id': res.upserted_id})
+        
+        return BulkWriteResult(result, True)
     
-    async def count_documents(self, *args, **kwargs):
+    async def count_documents(self, filter_query=None, **kwargs):
         """count_documents operasyonu"""
-        return await asyncio.to_thread(self._collection.count_documents, *args, **kwargs)
+        if not filter_query:
+            return await asyncio.to_thread(self._collection.count_documents, {})
+        return await asyncio.to_thread(
+            lambda: sum(1 for _ in self._iter_find(filter_query, copy_docs=False))
+        )
+    
+    def aggregate(self, pipeline, **kwargs):
+        """
+        aggregate operasyonu - returns lazy async cursor.
+        Mongita'da aggregate yok; pipeline burada yerel olarak çalıştırılır.
+        Baştaki $match indeksleri kullanır, dokümanlar akış halinde işlenir.
+        """
+        pipeline = list(pipeline)
+        
+        def source():
+            stages = pipeline
+            match = {}
+            if stages and list(stages[0]) == ['$match']:
+                match, stages = stages[0]['$match'], stages[1:]
+            return _run_pipeline(self._iter_find(match, copy_docs=False), stages)
+        
+        return AsyncMongitaCursor(source, copy_doc=self._copy)
+
+
+# ============= Yerel aggregation pipeline (Mongita) =============
+
+# Tarih operatörleri, MongoDB gibi UTC üzerinden ($dayOfWeek: Pazar=1 ... Cumartesi=7)
+_DATE_OPERATORS = {
+    '$year': lambda value: value.year,
+    '$month': lambda value: value.month,
+    '$dayOfMonth': lambda value: value.day,
+    '$dayOfWeek': lambda value: value.isoweekday() % 7 + 1,
+    '$hour': lambda value: value.hour,
+    '$minute': lambda value: value.minute,
+}
+
+
+def _field(doc, path):
+    """Noktalı alan yolunun değeri ("a.b"), yoksa None"""
+    value = doc
+    for part in path.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _evaluate(doc, expression):
+    """Aggregation ifadesini doküman üzerinde hesapla ("$alan", sabit, {"$op": ...})"""
+    if isinstance(expression, str) and expression.startswith('$'):
+        return _field(doc, expression[1:])
+    if isinstance(expression, list):
+        return [_evaluate(doc, item) for item in expression]
+    if not isinstance(expression, dict):
+        return expression
+    
+    if len(expression) != 1 or not next(iter(expression)).startswith('$'):
+        return {key: _evaluate(doc, value) for key, value in expression.items()}
+    
+    operator, argument = next(iter(expression.items()))
+    if operator == '$literal':
+        return argument
+    if operator in _DATE_OPERATORS:
+        value = _as_utc(_evaluate(doc, argument))
+        if isinstance(value, datetime):
+            return _DATE_OPERATORS[operator](value.astimezone(timezone.utc))
+        return None
+    
+    args = _evaluate(doc, argument if isinstance(argument, list) else [argument])
+    if operator == '$ifNull':
+        return next((arg for arg in args if arg is not None), None)
+    if any(arg is None for arg in args):
+        return None
+    if operator == '$add':
+        return sum(args)
+    if operator == '$subtract':
+        return args[0] - args[1]
+    if operator == '$multiply':
+        result = 1
+        for arg in args:
+            result *= arg
+        return result
+    if operator == '$divide':
+        return args[0] / args[1]
+    raise ValueError(f"Desteklenmeyen aggregate ifadesi: {operator}")
+
+
+def _hashable(value):
+    """$group anahtarı için değeri hash'lenebilir yap"""
+    if isinstance(value, dict):
+        return tuple((key, _hashable(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(_hashable(item) for item in value)
+    return _as_utc(value)
+
+
+def _group(docs, spec):
+    """$group aşaması - dokümanlar akarken yalnızca grup durumları tutulur"""
+    accumulators = {name: next(iter(acc.items())) for name, acc in spec.items() if name != '_id'}
+    groups = {}  # anahtar -> sonuç dokümanı
+    counts = {}  # (anahtar, alan) -> $avg sayısı / $first görüldü
+    
+    for doc in docs:
+        group_id = _evaluate(doc, spec['_id'])
+        key = _hashable(group_id)
+        result = groups.get(key)
+        if result is None:
+            result = groups[key] = {'_id': group_id}
+            for name, (operator, _) in accumulators.items():
+                result[name] = {'$sum': 0, '$avg': None, '$push': [], '$addToSet': [], '$count': 0}.get(operator)
+        
+        for name, (operator, expression) in accumulators.items():
+            if operator == '$count':
+                result[name] += 1
+                continue
+            value = _evaluate(doc, expression)
+            current = result[name]
+            if operator == '$sum':
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    result[name] = current + value
+            elif operator == '$avg':
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    count = counts.get((key, name), 0)
+                    result[name] = ((current or 0) * count + value) / (count + 1)
+                    counts[(key, name)] = count + 1
+            elif operator == '$min':
+                if value is not None and (current is None or _sort_value(value) < _sort_value(current)):
+                    result[name] = value
+            elif operator == '$max':
+                if value is not None and (current is None or _sort_value(value) > _sort_value(current)):
+                    result[name] = value
+            elif operator == '$first':
+                if (key, name) not in counts:
+                    counts[(key, name)] = True
+                    result[name] = value
+            elif operator == '$last':
+                result[name] = value
+            elif operator == '$push':
+                current.append(value)
+            elif operator == '$addToSet':
+                if value not in current:
+                    current.append(value)
+            else:
+                raise ValueError(f"Desteklenmeyen $group operatörü: {operator}")
+    
+    return iter(groups.values())
+
+
+def _project_stage(doc, spec):
+    """$project aşaması (dahil etme, hariç tutma veya hesaplanan alanlar)"""
+    excluded = [field for field, value in spec.items() if value in (0, False) and field != '_id']
+    if excluded:
+        return {field: value for field, value in doc.items() if field not in spec or spec[field] not in (0, False)}
+    
+    result = {}
+    if spec.get('_id', 1) not in (0, False) and '_id' in doc:
+        result['_id'] = doc['_id']
+    for field, value in spec.items():
+        if field == '_id' and value in (0, 1, True, False):
+            continue
+        if value is True or (isinstance(value, int) and not isinstance(value, bool) and value == 1):
+            if field in doc:
+                result[field] = doc[field]
+        else:
+            result[field] = _evaluate(doc, value)
+    return result
+
+
+def _unwind(docs, spec):
+    """$unwind aşaması ("$alan" veya {"path": "$alan"})"""
+    path = (spec['path'] if isinstance(spec, dict) else spec)[1:]
+    for doc in docs:
+        values = _field(doc, path)
+        if isinstance(values, list):
+            for value in values:
+                yield {**doc, path: value}
+        elif values is not None:
+            yield doc
+
+
+def _run_pipeline(docs, pipeline):
+    """Aggregation aşamalarını doküman akışına sırayla uygula"""
+    index = 0
+    while index < len(pipeline):
+        stage = pipeline[index]
+        if len(stage) != 1:
+            raise ValueError(f"Geçersiz aggregate aşaması: {stage!r}")
+        name, spec = next(iter(stage.items()))
+        
+        # Aşamalar tembel çalışır: spec her aşamaya varsayılan argümanla bağlanır
+        if name == '$match':
+            docs = filter(lambda doc, query=_normalize_filter(spec): _matches(doc, query), docs)
+        elif name == '$group':
+            docs = _group(docs, spec)
+        elif name == '$project':
+            docs = map(lambda doc, spec=spec: _project_stage(doc, spec), docs)
+        elif name in ('$addFields', '$set'):
+            docs = map(lambda doc, spec=spec: {**doc, **{field: _evaluate(doc, value) for field, value in spec.items()}},
+                       docs)
+        elif name == '$sort':
+            sort_spec = list(spec.items())
+            key = lambda doc, sort_spec=sort_spec: _SortKey(doc, sort_spec)
+            following = pipeline[index + 1] if index + 1 < len(pipeline) else {}
+            if '$limit' in following:
+                # $sort + $limit: yalnızca ilk k doküman bir heap'te tutulur
+                docs = iter(heapq.nsmallest(following['$limit'], docs, key=key))
+                index += 1
+            else:
+                docs = iter(sorted(docs, key=key))
+        elif name == '$limit':
+            docs = itertools.islice(docs, spec)
+        elif name == '$skip':
+            docs = itertools.islice(docs, spec, None)
+        elif name == '$count':
+            docs = iter([{spec: sum(1 for _ in docs)}])
+        elif name == '$unwind':
+            docs = _unwind(docs, spec)
+        else:
+            raise ValueError(f"Desteklenmeyen aggregate aşaması: {name}")
+        index += 1
     
-    def aggregate(self, *args, **kwargs):
-        """aggregate operasyonu - returns async cursor"""
-        cursor = self._collection.aggregate(*args, **kwargs)
-        return AsyncMongitaCursor(cursor)
+    return docs
+
+
+def _sort_value(value):
+    """Sıralama için (tip sırası, değer); karşılaştırılamayan tipler metin olarak"""
+    try:
+        return _index_value(value)
+    except TypeError:
+        return (9, str(value))
+
+
+class _SortKey:
+    """Birden çok alan ve yön (1 / -1) ile karşılaştırılabilen sıralama anahtarı"""
+    
+    __slots__ = ('values', 'directions')
+    
+    def __init__(self, doc, sort_spec):
+        self.values = [_sort_value(_field(doc, field)) for field, _ in sort_spec]
+        self.directions = [direction for _, direction in sort_spec]
+    
+    def __eq__(self, other):
+        return self.values == other.values
+    
+    def __lt__(self, other):
+        for mine, theirs, direction in zip(self.values, other.values, self.directions):
+            if mine != theirs:
+                return mine < theirs if direction == 1 else mine > theirs
+        return False
+
+
+def _project(doc, projection):
+    """MongoDB projection uygula (üst seviye alanlar, dahil etme veya hariç tutma)"""
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    include = [field for field, value in projection.items() if value and field != '_id']
+    if include:
+        result = {field: doc[field] for field in include if field in doc}
+        if projection.get('_id', 1) and '_id' in doc:
+            result['_id'] = doc['_id']
+        return result
+    return {field: value for field, value in doc.items() if projection.get(field, 1)}
 
 
 class AsyncMongitaCursor:
-    """Mongita cursor için async wrapper"""
+    """
+    Mongita için tembel (lazy) async cursor - Motor API'si ile uyumlu.
     
-    def __init__(self, cursor, collection=None, filter_query=None):
-        self._cursor = cursor if isinstance(cursor, list) else list(cursor)
-        self._collection = collection
-        self._filter_query = filter_query if filter_query is not None else {}
-        self._sort_params = None
+    Dokümanlar ancak to_list() veya async for ile, thread içinde okunur.
+    sort ile birlikte limit veya to_list(length) verilirse yalnızca ilk
+    k doküman bir heap'te tutulur (bellek O(k)). Sıralama bir indeksin
+    anahtar sırasından okunabiliyorsa (ordered_source) hiç sıralanmaz,
+    dokümanlar akış halinde gelir. copy_doc verilirse yalnızca döndürülen
+    dokümanlara uygulanır.
+    """
     
-    async def to_list(self, length=None):
-        """Cursor'dan liste oluştur"""
-        data = self._cursor
+    BATCH_SIZE = 100
+    
+    def __init__(self, source, projection=None, copy_doc=None, ordered_source=None):
+        self._source = source  # dokümanları üreten (senkron) iterator fabrikası
+        self._ordered_source = ordered_source  # sort_spec -> sıralı iterator veya None
+        self._projection = projection
+        self._copy_doc = copy_doc
+        self._sort = None  # [(alan, yön), ...]
+        self._skip = 0
+        self._limit = 0
+        self._iterator = None
+        self._buffer = deque()
+    
+    def sort(self, key_or_list, direction=None):
+        """Sort cursor results: sort("alan", -1) veya sort([("alan", -1), ...])"""
+        if isinstance(key_or_list, str):
+            self._sort = [(key_or_list, direction if direction is not None else 1)]
+        else:
+            self._sort = list(key_or_list)
+        return self
+    
+    def skip(self, skip):
+        self._skip = skip or 0
+        return self
+    
+    def limit(self, limit):
+        self._limit = limit or 0
+        return self
+    
+    def _documents(self, length=None):
+        """sort, skip, limit ve projection uygulanmış senkron iterator"""
+        counts = [n for n in (length, self._limit) if n]
+        count = min(counts) if counts else None
         
-        # Apply sort if specified
-        if self._sort_params:
-            field, direction = self._sort_params
-            reverse = (direction == -1)
-            try:
-                data = sorted(data, key=lambda x: x.get(field, 0), reverse=reverse)
-            except:
-                pass
+        ordered = self._ordered_source(self._sort) if self._sort and self._ordered_source else None
+        if ordered is not None:
+            docs = ordered
+        elif self._sort:
+            docs = iter(self._source())
+            key = lambda doc: _SortKey(doc, self._sort)
+            if count is not None:
+                docs = iter(heapq.nsmallest(self._skip + count, docs, key=key))
+            else:
+                docs = iter(sorted(docs, key=key))
+        else:
+            docs = iter(self._source())
         
-        return data[:length] if length else data
+        stop = self._skip + count if count is not None else None
+        docs = itertools.islice(docs, self._skip, stop)
+        if self._projection:
+            docs = (_project(doc, self._projection) for doc in docs)
+        if self._copy_doc:
+            docs = map(self._copy_doc, docs)
+        return docs
+    
+    async def to_list(self, length=None):
+        """Cursor'dan liste oluştur"""
+        return await asyncio.to_thread(lambda: list(self._documents(length)))
     
-    def sort(self, field, direction=1):
-        """Sort cursor results"""
-        self._sort_params = (field, direction)
+    def __aiter__(self):
         return self
+    
+    async def __anext__(self):
+        if not self._buffer:
+            if self._iterator is None:
+                self._iterator = self._documents()
+            batch = await asyncio.to_thread(
+                lambda: list(itertools.islice(self._iterator, self.BATCH_SIZE))
+            )
+            if not batch:
+                raise StopAsyncIteration
+            self._buffer.extend(batch)
+        return self._buffer.popleft()
 
 
 class AsyncMongitaDatabase:
@@ -101,16 +939,18 @@ class AsyncMongitaDatabase:
     
     def __init__(self, db):
         self._db = db
+        self._indexes = {}  # koleksiyon adı -> CollectionIndexes
     
     def __getattr__(self, name):
         """Collection erişimi"""
-        collection = self._db[name]
-        return AsyncMongitaWrapper(collection)
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
     
     def __getitem__(self, name):
         """Collection erişimi (dict syntax)"""
         collection = self._db[name]
-        return AsyncMongitaWrapper(collection)
+        return AsyncMongitaWrapper(collection, self._indexes.setdefault(name, CollectionIndexes()))
 
 
 def get_database():
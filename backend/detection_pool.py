@@ -0,0 +1,84 @@
+"""
+Multi-process detection backend
+Each worker process owns the detector state of a shard of cabins
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+# Detector of the current worker process (set by _init_worker)
+_worker_detector = None
+
+def _init_worker():
+    """Create the worker's own detector, holding previous frames and history"""
+    global _worker_detector
+    from camera_detector import CameraDetector
+    _worker_detector = CameraDetector()
+
+def _analyze_in_worker(cabin_no: int, content: bytes, motion_engine: str = None):
+    """Decode and analyze a frame inside the worker process"""
+    return _worker_detector.analyze_content(cabin_no, content, motion_engine)
+
+class ProcessDetectionPool:
+    """
+    Run frame analysis in worker processes.
+
+    Every shard is a single-process executor, and a cabin always goes to
+    the same shard (cabin_no hash), so that process keeps the cabin's
+    previous_frames and detection_history between sweeps.
+
+    Workers are started with spawn, which re-imports the launching script
+    in every worker. A script that starts the server in-process (e.g. with
+    uvicorn.run) must do so under if __name__ == '__main__', or each worker
+    starts another server. `uvicorn server:app` needs nothing extra.
+    """
+
+    def __init__(self, workers: int = None):
+        self.workers = workers or os.cpu_count() or 1
+        self._shards = []
+
+    def _create_shard(self):
+        # spawn avoids forking a process that already runs threads and an event loop
+        return ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker
+        )
+
+    def start(self):
+        """Start the worker processes"""
+        if not self._shards:
+            self._shards = [self._create_shard() for _ in range(self.workers)]
+            logger.info(f"Detection process pool started with {self.workers} workers")
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        for shard in self._shards:
+            shard.shutdown(wait=False, cancel_futures=True)
+        self._shards = []
+
+    def shard_for(self, cabin_no: int):
+        """Index of the worker that owns the cabin"""
+        # Stable only because cabin numbers are ints (hash(n) == n); str
+        # hashes are salted per process and would move cabins between runs
+        return hash(cabin_no) % len(self._shards)
+
+    async def analyze(self, cabin_no: int, content: bytes, motion_engine: str = None):
+        """Analyze fetched JPEG bytes in the cabin's worker, returns the result dict"""
+        index = self.shard_for(cabin_no)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                self._shards[index], _analyze_in_worker, cabin_no, content, motion_engine
+            )
+        except BrokenProcessPool:
+            # Worker crashed: replace it, its cabins start from a fresh state
+            logger.error(f"Detection worker {index} died, restarting it")
+            self._shards[index].shutdown(wait=False, cancel_futures=True)
+            self._shards[index] = self._create_shard()
+            raise
@@ -15,6 +15,11 @@ class AlertSeverity(str, Enum):
     error = "error"
     critical = "critical"
 
+class MotionEngine(str, Enum):
+    frame_diff = "frame_diff"
+    running_average = "running_average"
+    mog2 = "mog2"
+
 class ReportType(str, Enum):
     daily = "daily"
     weekly = "weekly"
@@ -49,6 +54,7 @@ class Cabin(BaseModel):
     student_id: Optional[str] = None
     student_name: Optional[str] = None
     status: CabinStatus = CabinStatus.empty
+    motion_engine: Optional[MotionEngine] = None  # None = detector default
     current_session_start: Optional[datetime] = None
     current_session_duration: int = 0  # seconds
     last_activity: Optional[datetime] = None
@@ -62,6 +68,7 @@ class Cabin(BaseModel):
 class CabinCreate(BaseModel):
     cabin_no: int
     camera_url: str
+    motion_engine: Optional[MotionEngine] = None
 
 class CabinAssign(BaseModel):
     student_id: str
@@ -93,6 +100,7 @@ class Report(BaseModel):
     sessions_count: int
     filename: str
     file_path: str
+    fingerprint: Optional[str] = None  # hash of the report inputs (report cache key)
     created_at: datetime = Field(default_factory=lambda: datetime.utcnow())
     
     class Config:
@@ -104,6 +112,11 @@ class ReportGenerate(BaseModel):
     cabin_no: Optional[int] = None
     date: Optional[str] = None
 
+class ReportBulkGenerate(BaseModel):
+    type: ReportType
+    date: Optional[str] = None
+    cabin_nos: Optional[List[int]] = None  # None = every cabin
+
 # Alert Models
 class Alert(BaseModel):
     id: Optional[str] = Field(default=None, alias="_id")
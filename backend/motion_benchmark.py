@@ -0,0 +1,85 @@
+"""
+Compare motion detection engines on recorded camera frames
+
+Usage:
+    python motion_benchmark.py <frames_dir> [--labels labels.csv] [--scale 4]
+
+frames_dir holds JPEG snapshots of one cabin, processed in file name order.
+labels.csv (optional) has "filename,active" rows with active = 1 or 0 and is
+used to report accuracy; without it engines are compared to frame_diff.
+"""
+import argparse
+import csv
+import time
+from pathlib import Path
+
+from camera_detector import CameraDetector, MOTION_ENGINES
+
+def load_frames(frames_dir: Path):
+    """Read all JPEG files of the directory in name order"""
+    paths = sorted(p for p in frames_dir.iterdir() if p.suffix.lower() in ('.jpg', '.jpeg'))
+    return [(p.name, p.read_bytes()) for p in paths]
+
+def load_labels(labels_path: Path):
+    """Read filename -> expected motion (bool) from a CSV file"""
+    labels = {}
+    with open(labels_path, newline='') as f:
+        for row in csv.reader(f):
+            if len(row) < 2 or row[0] == 'filename':
+                continue
+            labels[row[0].strip()] = row[1].strip() in ('1', 'true', 'True')
+    return labels
+
+def run_engine(engine: str, frames, scale: int):
+    """
+    Run one engine over the frames with a fresh detector
+    Returns: (decisions by file name, CPU milliseconds per frame)
+    """
+    detector = CameraDetector()
+    detector.decode_scale = scale
+
+    # Decode up front so only the motion engine is timed
+    decoded = [(name, detector.to_grayscale(detector.decode_image(content))) for name, content in frames]
+
+    decisions = {}
+    cpu_time = 0.0
+    for name, gray in decoded:
+        started = time.process_time()
+        motion_detected, _ = detector.detect_motion(0, gray, engine)
+        cpu_time += time.process_time() - started
+        decisions[name] = motion_detected
+
+    return decisions, cpu_time * 1000 / max(len(decoded), 1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare motion detection engines")
+    parser.add_argument('frames_dir', type=Path)
+    parser.add_argument('--labels', type=Path, help="CSV file with filename,active rows")
+    parser.add_argument('--scale', type=int, default=1, help="Decode scale (1, 2, 4 or 8)")
+    parser.add_argument('--engines', nargs='+', default=list(MOTION_ENGINES), choices=MOTION_ENGINES)
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames_dir)
+    if len(frames) < 2:
+        print("At least two frames are needed")
+        return
+
+    labels = load_labels(args.labels) if args.labels else None
+    reference = None if labels else run_engine('frame_diff', frames, args.scale)[0]
+
+    print(f"{len(frames)} frames, decode scale 1/{args.scale}")
+    print(f"{'engine':<16} {'ms/frame':>9} {'motion':>7} {'accuracy' if labels else 'agreement':>10}")
+
+    for engine in args.engines:
+        decisions, ms_per_frame = run_engine(engine, frames, args.scale)
+        expected = labels if labels else reference
+
+        # The first frame only initialises the model, so it is not scored
+        scored = [name for name, _ in frames[1:] if name in expected]
+        matches = sum(1 for name in scored if decisions[name] == expected[name])
+        score = matches / len(scored) if scored else 0.0
+
+        print(f"{engine:<16} {ms_per_frame:>9.2f} {sum(decisions.values()):>7} {score:>10.1%}")
+
+if __name__ == "__main__":
+    main()
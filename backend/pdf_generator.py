@@ -13,9 +13,39 @@ from reportlab.graphics.charts.piecharts import Pie
 from reportlab.graphics.charts.linecharts import HorizontalLineChart
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from datetime import datetime, timedelta
+import csv
+import itertools
 import os
 from pathlib import Path
 
+# Bump when the layout changes, so cached reports are rendered again
+TEMPLATE_VERSION = 2
+
+# Session rows per table, about one A4 page
+SESSIONS_PER_TABLE = 35
+
+SESSIONS_HEADER = ['Kabin', 'Öğrenci', 'Başlangıç', 'Bitiş', 'Süre (dk)']
+
+class _LazyStory(list):
+    """
+    Flowable list for doc.build() that is filled from an iterator as the
+    document consumes it, so only a few flowables exist at a time
+    """
+    
+    def __init__(self, flowables, lookahead=4):
+        super().__init__()
+        self._flowables = iter(flowables)
+        self._lookahead = lookahead
+    
+    def __len__(self):
+        # build() checks the length before taking each flowable
+        while super().__len__() < self._lookahead:
+            flowable = next(self._flowables, None)
+            if flowable is None:
+                break
+            self.append(flowable)
+        return super().__len__()
+
 class ModernPDFGenerator:
     """Generate modern, visually appealing PDF reports"""
     
@@ -158,29 +188,55 @@ class ModernPDFGenerator:
         
         return table
     
-    def create_sessions_table(self, sessions):
-        """Create a detailed sessions table"""
-        data = [['Kabin', 'Öğrenci', 'Başlangıç', 'Bitiş', 'Süre (dk)']]
-        
-        for session in sessions[:20]:  # Max 20 sessions
-            start_time = session.get('start_time')
-            end_time = session.get('end_time')
-            duration = session.get('duration', 0)
-            
-            # Format times
-            start_str = start_time.strftime('%d/%m %H:%M') if start_time else '-'
-            end_str = end_time.strftime('%d/%m %H:%M') if end_time else '-'
-            duration_min = round(duration / 60, 1)
-            
-            data.append([
-                str(session.get('cabin_no', '-')),
-                session.get('student_name', 'N/A'),
-                start_str,
-                end_str,
-                str(duration_min)
-            ])
-        
-        table = Table(data, colWidths=[0.8*inch, 1.5*inch, 1.3*inch, 1.3*inch, 1*inch])
+    @staticmethod
+    def session_row(session):
+        """Sessions table row (strings) of a session"""
+        start_time = session.get('start_time')
+        end_time = session.get('end_time')
+        duration = session.get('duration', 0)
+        
+        # Format times
+        start_str = start_time.strftime('%d/%m %H:%M') if start_time else '-'
+        end_str = end_time.strftime('%d/%m %H:%M') if end_time else '-'
+        duration_min = round(duration / 60, 1)
+        
+        return [
+            str(session.get('cabin_no', '-')),
+            session.get('student_name') or 'N/A',
+            start_str,
+            end_str,
+            str(duration_min)
+        ]
+    
+    def iter_session_rows(self, report_data):
+        """
+        Sessions table rows of a report, read lazily from the
+        sessions_file spool (CSV of rows), taken from session_rows or built
+        from the sessions list
+        """
+        if report_data.get('sessions_file'):
+            with open(report_data['sessions_file'], newline='', encoding='utf-8') as f:
+                yield from csv.reader(f)
+        elif report_data.get('session_rows') is not None:
+            yield from report_data['session_rows']
+        else:
+            for session in report_data.get('sessions') or []:
+                yield self.session_row(session)
+    
+    def iter_sessions_tables(self, rows, rows_per_table=SESSIONS_PER_TABLE):
+        """One sessions table per page-sized chunk of rows"""
+        rows = iter(rows)
+        while True:
+            chunk = list(itertools.islice(rows, rows_per_table))
+            if not chunk:
+                return
+            yield self.create_sessions_table(chunk)
+    
+    def create_sessions_table(self, rows):
+        """Create a sessions table, the header repeats on every page it spans"""
+        data = [SESSIONS_HEADER] + list(rows)
+        
+        table = Table(data, colWidths=[0.8*inch, 1.5*inch, 1.3*inch, 1.3*inch, 1*inch], repeatRows=1)
         table.setStyle(TableStyle([
             # Header
             ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2563eb')),
@@ -207,6 +263,7 @@ class ModernPDFGenerator:
     def generate_report(self, report_data, output_path):
         """
         Generate complete PDF report
+        output_path: file path, or a writable binary buffer (e.g. io.BytesIO)
         
         report_data = {
             'type': 'daily/weekly/monthly',
@@ -220,7 +277,10 @@ class ModernPDFGenerator:
                 'Ortalama Oturum': '1.5 saat',
                 'En Uzun Oturum': '3.2 saat'
             },
-            'sessions': [...],  # List of session dicts
+            'sessions': [...],  # List of session dicts, or:
+            'sessions_file': '/tmp/....csv',  # Spooled table rows (see session_row)
+            'session_rows': [[...], ...],  # or the table rows themselves
+            'sessions_count': 8,
             'daily_breakdown': {
                 'labels': ['Pts', 'Sal', 'Çar', ...],
                 'values': [5, 8, 6, ...]
@@ -228,7 +288,8 @@ class ModernPDFGenerator:
         }
         """
         # Create reports directory if not exists
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        if isinstance(output_path, (str, Path)):
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
         
         # Create PDF document
         doc = SimpleDocTemplate(
@@ -280,30 +341,21 @@ class ModernPDFGenerator:
             
             elements.append(Spacer(1, 0.3*inch))
         
-        # Sessions table
-        if report_data.get('sessions') and len(report_data['sessions']) > 0:
+        # Sessions tables, built while the document is laid out
+        sessions_tables = []
+        sessions_count = report_data.get('sessions_count', len(report_data.get('sessions') or []))
+        if sessions_count > 0:
             elements.append(Paragraph("📝 Oturum Detayları", self.styles['SectionHeader']))
             elements.append(Spacer(1, 0.1*inch))
             
-            sessions_table = self.create_sessions_table(report_data['sessions'])
-            elements.append(sessions_table)
-            
-            if len(report_data['sessions']) > 20:
-                note = Paragraph(
-                    f"<i>Not: İlk 20 oturum gösterilmektedir. Toplam {len(report_data['sessions'])} oturum.</i>",
-                    self.styles['InfoText']
-                )
-                elements.append(Spacer(1, 0.1*inch))
-                elements.append(note)
+            sessions_tables = self.iter_sessions_tables(self.iter_session_rows(report_data))
         
         # Footer with generation time
-        elements.append(Spacer(1, 0.5*inch))
         footer_text = f"<i>Rapor Oluşturma Zamanı: {datetime.now().strftime('%d/%m/%Y %H:%M')}</i>"
-        footer = Paragraph(footer_text, self.styles['InfoText'])
-        elements.append(footer)
+        footer = [Spacer(1, 0.5*inch), Paragraph(footer_text, self.styles['InfoText'])]
         
         # Build PDF
-        doc.build(elements)
+        doc.build(_LazyStory(itertools.chain(elements, sessions_tables, footer)))
         
         return output_path
 
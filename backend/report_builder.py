@@ -0,0 +1,151 @@
+"""
+Report inputs
+Totals, chart data, fingerprint and table rows of a report, built while its
+sessions are streamed from the database
+"""
+import csv
+import os
+import tempfile
+import uuid
+from pathlib import Path
+
+from models import Report, ReportType
+from pdf_generator import pdf_generator
+from report_cache import ReportFingerprint
+
+REPORTS_DIR = Path(__file__).parent / "reports"
+
+def remove_sessions_file(pdf_data: dict):
+    """Remove the spooled session rows of a rendered (or dropped) report"""
+    path = pdf_data.get('sessions_file')
+    if path and os.path.exists(path):
+        os.remove(path)
+
+class ReportBuilder:
+    """
+    Build one report from its sessions, added one by one.
+
+    Only running totals are kept in memory. With rows='spool' the sessions
+    table rows are written to a temporary CSV file that the PDF renderer
+    reads page by page; the file belongs to the report job once the PDF
+    data is submitted, otherwise discard() removes it. rows='memory' keeps
+    the rows in the PDF data instead (previews, nothing touches the disk).
+    With rows=None only the totals and the fingerprint are built (to look
+    the report up before rendering it).
+    """
+
+    def __init__(self, report_type: str, cabin_no, period: tuple, student_name: str, rows='spool'):
+        self.report_type = ReportType(report_type)
+        self.cabin_no = cabin_no
+        self.period = period
+        self.student_name = student_name
+        self.rows = rows
+
+        self.total_seconds = 0
+        self.sessions_count = 0
+        self.max_duration = 0
+        self.daily_totals = {}  # 'dd/mm' -> hours
+        self._fingerprint = ReportFingerprint(self.report_type, period, cabin_no, student_name)
+        self._file = None
+        self._writer = None
+        self.sessions_file = None
+        self.session_rows = [] if rows == 'memory' else None
+
+    def add(self, session: dict):
+        """Add a session (in table order)"""
+        duration = session.get('duration', 0)
+        self.total_seconds += duration
+        self.sessions_count += 1
+        self.max_duration = max(self.max_duration, duration)
+
+        start_time = session.get('start_time')
+        if start_time:
+            day_key = start_time.strftime('%d/%m')
+            self.daily_totals[day_key] = self.daily_totals.get(day_key, 0) + duration / 3600
+
+        self._fingerprint.add(session)
+
+        if self.rows == 'memory':
+            self.session_rows.append(pdf_generator.session_row(session))
+            return
+        if self.rows != 'spool':
+            return
+        if self._writer is None:
+            self._file = tempfile.NamedTemporaryFile(
+                'w', prefix='report_sessions_', suffix='.csv', newline='', encoding='utf-8', delete=False
+            )
+            self._writer = csv.writer(self._file)
+            self.sessions_file = self._file.name
+        self._writer.writerow(pdf_generator.session_row(session))
+
+    def finish(self):
+        """
+        Close the spool and build the PDF data, Report entry and summary
+        Returns: (pdf_data, report, summary)
+        """
+        if self._file is not None:
+            self._file.close()
+
+        start_date, end_date, date_str, title = self.period
+        cabin_no = self.cabin_no
+        total_hours = self.total_seconds / 3600
+        avg_duration = self.total_seconds / self.sessions_count if self.sessions_count > 0 else 0
+
+        # Sort by date and prepare chart data
+        sorted_days = sorted(self.daily_totals.items())
+        daily_breakdown = {
+            'labels': [day for day, _ in sorted_days[-7:]],  # Last 7 days
+            'values': [round(hours, 1) for _, hours in sorted_days[-7:]]
+        }
+
+        # Same inputs give the same fingerprint (and file), see report_cache
+        fingerprint = self._fingerprint.hexdigest()
+        filename = f"report_{self.report_type.value}_{date_str}_cabin{cabin_no if cabin_no else 'all'}_{fingerprint[:12]}.pdf"
+
+        pdf_data = {
+            'type': self.report_type,
+            'title': title,
+            'period': f"{start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')}",
+            'student_name': self.student_name if cabin_no else None,
+            'cabin_no': cabin_no,
+            'stats': {
+                'Toplam Çalışma Saati': f"{round(total_hours, 1)} saat",
+                'Toplam Oturum Sayısı': f"{self.sessions_count} oturum",
+                'Ortalama Oturum Süresi': f"{round(avg_duration / 60, 1)} dakika",
+                'En Uzun Oturum': f"{round(self.max_duration / 60, 1)} dakika",
+                'Günlük Ortalama': f"{round(total_hours / 7, 1)} saat" if self.report_type == 'weekly' else f"{round(total_hours / 30, 1)} saat"
+            },
+            'sessions_file': self.sessions_file,
+            'session_rows': self.session_rows,
+            'sessions_count': self.sessions_count,
+            'daily_breakdown': daily_breakdown if daily_breakdown['values'] else None
+        }
+
+        # Report entry, stored once the PDF is rendered
+        report = Report(
+            id=f"report_{uuid.uuid4().hex}",
+            type=self.report_type,
+            date=date_str,
+            cabin_no=cabin_no,
+            student_name=self.student_name,
+            total_hours=round(total_hours, 1),
+            sessions_count=self.sessions_count,
+            filename=filename,
+            file_path=str(REPORTS_DIR / filename),
+            fingerprint=fingerprint
+        )
+
+        summary = {
+            "period": pdf_data['period'],
+            "total_hours": round(total_hours, 1),
+            "sessions_count": self.sessions_count,
+            "student": self.student_name
+        }
+
+        return pdf_data, report, summary
+
+    def discard(self):
+        """Remove the spooled rows (report not rendered)"""
+        if self._file is not None:
+            self._file.close()
+        remove_sessions_file({'sessions_file': self.sessions_file})
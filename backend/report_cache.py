@@ -0,0 +1,135 @@
+"""
+Content-addressed report cache
+Reports with identical inputs reuse the PDF already rendered for them
+"""
+import hashlib
+import json
+import logging
+import os
+
+from pdf_generator import TEMPLATE_VERSION
+
+logger = logging.getLogger(__name__)
+
+# MongoDB database instance (will be set from server.py)
+db = None
+
+def set_database(database):
+    """Set the database instance from server.py"""
+    global db
+    db = database
+
+def _timestamp(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+def _encode(value):
+    return json.dumps(value, sort_keys=True, default=str, ensure_ascii=False).encode('utf-8') + b'\n'
+
+class ReportFingerprint:
+    """
+    Hash of everything a report PDF is rendered from: template version,
+    type, period, cabin, student and the sessions (id, times, duration).
+    Sessions are added one by one in the order they are rendered in.
+    """
+
+    def __init__(self, report_type: str, period: tuple, cabin_no, student_name):
+        start_date, end_date, date_str, title = period
+        self._hash = hashlib.sha256(_encode({
+            'template': TEMPLATE_VERSION,
+            'type': str(getattr(report_type, 'value', report_type)),
+            'period': [_timestamp(start_date), _timestamp(end_date), date_str, title],
+            'cabin_no': cabin_no,
+            'student_name': student_name
+        }))
+
+    def add(self, session: dict):
+        self._hash.update(_encode([
+            str(session.get('_id')), session.get('cabin_no'), session.get('student_name'),
+            _timestamp(session.get('start_time')), _timestamp(session.get('end_time')), session.get('duration', 0)
+        ]))
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+class ReportCache:
+    """
+    Look up reports by fingerprint and keep report files under a disk budget.
+
+    A report whose inputs did not change (e.g. a closed past day or week)
+    has the same fingerprint, so its stored record and PDF are returned
+    instead of rendering again. When the files of all reports exceed
+    max_bytes, the oldest reports (record and file) are removed.
+    """
+
+    def __init__(self):
+        self.max_bytes = int(float(os.environ.get('REPORT_CACHE_MAX_MB', 512)) * 1024 * 1024)
+        self._hits = 0
+        self._misses = 0
+        self._evicted = 0
+
+    def stats(self):
+        """Hit, miss and eviction counters"""
+        return {'hits': self._hits, 'misses': self._misses, 'evicted': self._evicted}
+
+    async def lookup(self, fingerprint: str):
+        """
+        Stored report with this fingerprint whose file still exists, or None
+        Records whose file is gone are removed.
+        """
+        report = await db.reports.find_one({'fingerprint': fingerprint})
+        if report and report.get('file_path') and os.path.exists(report['file_path']):
+            self._hits += 1
+            return report
+        if report:
+            await db.reports.delete_many({'fingerprint': fingerprint})
+        self._misses += 1
+        return None
+
+    async def enforce_budget(self, keep=()):
+        """
+        Remove the oldest reports until their files fit into max_bytes
+        keep: fingerprints that are never removed (reports returned by the
+            current request or being rendered); they still count as used
+        Returns: number of reports removed
+        """
+        keep = set(keep)
+        reports = await db.reports.find(
+            {}, {'file_path': 1, 'fingerprint': 1, 'created_at': 1}
+        ).sort('created_at', -1).to_list(None)
+
+        used = 0
+        kept_paths = set()
+        evicted = []
+        for report in sorted(reports, key=lambda report: report.get('fingerprint') not in keep):
+            path = report.get('file_path')
+            if path in kept_paths:
+                continue
+            try:
+                size = os.path.getsize(path) if path else None
+            except OSError:
+                size = None
+            if size is None:
+                evicted.append(report)  # file is gone, drop the record
+            elif used + size <= self.max_bytes or report.get('fingerprint') in keep:
+                used += size
+                kept_paths.add(path)
+            else:
+                evicted.append(report)
+
+        if not evicted:
+            return 0
+
+        await db.reports.delete_many({'_id': {'$in': [report['_id'] for report in evicted]}})
+        for path in {report.get('file_path') for report in evicted} - kept_paths - {None}:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not remove report file {path}: {e}")
+        self._evicted += len(evicted)
+        logger.info(f"Report cache evicted {len(evicted)} reports ({used / 1024 / 1024:.1f} MB kept)")
+        return len(evicted)
+
+# Global report cache instance
+report_cache = ReportCache()
@@ -0,0 +1,218 @@
+"""
+Report rendering jobs
+PDF layout runs in worker processes so ReportLab never blocks the event loop
+"""
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+
+from broadcast_hub import broadcast_hub
+from report_builder import remove_sessions_file
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ('pending', 'done', 'failed')
+
+def _render_in_worker(pdf_data: dict, output_path: str):
+    """Render a PDF inside the worker process"""
+    from pdf_generator import pdf_generator
+
+    # Write next to the target and rename, so parallel jobs for the same
+    # file never leave a half-written PDF behind
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    # The reports directory is not tracked, create it on first use
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    try:
+        pdf_generator.generate_report(pdf_data, tmp_path)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return output_path
+
+def _render_bytes_in_worker(pdf_data: dict):
+    """Render a PDF into memory inside the worker process"""
+    from pdf_generator import pdf_generator
+
+    buffer = io.BytesIO()
+    pdf_generator.generate_report(pdf_data, buffer)
+    return buffer.getvalue()
+
+class ReportJobQueue:
+    """
+    Render report PDFs in a process pool.
+
+    submit() returns a job immediately. A job holds one or more PDFs, which
+    are rendered by the worker processes (in parallel on separate cores);
+    the job's on_complete coroutine then stores the reports of the PDFs that
+    were written. Job state is kept in memory for the last max_jobs jobs and
+    every change is sent to dashboard clients as a report_jobs entry of the
+    next delta.
+
+    Workers are started with spawn, so a script that starts the server
+    in-process must do so under if __name__ == '__main__' (see
+    ProcessDetectionPool).
+    """
+
+    def __init__(self):
+        self.workers = int(os.environ.get('REPORT_WORKERS', min(os.cpu_count() or 1, 4)))
+        self.max_jobs = int(os.environ.get('REPORT_JOB_HISTORY', 200))
+        self._executor = None
+        self._jobs = OrderedDict()  # job_id -> job state, oldest first
+        self._tasks = set()
+
+    def _create_executor(self):
+        # spawn avoids forking a process that already runs threads and an event loop
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+
+    def _restart(self, executor):
+        """A worker crashed: replace the pool, queued jobs of the old one fail too"""
+        logger.error("Report worker died, restarting the pool")
+        if self._executor is executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._create_executor()
+
+    def start(self):
+        """Create the worker pool (processes start with the first job)"""
+        if self._executor is None:
+            self._executor = self._create_executor()
+            logger.info(f"Report pool started with {self.workers} workers")
+
+    async def stop(self):
+        """Cancel unfinished jobs and stop the worker processes"""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self):
+        """Job counts by status"""
+        counts = {job_status: 0 for job_status in JOB_STATUSES}
+        for job in self._jobs.values():
+            counts[job['status']] += 1
+        return {'workers': self.workers, **counts}
+
+    def get(self, job_id: str):
+        """Copy of a job's state, or None"""
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    def pending_fingerprints(self):
+        """Fingerprints of the reports that pending jobs render"""
+        return {fingerprint for job in self._jobs.values() if job['status'] == 'pending'
+                for fingerprint in job.get('fingerprints', ())}
+
+    def pending_for(self, fingerprint: str):
+        """Copy of a pending job that renders a report with this fingerprint, or None"""
+        for job in self._jobs.values():
+            if job['status'] == 'pending' and fingerprint in job.get('fingerprints', ()):
+                return dict(job)
+        return None
+
+    async def render(self, pdf_data: dict):
+        """
+        Render one PDF in the pool without writing it to disk (previews)
+        Returns: the PDF bytes
+        """
+        self.start()
+        executor = self._executor
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, _render_bytes_in_worker, pdf_data)
+        except BrokenProcessPool:
+            self._restart(executor)
+            raise RuntimeError('report worker crashed')
+        finally:
+            remove_sessions_file(pdf_data)
+
+    def submit(self, renders, on_complete, **info):
+        """
+        Queue reports for rendering
+        renders: [(pdf_data, output_path), ...]
+        on_complete: async (rendered: [bool, ...]) -> stored report dicts,
+            called once every PDF is done (if at least one was written)
+        info: extra fields shown in the job state (type, cabin_no, ...)
+        Returns: the job state
+        """
+        renders = list(renders)
+        self.start()
+        job = {
+            'id': f"job_{uuid.uuid4().hex}",
+            'status': 'pending',
+            **info,
+            'total': len(renders),
+            'rendered': 0,
+            'failed': 0,
+            'report_ids': [],
+            'error': None,
+            'created_at': datetime.now(timezone.utc),
+            'finished_at': None
+        }
+        self._jobs[job['id']] = job
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+
+        task = asyncio.create_task(self._run(job, renders, on_complete))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        broadcast_hub.publish_report_job(dict(job))
+        return dict(job)
+
+    async def _render(self, job: dict, executor, pdf_data: dict, output_path: str):
+        """Render one PDF of a job, returns True if it was written"""
+        try:
+            await asyncio.get_running_loop().run_in_executor(executor, _render_in_worker, pdf_data, output_path)
+            job['rendered'] += 1
+            return True
+        except BrokenProcessPool:
+            raise
+        except Exception as e:
+            logger.error(f"Error rendering {output_path} of {job['id']}: {e!r}")
+            job['failed'] += 1
+            job['error'] = str(e) or type(e).__name__
+            return False
+        finally:
+            if job['total'] > 1:
+                # Progress of bulk jobs
+                broadcast_hub.publish_report_job(dict(job))
+
+    async def _run(self, job: dict, renders: list, on_complete):
+        executor = self._executor
+        try:
+            rendered = await asyncio.gather(
+                *(self._render(job, executor, pdf_data, output_path) for pdf_data, output_path in renders)
+            )
+            reports = await on_complete(rendered) if any(rendered) else []
+            job.update(
+                status='done' if reports else 'failed',
+                report_ids=[report['_id'] for report in reports]
+            )
+        except asyncio.CancelledError:
+            job.update(status='failed', error='cancelled')
+            raise
+        except BrokenProcessPool:
+            self._restart(executor)
+            job.update(status='failed', error='report worker crashed')
+        except Exception as e:
+            logger.error(f"Error rendering report {job['id']}: {e!r}")
+            job.update(status='failed', error=str(e) or type(e).__name__)
+        finally:
+            for pdf_data, _ in renders:
+                remove_sessions_file(pdf_data)
+            job['finished_at'] = datetime.now(timezone.utc)
+            broadcast_hub.publish_report_job(dict(job))
+
+# Global report job queue instance
+report_jobs = ReportJobQueue()
@@ -0,0 +1,137 @@
+"""
+Response cache for dashboard endpoints
+Serialized answers keyed by endpoint and parameters, invalidated by write events
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+# Tags of the data a cached response depends on
+CABINS = 'cabins'  # cabin set, statuses and assignments
+SESSIONS = 'sessions'  # recorded sessions and their rollups
+ALERTS = 'alerts'
+
+def _etag_matches(if_none_match: str, etag: str):
+    """True if an If-None-Match header contains the ETag (weak or strong)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return etag in candidates or f"W/{etag}" in candidates
+
+class _Entry:
+    def __init__(self, body: bytes, tags, expires: float):
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        self.tags = tags
+        self.expires = expires
+
+class ResponseCache:
+    """
+    Cache of JSON response bodies.
+
+    Each entry is tagged with the data it was computed from and dropped when
+    invalidate() is called for one of its tags, or after ttl seconds at the
+    latest. Concurrent misses for the same key share one computation. A
+    result computed while one of its tags was invalidated is returned but
+    not stored. Responses carry an ETag; a matching If-None-Match gets
+    304 Not Modified.
+    """
+
+    def __init__(self):
+        self.ttl = float(os.environ.get('RESPONSE_CACHE_TTL', 30))  # seconds
+        self._entries = {}  # key -> _Entry
+        self._inflight = {}  # key -> Task computing the _Entry
+        self._generations = {}  # tag -> invalidation count
+
+        self._hits = 0
+        self._misses = 0
+        self._not_modified = 0
+        self._invalidations = 0
+
+    def stats(self):
+        """Entry and hit counters"""
+        return {
+            'entries': len(self._entries),
+            'hits': self._hits,
+            'misses': self._misses,
+            'not_modified': self._not_modified,
+            'invalidations': self._invalidations
+        }
+
+    def invalidate(self, *tags):
+        """Drop the entries that depend on any of the tags"""
+        tags = set(tags)
+        for tag in tags:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+        stale = [key for key, entry in self._entries.items() if entry.tags & tags]
+        for key in stale:
+            del self._entries[key]
+        self._invalidations += 1
+
+    def clear(self):
+        """Drop every entry (e.g. after a reset)"""
+        self._entries = {}
+        self.invalidate(CABINS, SESSIONS, ALERTS)
+
+    async def respond(self, request: Request, tags, compute):
+        """
+        Cached JSON response for the request's path and query
+        tags: data the response depends on
+        compute: async () -> JSON-encodable value, called on a miss
+        """
+        key = request.url.path + ('?' + str(request.query_params) if request.query_params else '')
+        entry = await self._get(key, frozenset(tags), compute)
+
+        headers = {'ETag': entry.etag, 'Cache-Control': 'no-cache'}
+        if _etag_matches(request.headers.get('if-none-match'), entry.etag):
+            self._not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type='application/json', headers=headers)
+
+    async def _get(self, key: str, tags, compute):
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires > time.monotonic():
+            self._hits += 1
+            return entry
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._hits += 1
+            return await asyncio.shield(inflight)
+
+        # The computation runs in its own task: a caller that goes away
+        # (client disconnected) does not cancel it for the other waiters
+        self._misses += 1
+        task = asyncio.create_task(self._compute(key, tags, compute))
+        self._inflight[key] = task
+        task.add_done_callback(self._computed)
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: str, tags, compute):
+        generations = {tag: self._generations.get(tag, 0) for tag in tags}
+        try:
+            value = await compute()
+            body = json.dumps(jsonable_encoder(value), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            entry = _Entry(body, tags, time.monotonic() + self.ttl)
+            if all(self._generations.get(tag, 0) == generation for tag, generation in generations.items()):
+                self._entries[key] = entry
+            return entry
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+
+    @staticmethod
+    def _computed(task):
+        # Waiters get the error; if every caller went away nobody else retrieves it
+        if not task.cancelled():
+            task.exception()
+
+# Global response cache instance
+response_cache = ResponseCache()
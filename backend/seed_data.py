@@ -9,6 +9,8 @@ from dotenv import load_dotenv
 from pathlib import Path
 import random
 
+import session_rollups as session_rollups_module
+
 ROOT_DIR = Path(__file__).parent
 
 # .env dosyasını yükle (varsa)
@@ -190,12 +192,20 @@ async def seed_telegram_config():
     )
     print("✅ Seeded Telegram config")
 
+async def seed_session_rollups():
+    """Rebuild session rollups from the seeded sessions"""
+    print("Rebuilding session rollups...")
+    session_rollups_module.set_database(db)
+    count = await session_rollups_module.session_rollups.rebuild()
+    print(f"✅ Rebuilt {count} session rollups")
+
 async def main():
     print("🌱 Starting database seeding...")
     print(f"Database: {os.environ['DB_NAME']}")
     
     await seed_cabins()
     await seed_sessions()
+    await seed_session_rollups()
     await seed_alerts()
     await seed_reports()
     await seed_telegram_config()
@@ -1,8 +1,10 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, Request, Response, status, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Query, Request, Response, status, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse, FileResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
 import os
 import logging
 from pathlib import Path
@@ -10,8 +12,12 @@ from typing import List, Optional
 import uuid
 from datetime import datetime, timedelta, timezone
 
+ROOT_DIR = Path(__file__).parent
+# Load .env before importing modules that read their settings at import time
+load_dotenv(ROOT_DIR / '.env')
+
 from models import (
-    Cabin, CabinCreate, CabinAssign, Session, Report, ReportGenerate,
+    Cabin, CabinCreate, CabinAssign, Session, Report, ReportGenerate, ReportBulkGenerate,
     Alert, TelegramConfig, TelegramConfigUpdate, Stats, ActivityData,
     ActivityDataPoint, User, AuthSessionRequest, SessionData, CabinStatus,
     SimpleLoginRequest, SimpleLoginResponse
@@ -19,10 +25,17 @@ from models import (
 import auth
 from auth import process_google_session, get_current_user, logout_user, create_session_cookie, clear_session_cookie, simple_login
 import tracker_service as tracker_module
-from tracker_service import tracker_service, active_connections
-
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
+from tracker_service import tracker_service
+from broadcast_hub import broadcast_hub
+import cabin_store as cabin_store_module
+from cabin_store import cabin_store
+import session_rollups as session_rollups_module
+from session_rollups import session_rollups
+from response_cache import response_cache, ALERTS, CABINS, SESSIONS
+from report_jobs import report_jobs
+import report_cache as report_cache_module
+from report_cache import report_cache
+from report_builder import ReportBuilder
 
 # Database connection (MongoDB or Mongita)
 try:
@@ -33,9 +46,12 @@ except ImportError:
     client = AsyncIOMotorClient(mongo_url)
     db = client[os.environ['DB_NAME']]
 
-# Set database for auth and tracker modules
+# Set database for auth, tracker, cabin store, rollup and report cache modules
 auth.set_database(db)
 tracker_module.set_database(db)
+cabin_store_module.set_database(db)
+session_rollups_module.set_database(db)
+report_cache_module.set_database(db)
 
 # Create the main app without a prefix
 app = FastAPI(title="Smart Cabin Monitoring API")
@@ -93,10 +109,9 @@ async def logout(request: Request, response: Response):
 
 # ============= Stats & Dashboard Endpoints =============
 
-@api_router.get("/stats", response_model=Stats)
-async def get_stats(current_user: User = Depends(get_current_user)):
-    """Get overall system statistics."""
-    cabins = await db.cabins.find().to_list(1000)
+async def compute_stats() -> Stats:
+    """Build overall statistics from the cabin store and session rollups."""
+    cabins = cabin_store.all()
     
     total_cabins = len(cabins)
     active_cabins = sum(1 for c in cabins if c.get("status") == "active")
@@ -105,20 +120,12 @@ async def get_stats(current_user: User = Depends(get_current_user)):
     empty_cabins = sum(1 for c in cabins if c.get("status") == "empty")
     total_students = sum(1 for c in cabins if c.get("student_id"))
     
-    # Calculate averages from sessions
-    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    # Calculate averages from session rollups
+    today = datetime.now(timezone.utc).date()
     week_ago = today - timedelta(days=7)
     
-    daily_sessions = await db.sessions.find({
-        "start_time": {"$gte": today}
-    }).to_list(1000)
-    
-    weekly_sessions = await db.sessions.find({
-        "start_time": {"$gte": week_ago}
-    }).to_list(1000)
-    
-    avg_daily_hours = sum(s.get("duration", 0) for s in daily_sessions) / 3600 / max(total_students, 1)
-    avg_weekly_hours = sum(s.get("duration", 0) for s in weekly_sessions) / 3600 / max(total_students, 1)
+    avg_daily_hours = session_rollups.total_seconds(today) / 3600 / max(total_students, 1)
+    avg_weekly_hours = session_rollups.total_seconds(week_ago) / 3600 / max(total_students, 1)
     
     return Stats(
         total_cabins=total_cabins,
@@ -131,20 +138,17 @@ async def get_stats(current_user: User = Depends(get_current_user)):
         avg_weekly_hours=round(avg_weekly_hours, 1)
     )
 
-@api_router.get("/activity/daily")
-async def get_daily_activity(current_user: User = Depends(get_current_user)):
-    """Get daily activity chart data."""
-    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    sessions = await db.sessions.find({
-        "start_time": {"$gte": today}
-    }).to_list(1000)
+@api_router.get("/stats", response_model=Stats)
+async def get_stats(request: Request, current_user: User = Depends(get_current_user)):
+    """Get overall system statistics."""
+    return await response_cache.respond(request, [CABINS, SESSIONS], compute_stats)
+
+async def daily_activity():
+    """Sessions started per hour today, 08:00 to 19:00."""
+    today = datetime.now(timezone.utc).date()
     
-    # Group by hour
-    hourly_counts = {}
-    for session in sessions:
-        hour = session["start_time"].hour
-        hourly_counts[hour] = hourly_counts.get(hour, 0) + 1
+    # Sessions started per hour (UTC)
+    hourly_counts = session_rollups.hourly_counts(today)
     
     # Create response for 08:00 to 19:00
     data = []
@@ -156,22 +160,20 @@ async def get_daily_activity(current_user: User = Depends(get_current_user)):
     
     return data
 
-@api_router.get("/activity/weekly")
-async def get_weekly_activity(current_user: User = Depends(get_current_user)):
-    """Get weekly activity chart data."""
-    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+@api_router.get("/activity/daily")
+async def get_daily_activity(request: Request, current_user: User = Depends(get_current_user)):
+    """Get daily activity chart data."""
+    return await response_cache.respond(request, [SESSIONS], daily_activity)
+
+async def weekly_activity():
+    """Session hours per weekday over the last week."""
+    today = datetime.now(timezone.utc).date()
     week_ago = today - timedelta(days=7)
     
-    sessions = await db.sessions.find({
-        "start_time": {"$gte": week_ago}
-    }).to_list(1000)
-    
-    # Group by day
+    # Group by weekday
     daily_hours = {}
-    for session in sessions:
-        day = session["start_time"].weekday()
-        hours = session.get("duration", 0) / 3600
-        daily_hours[day] = daily_hours.get(day, 0) + hours
+    for day, seconds in session_rollups.daily_seconds(week_ago).items():
+        daily_hours[day.weekday()] = daily_hours.get(day.weekday(), 0) + seconds / 3600
     
     # Create response
     days = ["Pzt", "Sal", "Çar", "Per", "Cum", "Cmt", "Paz"]
@@ -184,24 +186,33 @@ async def get_weekly_activity(current_user: User = Depends(get_current_user)):
     
     return data
 
+@api_router.get("/activity/weekly")
+async def get_weekly_activity(request: Request, current_user: User = Depends(get_current_user)):
+    """Get weekly activity chart data."""
+    return await response_cache.respond(request, [SESSIONS], weekly_activity)
+
+async def active_alerts():
+    """Unresolved alerts (at most 100)."""
+    alerts = await db.alerts.find({"resolved": False}).to_list(100)
+    return [jsonable_encoder(Alert(**alert)) for alert in alerts]
+
 @api_router.get("/alerts", response_model=List[Alert])
-async def get_alerts(current_user: User = Depends(get_current_user)):
+async def get_alerts(request: Request, current_user: User = Depends(get_current_user)):
     """Get active alerts."""
-    alerts = await db.alerts.find({"resolved": False}).to_list(100)
-    return [Alert(**alert) for alert in alerts]
+    return await response_cache.respond(request, [ALERTS], active_alerts)
 
 # ============= Cabin Endpoints =============
 
 @api_router.get("/cabins", response_model=List[Cabin])
 async def get_cabins(current_user: User = Depends(get_current_user)):
     """Get all cabins with current status."""
-    cabins = await db.cabins.find().sort("cabin_no", 1).to_list(1000)
+    cabins = cabin_store.all()
     return [Cabin(**cabin) for cabin in cabins]
 
 @api_router.get("/cabins/{cabin_no}", response_model=Cabin)
 async def get_cabin(cabin_no: int, current_user: User = Depends(get_current_user)):
     """Get specific cabin details."""
-    cabin = await db.cabins.find_one({"cabin_no": cabin_no})
+    cabin = cabin_store.get(cabin_no)
     if not cabin:
         raise HTTPException(status_code=404, detail="Cabin not found")
     return Cabin(**cabin)
@@ -209,74 +220,75 @@ async def get_cabin(cabin_no: int, current_user: User = Depends(get_current_user
 @api_router.post("/cabins/{cabin_no}/assign", response_model=Cabin)
 async def assign_student(cabin_no: int, data: CabinAssign, current_user: User = Depends(get_current_user)):
     """Assign student to cabin."""
-    cabin = await db.cabins.find_one({"cabin_no": cabin_no})
-    if not cabin:
-        raise HTTPException(status_code=404, detail="Cabin not found")
-    
     update_data = {
         "student_id": data.student_id,
         "student_name": data.student_name,
         "updated_at": datetime.now(timezone.utc)
     }
     
-    await db.cabins.update_one(
-        {"cabin_no": cabin_no},
-        {"$set": update_data}
-    )
-    
-    updated_cabin = await db.cabins.find_one({"cabin_no": cabin_no})
+    updated_cabin = await cabin_store.update(cabin_no, update_data)
+    if not updated_cabin:
+        raise HTTPException(status_code=404, detail="Cabin not found")
+    publish_cabin(updated_cabin)
     return Cabin(**updated_cabin)
 
 @api_router.delete("/cabins/{cabin_no}/unassign")
 async def unassign_student(cabin_no: int, current_user: User = Depends(get_current_user)):
     """Remove student from cabin."""
-    cabin = await db.cabins.find_one({"cabin_no": cabin_no})
-    if not cabin:
+    updated_cabin = await cabin_store.update(cabin_no, {
+        "student_id": None,
+        "student_name": None,
+        "status": "empty",
+        "updated_at": datetime.now(timezone.utc)
+    })
+    if not updated_cabin:
         raise HTTPException(status_code=404, detail="Cabin not found")
-    
-    await db.cabins.update_one(
-        {"cabin_no": cabin_no},
-        {"$set": {
-            "student_id": None,
-            "student_name": None,
-            "status": "empty",
-            "updated_at": datetime.now(timezone.utc)
-        }}
-    )
+    publish_cabin(updated_cabin)
     
     return {"message": "Student unassigned successfully"}
 
 # ============= Students Endpoints =============
 
 @api_router.get("/students")
-async def get_students(current_user: User = Depends(get_current_user)):
-    """Get all students with their cabin assignments."""
-    cabins = await db.cabins.find({"student_id": {"$ne": None}}).sort("cabin_no", 1).to_list(1000)
+async def get_students(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(0, ge=0, description="0 returns all"),
+    fields: Optional[str] = Query(None, description="Comma separated fields to return, e.g. cabin_no,student_name,daily_total"),
+    include_unassigned: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get all students with their cabin assignments and daily/weekly totals.
+    The total count is returned in the X-Total-Count header.
+    """
+    cabins = cabin_store.all()
+    if not include_unassigned:
+        cabins = [c for c in cabins if c.get("student_id") is not None]
+    response.headers["X-Total-Count"] = str(len(cabins))
+    cabins = cabins[skip:skip + limit if limit else None]
+    
+    # Daily and weekly totals of all cabins from the session rollups
+    today = datetime.now(timezone.utc).date()
+    week_ago = today - timedelta(days=7)
+    daily_totals = session_rollups.cabin_totals(today)
+    weekly_totals = session_rollups.cabin_totals(week_ago)
+    
+    # Optional projection (cabin_no is always returned)
+    selected = None
+    if fields:
+        selected = {field.strip() for field in fields.split(",") if field.strip()} | {"cabin_no"}
     
     students = []
     for cabin in cabins:
-        # Get daily and weekly totals
-        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-        week_ago = today - timedelta(days=7)
-        
-        daily_sessions = await db.sessions.find({
-            "cabin_no": cabin["cabin_no"],
-            "start_time": {"$gte": today}
-        }).to_list(1000)
-        
-        weekly_sessions = await db.sessions.find({
-            "cabin_no": cabin["cabin_no"],
-            "start_time": {"$gte": week_ago}
-        }).to_list(1000)
-        
-        daily_total = sum(s.get("duration", 0) for s in daily_sessions)
-        weekly_total = sum(s.get("duration", 0) for s in weekly_sessions)
-        
-        students.append({
+        student = {
             **cabin,
-            "daily_total": daily_total,
-            "weekly_total": weekly_total
-        })
+            "daily_total": daily_totals.get(cabin["cabin_no"], 0),
+            "weekly_total": weekly_totals.get(cabin["cabin_no"], 0)
+        }
+        if selected:
+            student = {key: value for key, value in student.items() if key in selected}
+        students.append(student)
     
     return students
 
@@ -307,144 +319,298 @@ async def download_report(report_id: str, current_user: User = Depends(get_curre
         filename=report.get('filename', 'report.pdf')
     )
 
-@api_router.post("/reports/generate")
+@api_router.get("/reports/jobs/{job_id}")
+async def get_report_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """Get the status of a report rendering job."""
+    job = report_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return job
+
+def report_period(report_type: str, date: Optional[str] = None):
+    """Date range, date label and title of a report: (start_date, end_date, date_str, title)."""
+    if report_type == 'daily':
+        if date:
+            target_date = datetime.strptime(date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        else:
+            target_date = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        start_date = target_date
+        end_date = target_date + timedelta(days=1)
+        date_str = target_date.strftime("%Y-%m-%d")
+        title = f"Günlük Aktivite Raporu - {target_date.strftime('%d/%m/%Y')}"
+    
+    elif report_type == 'weekly':
+        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        start_date = today - timedelta(days=7)
+        end_date = today
+        date_str = start_date.strftime("%Y-%m-%d")
+        title = "Haftalık Aktivite Raporu"
+    
+    else:  # monthly
+        today = datetime.now(timezone.utc)
+        start_date = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        # Next month's first day
+        if today.month == 12:
+            end_date = today.replace(year=today.year + 1, month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+        else:
+            end_date = today.replace(month=today.month + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
+        date_str = start_date.strftime("%Y-%m")
+        title = f"Aylık Aktivite Raporu - {start_date.strftime('%B %Y')}"
+    
+    return start_date, end_date, date_str, title
+
+# Session fields a report is built from
+REPORT_SESSION_FIELDS = {"cabin_no": 1, "student_name": 1, "start_time": 1, "end_time": 1, "duration": 1}
+
+def report_sessions(period: tuple, cabin_nos: Optional[List[int]] = None):
+    """Cursor over the sessions of a report period in table order, of the given cabins or all cabins."""
+    query = {
+        "start_time": {"$gte": period[0], "$lt": period[1]}
+    }
+    
+    if cabin_nos:
+        query["cabin_no"] = cabin_nos[0] if len(cabin_nos) == 1 else {"$in": cabin_nos}
+    
+    return db.sessions.find(query, REPORT_SESSION_FIELDS).sort([("start_time", 1), ("_id", 1)])
+
+def report_builder(report_type: str, cabin_no: Optional[int], period: tuple, rows=None):
+    """Empty ReportBuilder of a report, with the cabin's student."""
+    student_name = "Tüm Öğrenciler"
+    if cabin_no:
+        cabin = cabin_store.get(cabin_no)
+        if cabin and cabin.get('student_name'):
+            student_name = cabin['student_name']
+    return ReportBuilder(report_type, cabin_no, period, student_name, rows=rows)
+
+async def build_reports(report_type: str, cabin_nos: Optional[List[int]], period: tuple, rows=None):
+    """
+    Read the period's sessions once into one ReportBuilder per cabin
+    (cabin_nos None: a single report of all cabins, keyed None).
+    rows: None to only compute totals and fingerprints, 'spool' or
+    'memory' to also keep the table rows for rendering (see ReportBuilder)
+    """
+    builders = {cabin_no: report_builder(report_type, cabin_no, period, rows) for cabin_no in cabin_nos or [None]}
+    try:
+        async for session in report_sessions(period, cabin_nos):
+            builder = builders.get(session.get("cabin_no")) if cabin_nos else builders[None]
+            if builder:
+                builder.add(session)
+    except Exception:
+        for builder in builders.values():
+            builder.discard()
+        raise
+    return builders
+
+async def build_report(report_type: str, cabin_no: Optional[int], period: tuple, rows=None):
+    """ReportBuilder of one report (one cabin or all cabins), see build_reports."""
+    builders = await build_reports(report_type, [cabin_no] if cabin_no else None, period, rows)
+    return builders[cabin_no or None]
+
+# Single-flight generate requests: fingerprint -> future of the first request's response
+report_requests = {}
+
+@api_router.post("/reports/generate", status_code=status.HTTP_202_ACCEPTED)
 async def generate_report(data: ReportGenerate, current_user: User = Depends(get_current_user)):
-    """Generate new report with modern PDF from real session data."""
+    """
+    Generate new report with modern PDF from real session data.
+    The PDF is rendered in the report pool; the returned job announces
+    completion via GET /reports/jobs/{id} and the dashboard WebSocket.
+    A report whose inputs did not change is returned from the cache, and
+    one that is already being rendered (or looked up by another request)
+    returns that job (report is None, its id is in the job's report_ids
+    once done).
+    """
+    builder = None
+    request = None
     try:
-        from pdf_generator import pdf_generator
-        
         # Determine date range
-        if data.type == 'daily':
-            if data.date:
-                target_date = datetime.strptime(data.date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
-            else:
-                target_date = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-            start_date = target_date
-            end_date = target_date + timedelta(days=1)
-            date_str = target_date.strftime("%Y-%m-%d")
-            title = f"Günlük Aktivite Raporu - {target_date.strftime('%d/%m/%Y')}"
-        
-        elif data.type == 'weekly':
-            today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-            start_date = today - timedelta(days=7)
-            end_date = today
-            date_str = start_date.strftime("%Y-%m-%d")
-            title = "Haftalık Aktivite Raporu"
-        
-        else:  # monthly
-            today = datetime.now(timezone.utc)
-            start_date = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            # Next month's first day
-            if today.month == 12:
-                end_date = today.replace(year=today.year + 1, month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-            else:
-                end_date = today.replace(month=today.month + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
-            date_str = start_date.strftime("%Y-%m")
-            title = f"Aylık Aktivite Raporu - {start_date.strftime('%B %Y')}"
-        
-        # Query sessions
-        query = {
-            "start_time": {"$gte": start_date, "$lt": end_date}
-        }
-        
-        if data.cabin_no:
-            query["cabin_no"] = data.cabin_no
-        
-        sessions = await db.sessions.find(query).to_list(10000)
-        
-        # Calculate totals and statistics
-        total_seconds = sum(s.get('duration', 0) for s in sessions)
-        total_hours = total_seconds / 3600
-        sessions_count = len(sessions)
+        period = report_period(data.type, data.date)
         
-        # Calculate average and max session duration
-        avg_duration = total_seconds / sessions_count if sessions_count > 0 else 0
-        max_duration = max([s.get('duration', 0) for s in sessions]) if sessions else 0
+        # One pass builds the fingerprint, totals and the spooled table rows
+        builder = await build_report(data.type, data.cabin_no, period, rows='spool')
+        pdf_data, report, summary = builder.finish()
         
-        # Get student name if cabin specific
-        student_name = "Tüm Öğrenciler"
-        if data.cabin_no:
-            cabin = await db.cabins.find_one({"cabin_no": data.cabin_no})
-            if cabin and cabin.get('student_name'):
-                student_name = cabin['student_name']
-        
-        # Prepare daily breakdown for chart
-        daily_breakdown = {
-            'labels': [],
-            'values': []
-        }
-        
-        # Calculate daily totals
-        daily_totals = {}
-        for session in sessions:
-            start_time = session.get('start_time')
-            if start_time:
-                day_key = start_time.strftime('%d/%m')
-                daily_totals[day_key] = daily_totals.get(day_key, 0) + session.get('duration', 0) / 3600
-        
-        # Sort by date and prepare chart data
-        sorted_days = sorted(daily_totals.items())
-        daily_breakdown['labels'] = [day for day, _ in sorted_days[-7:]]  # Last 7 days
-        daily_breakdown['values'] = [round(hours, 1) for _, hours in sorted_days[-7:]]
-        
-        # Create report filename and path
-        filename = f"report_{data.type}_{date_str}_cabin{data.cabin_no if data.cabin_no else 'all'}.pdf"
-        reports_dir = Path(__file__).parent / "reports"
-        reports_dir.mkdir(exist_ok=True)
-        file_path = reports_dir / filename
+        # No await until this request is registered for the fingerprint
+        job = report_jobs.pending_for(report.fingerprint)
+        first = report_requests.get(report.fingerprint)
+        if job or first:
+            builder.discard()
+            builder = None
+            if first:
+                response = await asyncio.shield(first)
+                if response["cached"]:
+                    return {**response, "summary": summary}
+                job = report_jobs.get(response["job"]["id"]) or response["job"]
+            return {
+                "message": "Rapor zaten oluşturuluyor",
+                "job": job,
+                "cached": False,
+                "fingerprint": report.fingerprint,
+                "report": None,
+                "summary": summary
+            }
+        request = asyncio.get_running_loop().create_future()
+        report_requests[report.fingerprint] = request
         
-        # Prepare PDF data
-        pdf_data = {
-            'type': data.type,
-            'title': title,
-            'period': f"{start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')}",
-            'student_name': student_name if data.cabin_no else None,
-            'cabin_no': data.cabin_no,
-            'stats': {
-                'Toplam Çalışma Saati': f"{round(total_hours, 1)} saat",
-                'Toplam Oturum Sayısı': f"{sessions_count} oturum",
-                'Ortalama Oturum Süresi': f"{round(avg_duration / 60, 1)} dakika",
-                'En Uzun Oturum': f"{round(max_duration / 60, 1)} dakika",
-                'Günlük Ortalama': f"{round(total_hours / 7, 1)} saat" if data.type == 'weekly' else f"{round(total_hours / 30, 1)} saat"
-            },
-            'sessions': sessions,
-            'daily_breakdown': daily_breakdown if daily_breakdown['values'] else None
-        }
+        # Unchanged inputs: return the report rendered before
+        cached = await report_cache.lookup(report.fingerprint)
+        if cached:
+            builder.discard()
+            builder = None
+            response = {
+                "message": "Rapor önbellekten alındı",
+                "job": None,
+                "cached": True,
+                "fingerprint": report.fingerprint,
+                "report": Report(**cached).dict(),
+                "summary": summary
+            }
+            request.set_result(response)
+            return response
         
-        # Generate PDF
-        pdf_generator.generate_report(pdf_data, str(file_path))
+        async def store_reports(rendered):
+            await db.reports.insert_one(report.dict(by_alias=True))
+            await report_cache.enforce_budget(keep={report.fingerprint} | report_jobs.pending_fingerprints())
+            return [report.dict(by_alias=True)]
         
-        # Create report entry
-        report = Report(
-            id=f"report_{uuid.uuid4().hex}",
-            type=data.type,
-            date=date_str,
-            cabin_no=data.cabin_no,
-            student_name=student_name,
-            total_hours=round(total_hours, 1),
-            sessions_count=sessions_count,
-            filename=filename,
-            file_path=str(file_path)
+        # Generate PDF in the report pool, the job owns the spooled rows now
+        job = report_jobs.submit(
+            [(pdf_data, report.file_path)], store_reports,
+            type=data.type, cabin_no=data.cabin_no, fingerprints=[report.fingerprint]
         )
+        builder = None
         
-        await db.reports.insert_one(report.dict(by_alias=True))
-        
-        return {
-            "message": "Rapor başarıyla oluşturuldu (modern PDF ile)",
+        response = {
+            "message": "Rapor oluşturma sıraya alındı",
+            "job": job,
+            "cached": False,
+            "fingerprint": report.fingerprint,
             "report": report.dict(),
-            "summary": {
-                "period": f"{start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')}",
-                "total_hours": round(total_hours, 1),
-                "sessions_count": sessions_count,
-                "student": student_name
-            }
+            "summary": summary
         }
+        request.set_result(response)
+        return response
         
+    except HTTPException:
+        # The request this one waited for failed and has logged it
+        raise
     except Exception as e:
         logger.error(f"Error generating report: {e}")
         import traceback
         traceback.print_exc()
+        if request:
+            request.set_exception(HTTPException(status_code=500, detail=str(e)))
+            # Only read by waiting requests, if any
+            request.exception()
         raise HTTPException(status_code=500, detail=str(e))
+    
+    finally:
+        if builder:
+            builder.discard()
+        if request:
+            if not request.done():
+                request.cancel()
+            del report_requests[report.fingerprint]
+
+@api_router.post("/reports/preview")
+async def preview_report(data: ReportGenerate, current_user: User = Depends(get_current_user)):
+    """
+    Render a report for viewing without storing it.
+    The table rows are kept in memory and the PDF is rendered into memory
+    in the report pool, then returned whole; nothing is written to disk and
+    no report entry is created (POST /reports/generate saves it). A stored
+    report with the same inputs is returned as is.
+    """
+    period = report_period(data.type, data.date)
+    pdf_data, report, _ = (await build_report(data.type, data.cabin_no, period, rows='memory')).finish()
+    headers = {"Content-Disposition": f'inline; filename="{report.filename}"'}
+    
+    # Read the stored file at once, the cache may remove it after this request
+    cached = await report_cache.lookup(report.fingerprint)
+    if cached:
+        try:
+            pdf_bytes = await asyncio.to_thread(Path(cached['file_path']).read_bytes)
+            return Response(content=pdf_bytes, media_type='application/pdf', headers=headers)
+        except FileNotFoundError:
+            pass
+    
+    try:
+        pdf_bytes = await report_jobs.render(pdf_data)
+    except Exception as e:
+        logger.error(f"Error rendering report preview: {e!r}")
+        raise HTTPException(status_code=500, detail=str(e) or type(e).__name__)
+    
+    return Response(content=pdf_bytes, media_type='application/pdf', headers=headers)
+
+@api_router.post("/reports/generate-bulk", status_code=status.HTTP_202_ACCEPTED)
+async def generate_bulk_reports(data: ReportBulkGenerate, current_user: User = Depends(get_current_user)):
+    """
+    Generate one report per cabin (all cabins unless cabin_nos is given).
+    One pass over the period's sessions fingerprints every cabin's report
+    and spools its table rows: cabins whose inputs did not change get their
+    cached report, reports other jobs are rendering are listed in pending
+    (the rows of both are dropped). The remaining cabins' PDFs are rendered
+    as one job and stored with one bulk insert (job is None if nothing
+    needs rendering).
+    """
+    period = report_period(data.type, data.date)
+    cabin_nos = data.cabin_nos or [cabin["cabin_no"] for cabin in cabin_store.all()]
+    if not cabin_nos:
+        raise HTTPException(status_code=400, detail="No cabins to report")
+    
+    # Fingerprints and table rows of every cabin's report in one pass over the sessions
+    builders = await build_reports(data.type, cabin_nos, period, rows='spool')
+    
+    reports = []  # every cabin's report (cached or new)
+    pending = []  # reports that other jobs are rendering
+    renders = []
+    new_reports = []  # reports rendered by this job
+    try:
+        for cabin_no in cabin_nos:
+            builder = builders[cabin_no]
+            pdf_data, report, _ = builder.finish()
+            cached = await report_cache.lookup(report.fingerprint)
+            job = report_jobs.pending_for(report.fingerprint) if not cached else None
+            if cached:
+                builder.discard()
+                reports.append(Report(**cached))
+            elif job:
+                builder.discard()
+                pending.append({"cabin_no": cabin_no, "fingerprint": report.fingerprint, "job_id": job["id"]})
+            else:
+                renders.append((pdf_data, report.file_path))
+                new_reports.append(report)
+                reports.append(report)
+    except Exception:
+        # No job took over the spooled rows
+        for builder in builders.values():
+            builder.discard()
+        raise
+    
+    async def store_reports(rendered):
+        docs = [report.dict(by_alias=True) for report, ok in zip(new_reports, rendered) if ok]
+        if docs:
+            await db.reports.insert_many(docs)
+            # Keep every report this request returned, cached ones included
+            await report_cache.enforce_budget(
+                keep={report.fingerprint for report in reports} | report_jobs.pending_fingerprints()
+            )
+        return docs
+    
+    job = None
+    if renders:
+        job = report_jobs.submit(
+            renders, store_reports,
+            type=data.type, cabin_nos=[report.cabin_no for report in new_reports],
+            fingerprints=[report.fingerprint for report in new_reports]
+        )
+    
+    return {
+        "message": f"{len(renders)} rapor oluşturma sıraya alındı, {len(reports) - len(renders)} rapor hazır",
+        "job": job,
+        "reports": [report.dict() for report in reports],
+        "pending": pending
+    }
 
 # ============= Settings Endpoints =============
 
@@ -479,14 +645,14 @@ async def update_telegram_config(data: TelegramConfigUpdate, current_user: User
 @api_router.get("/settings/cameras", response_model=List[Cabin])
 async def get_camera_configs(current_user: User = Depends(get_current_user)):
     """Get camera configurations."""
-    cabins = await db.cabins.find().sort("cabin_no", 1).to_list(1000)
+    cabins = cabin_store.all()
     return [Cabin(**cabin) for cabin in cabins]
 
 @api_router.post("/settings/cameras", response_model=Cabin)
 async def add_camera(data: CabinCreate, current_user: User = Depends(get_current_user)):
     """Add new camera."""
     # Check if cabin already exists
-    existing = await db.cabins.find_one({"cabin_no": data.cabin_no})
+    existing = cabin_store.get(data.cabin_no)
     if existing:
         raise HTTPException(status_code=400, detail="Cabin already exists")
     
@@ -494,53 +660,55 @@ async def add_camera(data: CabinCreate, current_user: User = Depends(get_current
         id=f"cabin_{uuid.uuid4().hex}",
         cabin_no=data.cabin_no,
         camera_url=data.camera_url,
+        motion_engine=data.motion_engine,
         status=CabinStatus.empty
     )
     
-    await db.cabins.insert_one(cabin.dict(by_alias=True))
+    await cabin_store.insert(cabin.dict(by_alias=True))
+    publish_cabin(cabin.dict(by_alias=True))
     return cabin
 
 @api_router.put("/settings/cameras/{cabin_no}", response_model=Cabin)
 async def update_camera(cabin_no: int, data: CabinCreate, current_user: User = Depends(get_current_user)):
-    """Update camera URL for existing cabin."""
-    cabin = await db.cabins.find_one({"cabin_no": cabin_no})
-    if not cabin:
-        raise HTTPException(status_code=404, detail="Cabin not found")
-    
+    """Update camera URL (and optionally motion engine) for existing cabin."""
     update_data = {
         'camera_url': data.camera_url,
         'updated_at': datetime.now(timezone.utc)
     }
+    if data.motion_engine:
+        update_data['motion_engine'] = data.motion_engine.value
     
-    await db.cabins.update_one(
-        {"cabin_no": cabin_no},
-        {"$set": update_data}
-    )
-    
-    updated_cabin = await db.cabins.find_one({"cabin_no": cabin_no})
+    updated_cabin = await cabin_store.update(cabin_no, update_data)
+    if not updated_cabin:
+        raise HTTPException(status_code=404, detail="Cabin not found")
+    publish_cabin(updated_cabin)
     return Cabin(**updated_cabin)
 
 @api_router.delete("/settings/cameras/{cabin_no}")
 async def remove_camera(cabin_no: int, current_user: User = Depends(get_current_user)):
     """Remove camera and reset cabin."""
-    result = await db.cabins.delete_one({"cabin_no": cabin_no})
-    if result.deleted_count == 0:
+    if not await cabin_store.delete(cabin_no):
         raise HTTPException(status_code=404, detail="Cabin not found")
+    broadcast_hub.forget_cabin(cabin_no)
     
     # Also remove related sessions
     await db.sessions.delete_many({"cabin_no": cabin_no})
+    await session_rollups.remove_cabin(cabin_no)
+    response_cache.invalidate(CABINS, SESSIONS)
     
     return {"message": "Camera removed successfully"}
 
 @api_router.post("/settings/reset-all-cabins")
 async def reset_all_cabins(current_user: User = Depends(get_current_user)):
     """DANGER: Remove all cabins and sessions. Use to clean seed data."""
-    cabin_count = await db.cabins.count_documents({})
     session_count = await db.sessions.count_documents({})
     
-    await db.cabins.delete_many({})
+    cabin_count = await cabin_store.clear()
     await db.sessions.delete_many({})
+    await session_rollups.clear()
     await db.alerts.delete_many({})
+    response_cache.clear()
+    broadcast_hub.resync_all()
     
     return {
         "message": "All cabins and data removed",
@@ -552,24 +720,49 @@ async def reset_all_cabins(current_user: User = Depends(get_current_user)):
 
 # ============= WebSocket Endpoint =============
 
+def publish_cabin(cabin: dict):
+    """Send a cabin changed through the API to dashboard clients."""
+    response_cache.invalidate(CABINS)
+    broadcast_hub.publish_cabin(jsonable_encoder(Cabin(**cabin)))
+
+async def dashboard_snapshot():
+    """Full dashboard state sent to WebSocket clients on connect."""
+    stats = jsonable_encoder(await compute_stats())
+    alerts = await active_alerts()
+    # Cabins are read last with no await, so no cabin delta is flushed after this read
+    return {
+        "cabins": [jsonable_encoder(Cabin(**cabin)) for cabin in cabin_store.all()],
+        "stats": stats,
+        "alerts": alerts
+    }
+
+async def dashboard_stats():
+    """Stats for a dashboard delta."""
+    return jsonable_encoder(await compute_stats())
+
 @api_router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket endpoint for real-time cabin updates."""
+async def websocket_endpoint(websocket: WebSocket, since: Optional[int] = None, epoch: Optional[str] = None):
+    """
+    WebSocket endpoint for real-time dashboard updates.
+    Sends a snapshot on connect, then one delta per tick. Clients that
+    reconnect with ?since=<seq>&epoch=<epoch> only get what they missed.
+    """
     await websocket.accept()
-    active_connections.add(websocket)
+    # Messages are sent by the hub's writer task for this client
+    broadcast_hub.connect(websocket, since=since, epoch=epoch)
     
     try:
         while True:
             # Keep connection alive
             data = await websocket.receive_text()
             # Echo back for heartbeat
-            await websocket.send_text('{"type":"pong"}')
+            broadcast_hub.send(websocket, {"type": "pong"})
     except WebSocketDisconnect:
-        active_connections.remove(websocket)
+        pass
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
-        if websocket in active_connections:
-            active_connections.remove(websocket)
+    finally:
+        broadcast_hub.disconnect(websocket)
 
 # ============= Tracking Detection Endpoint =============
 
@@ -585,6 +778,21 @@ async def receive_detection(data: dict):
     await tracker_service.process_detection(cabin_no, detection_data)
     return {"status": "received"}
 
+@api_router.get("/tracking/stats")
+async def get_tracking_stats(current_user: User = Depends(get_current_user)):
+    """Get camera polling statistics."""
+    from camera_detector import detector
+    
+    return {
+        "camera_connections": detector.connection_stats(),
+        "polling": tracker_service.stats(),
+        "cabin_writes": cabin_store.stats(),
+        "websocket": broadcast_hub.stats(),
+        "report_jobs": report_jobs.stats(),
+        "report_cache": report_cache.stats(),
+        "response_cache": response_cache.stats()
+    }
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -596,9 +804,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+async def create_indexes():
+    """Declare the indexes used by frequent queries (in memory under Mongita)."""
+    await db.cabins.create_index("cabin_no")
+    await db.sessions.create_index([("cabin_no", 1), ("start_time", 1)])
+    await db.sessions.create_index("start_time")
+    await db.reports.create_index("fingerprint")
+    await db.alerts.create_index([("cabin_no", 1), ("type", 1), ("resolved", 1)])
+    await db.alerts.create_index("resolved")
+    await db.session_rollups.create_index("day")
+    await db.session_rollups.create_index("cabin_no")
+    await db.user_sessions.create_index("session_token")
+
 @app.on_event("startup")
 async def startup_event():
-    """Start tracker service on startup."""
+    """Create indexes, load cabin state and rollups and start tracker service on startup."""
+    await create_indexes()
+    await cabin_store.load()
+    await session_rollups.load()
+    cabin_store.start()
+    broadcast_hub.set_providers(dashboard_snapshot, dashboard_stats)
+    broadcast_hub.start()
+    report_jobs.start()
     await tracker_service.start()
     logger.info("Application started - Tracker service running")
 
@@ -606,5 +833,9 @@ async def startup_event():
 async def shutdown_db_client():
     """Stop tracker service and close database."""
     await tracker_service.stop()
+    await broadcast_hub.stop()
+    await report_jobs.stop()
+    await cabin_store.stop()
+    await auth.close_http_client()
     client.close()
     logger.info("Application shutdown complete")
\ No newline at end of file
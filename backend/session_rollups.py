@@ -0,0 +1,267 @@
+"""
+Session duration rollups
+Per cabin, day and hour totals of recorded sessions, used by the stats endpoints
+
+Rebuild from the sessions collection (e.g. after importing old data):
+    python session_rollups.py --rebuild
+Stop the server first: it keeps the recent rollups in memory, would go on
+serving the old totals and writes them back with the next session.
+"""
+import argparse
+import asyncio
+import logging
+import os
+from datetime import date, datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+# MongoDB database instance (will be set from server.py)
+db = None
+
+def set_database(database):
+    """Set the database instance from server.py"""
+    global db
+    db = database
+
+def _session_bucket(session: dict):
+    """(day, hour) of a session's start time in UTC"""
+    start = session['start_time']
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    start = start.astimezone(timezone.utc)
+    return start.date(), start.hour
+
+def _rollup_id(cabin_no: int, day: date, hour: int):
+    return f"{cabin_no}_{day.isoformat()}_{hour:02d}"
+
+class SessionRollups:
+    """
+    Session count and duration per (cabin_no, day, hour), in UTC.
+
+    A session counts towards the hour it started in, like the queries on
+    raw sessions did. Rollup documents live in the session_rollups
+    collection; the last window_days days are also kept in memory with per
+    cabin and per day totals, so the stats endpoints answer without reading
+    sessions. record() must be called for every inserted session.
+
+    rebuild() holds the lock while it reads the sessions, so sessions
+    recorded meanwhile are applied after it; those created before the
+    rebuild started (see the session's created_at) are already part of it.
+    """
+
+    def __init__(self):
+        # Days kept in memory, the weekly stats need today and the 7 days before
+        self.window_days = max(int(os.environ.get('ROLLUP_WINDOW_DAYS', 8)), 1)
+        self._lock = asyncio.Lock()
+        self._rebuild_started = None  # sessions created before it are in the rollups
+        self._reset()
+
+    def _reset(self):
+        self._hours = {}  # (cabin_no, day, hour) -> [count, duration]
+        self._cabin_days = {}  # (cabin_no, day) -> duration
+        self._day_totals = {}  # day -> duration
+        self._hour_counts = {}  # (day, hour) -> count
+        self._oldest = self._today() - timedelta(days=self.window_days - 1)
+
+    def _today(self):
+        return datetime.now(timezone.utc).date()
+
+    async def load(self):
+        """Load the rollups of the in-memory window, rebuilding them if missing"""
+        if await db.session_rollups.count_documents({}) == 0 and await db.sessions.count_documents({}) > 0:
+            logger.info("No session rollups found, building them from sessions")
+            await self.rebuild()
+            return
+
+        self._reset()
+        rollups = await db.session_rollups.find({'day': {'$gte': self._oldest.isoformat()}}).to_list(None)
+        for rollup in rollups:
+            self._add(rollup['cabin_no'], date.fromisoformat(rollup['day']), rollup['hour'],
+                      rollup['count'], rollup['duration'])
+        logger.info(f"Session rollups loaded {len(self._hours)} hours")
+
+    async def rebuild(self):
+        """
+        Recompute all rollups from the sessions collection
+        Returns: number of rollup documents written
+        """
+        async with self._lock:
+            started = datetime.now(timezone.utc)
+            rollups = await self._aggregate(started)
+
+            await db.session_rollups.delete_many({})
+            if rollups:
+                await db.session_rollups.insert_many(rollups)
+
+            self._reset()
+            for rollup in rollups:
+                day = date.fromisoformat(rollup['day'])
+                if day >= self._oldest:
+                    self._add(rollup['cabin_no'], day, rollup['hour'], rollup['count'], rollup['duration'])
+            self._rebuild_started = started
+
+        logger.info(f"Session rollups rebuilt: {len(rollups)} hours from {sum(r['count'] for r in rollups)} sessions")
+        return len(rollups)
+
+    async def _aggregate(self, now: datetime):
+        """Rollup documents of all sessions"""
+        groups = await db.sessions.aggregate([
+            {'$group': {
+                '_id': {
+                    'cabin_no': '$cabin_no',
+                    'year': {'$year': '$start_time'},
+                    'month': {'$month': '$start_time'},
+                    'day': {'$dayOfMonth': '$start_time'},
+                    'hour': {'$hour': '$start_time'}
+                },
+                'count': {'$sum': 1},
+                'duration': {'$sum': '$duration'}
+            }}
+        ]).to_list(None)
+
+        rollups = []
+        for group in groups:
+            key = group['_id']
+            day = date(key['year'], key['month'], key['day'])
+            rollups.append({
+                '_id': _rollup_id(key['cabin_no'], day, key['hour']),
+                'cabin_no': key['cabin_no'],
+                'day': day.isoformat(),
+                'hour': key['hour'],
+                'count': group['count'],
+                'duration': group['duration'],
+                'updated_at': now
+            })
+        return rollups
+
+    async def record(self, session: dict):
+        """Add an inserted session to its rollup"""
+        cabin_no = session['cabin_no']
+        day, hour = _session_bucket(session)
+        duration = session.get('duration', 0)
+        created_at = session.get('created_at')
+
+        async with self._lock:
+            if created_at and self._rebuild_started and created_at < self._rebuild_started:
+                # Waited for a rebuild that already counted it
+                return
+            self._roll_window()
+            if day >= self._oldest:
+                count, total = self._add(cabin_no, day, hour, 1, duration)
+            else:
+                # Older than the window: only the stored rollup changes
+                stored = await db.session_rollups.find_one({'_id': _rollup_id(cabin_no, day, hour)})
+                count = (stored or {}).get('count', 0) + 1
+                total = (stored or {}).get('duration', 0) + duration
+
+            # Absolute values keep the write idempotent (and upsert works on Mongita)
+            await db.session_rollups.update_one(
+                {'_id': _rollup_id(cabin_no, day, hour)},
+                {'$set': {
+                    'cabin_no': cabin_no,
+                    'day': day.isoformat(),
+                    'hour': hour,
+                    'count': count,
+                    'duration': total,
+                    'updated_at': datetime.now(timezone.utc)
+                }},
+                upsert=True
+            )
+
+    async def remove_cabin(self, cabin_no: int):
+        """Forget the rollups of a removed cabin"""
+        async with self._lock:
+            await db.session_rollups.delete_many({'cabin_no': cabin_no})
+            hours = {key: value for key, value in self._hours.items() if key[0] != cabin_no}
+            self._reset()
+            for (cabin, day, hour), (count, duration) in hours.items():
+                self._add(cabin, day, hour, count, duration)
+
+    async def clear(self):
+        """Remove all rollups"""
+        async with self._lock:
+            await db.session_rollups.delete_many({})
+            self._reset()
+
+    # ----- Queries (in-memory window) -----
+
+    def cabin_totals(self, since: date):
+        """Total session seconds of every cabin from a day on, in one pass"""
+        days = set(self._days_since(since))
+        totals = {}
+        for (cabin_no, day), seconds in self._cabin_days.items():
+            if day in days:
+                totals[cabin_no] = totals.get(cabin_no, 0) + seconds
+        return totals
+
+    def total_seconds(self, since: date):
+        """Total session seconds of all cabins from a day on"""
+        return sum(self._day_totals.get(day, 0) for day in self._days_since(since))
+
+    def daily_seconds(self, since: date):
+        """Session seconds of all cabins per day, from a day on"""
+        return {day: self._day_totals.get(day, 0) for day in self._days_since(since)}
+
+    def hourly_counts(self, day: date):
+        """Number of sessions started in each hour of a day"""
+        return {hour: self._hour_counts[(day, hour)] for hour in range(24) if (day, hour) in self._hour_counts}
+
+    def _days_since(self, since: date):
+        self._roll_window()
+        if since < self._oldest:
+            logger.warning(f"Session rollups before {self._oldest} are not in memory")
+            since = self._oldest
+        return [since + timedelta(days=offset) for offset in range((self._today() - since).days + 1)]
+
+    # ----- Internals -----
+
+    def _add(self, cabin_no: int, day: date, hour: int, count: int, duration: int):
+        """Add to a bucket and the totals, returns the bucket's new (count, duration)"""
+        bucket = self._hours.setdefault((cabin_no, day, hour), [0, 0])
+        bucket[0] += count
+        bucket[1] += duration
+        self._cabin_days[(cabin_no, day)] = self._cabin_days.get((cabin_no, day), 0) + duration
+        self._day_totals[day] = self._day_totals.get(day, 0) + duration
+        self._hour_counts[(day, hour)] = self._hour_counts.get((day, hour), 0) + count
+        return tuple(bucket)
+
+    def _roll_window(self):
+        """Drop days that fell out of the window (the server ran past midnight)"""
+        oldest = self._today() - timedelta(days=self.window_days - 1)
+        if oldest == self._oldest:
+            return
+        self._oldest = oldest
+        self._hours = {key: value for key, value in self._hours.items() if key[1] >= oldest}
+        self._cabin_days = {key: value for key, value in self._cabin_days.items() if key[1] >= oldest}
+        self._day_totals = {day: value for day, value in self._day_totals.items() if day >= oldest}
+        self._hour_counts = {key: value for key, value in self._hour_counts.items() if key[0] >= oldest}
+
+# Global session rollups instance
+session_rollups = SessionRollups()
+
+async def main():
+    parser = argparse.ArgumentParser(description="Session duration rollups")
+    parser.add_argument("--rebuild", action="store_true", help="recompute all rollups from sessions (stop the server first)")
+    args = parser.parse_args()
+
+    from pathlib import Path
+    from dotenv import load_dotenv
+    load_dotenv(Path(__file__).parent / '.env')
+
+    try:
+        from db_connector import db as database, client
+    except ImportError:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017'))
+        database = client[os.environ.get('DB_NAME', 'smart_cabin_db')]
+    set_database(database)
+
+    if args.rebuild:
+        count = await session_rollups.rebuild()
+        print(f"Rebuilt {count} session rollups")
+    else:
+        print(f"{await database.session_rollups.count_documents({})} session rollups stored")
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
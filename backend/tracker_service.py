@@ -3,10 +3,21 @@ Real-time cabin tracking service
 Integrates smart_cabin_tracker_v4.py with the backend
 """
 import asyncio
+import heapq
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import Dict, Set
+from typing import Dict
 import logging
 
+from fastapi.encoders import jsonable_encoder
+
+from broadcast_hub import broadcast_hub
+from cabin_store import cabin_store
+from models import Alert
+from response_cache import response_cache, ALERTS, CABINS, SESSIONS
+from session_rollups import session_rollups
+
 logger = logging.getLogger(__name__)
 
 # MongoDB database instance (will be set from server.py)
@@ -17,8 +28,87 @@ def set_database(database):
     global db
     db = database
 
-# WebSocket connections storage
-active_connections: Set = set()
+class PollScheduler:
+    """
+    Adaptive per-cabin polling schedule.
+    
+    A heap keyed by next-due time decides which cabins to poll. Cabins whose
+    state just changed are polled at min_interval. Active cabins stay at the
+    base interval, so sessions are timed as before. Quiet and offline cabins
+    back off exponentially: quiet ones up to quiet_max_interval (3x the base
+    interval by default), so a student sitting down is still noticed
+    quickly, offline ones up to max_staleness.
+    """
+    
+    def __init__(self, min_interval: float, base_interval: float, max_staleness: float,
+                 quiet_max_interval: float = None):
+        self.min_interval = min_interval
+        self.base_interval = base_interval
+        self.max_staleness = max_staleness
+        self.quiet_max_interval = min(quiet_max_interval or 3 * base_interval, max_staleness)
+        self._heap = []  # (due_time, cabin_no), may hold stale entries
+        self._due = {}  # cabin_no -> current due time
+        self._intervals = {}  # cabin_no -> last interval used
+    
+    def __len__(self):
+        return len(self._due)
+    
+    def sync(self, cabin_nos, now: float):
+        """Schedule new cabins immediately and forget removed ones"""
+        cabin_nos = set(cabin_nos)
+        for cabin_no in cabin_nos - self._due.keys():
+            self._push(cabin_no, now)
+        for cabin_no in self._due.keys() - cabin_nos:
+            del self._due[cabin_no]
+            self._intervals.pop(cabin_no, None)
+    
+    def has_due(self, now: float):
+        """True if at least one cabin is due"""
+        self._drop_stale()
+        return bool(self._heap) and self._heap[0][0] <= now
+    
+    def next_due(self):
+        """Earliest due time, or None if nothing is scheduled"""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+    
+    def pop_due(self, now: float):
+        """Remove and return the cabins that are due"""
+        due = []
+        while self.has_due(now):
+            _, cabin_no = heapq.heappop(self._heap)
+            del self._due[cabin_no]
+            due.append(cabin_no)
+        return due
+    
+    def reschedule(self, cabin_no: int, now: float, outcome: str):
+        """
+        Schedule the next poll from the outcome of the last one
+        outcome: 'changed', 'active', 'quiet' or 'offline'
+        """
+        if outcome == 'changed':
+            interval = self.min_interval
+        elif outcome == 'active':
+            interval = self.base_interval
+        else:
+            # Exponential backoff starting from the base interval
+            previous = self._intervals.get(cabin_no, self.min_interval)
+            interval = max(previous * 2, self.base_interval)
+            if outcome == 'quiet':
+                interval = min(interval, self.quiet_max_interval)
+        
+        interval = min(interval, self.max_staleness)
+        self._intervals[cabin_no] = interval
+        self._push(cabin_no, now + interval)
+    
+    def _push(self, cabin_no: int, due: float):
+        self._due[cabin_no] = due
+        heapq.heappush(self._heap, (due, cabin_no))
+    
+    def _drop_stale(self):
+        # Entries of removed or rescheduled cabins are skipped lazily
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
 
 class TrackerService:
     """Service to manage cabin tracking and real-time updates"""
@@ -27,14 +117,53 @@ class TrackerService:
         self.running = False
         self.tracking_task = None
         
+        # Sweep settings (overridable via environment)
+        self.poll_interval = float(os.environ.get('TRACKER_POLL_INTERVAL', 10))  # base seconds between polls
+        self.min_interval = float(os.environ.get('TRACKER_MIN_INTERVAL', 5))  # right after a state change
+        self.max_staleness = float(os.environ.get('TRACKER_MAX_STALENESS', 60))  # longest gap between polls
+        self.quiet_max_interval = float(os.environ.get('TRACKER_QUIET_MAX_INTERVAL', 0)) or None  # None = 3x poll_interval
+        self.max_concurrency = int(os.environ.get('TRACKER_CONCURRENCY', 16))  # cabins polled in parallel
+        self.cabin_timeout = float(os.environ.get('TRACKER_CABIN_TIMEOUT', 8))  # per-cabin deadline in seconds
+        self.fetch_mode = os.environ.get('CAMERA_FETCH_MODE', 'thread')  # 'thread' (requests) or 'async' (httpx)
+        self.detection_mode = os.environ.get('DETECTION_MODE', 'per_cabin')  # 'per_cabin' or 'batched'
+        # 'process' spawns workers that re-import the launching script, which
+        # must start the server under if __name__ == '__main__' (see ProcessDetectionPool)
+        self.detection_backend = os.environ.get('DETECTION_BACKEND', 'thread')  # 'thread' or 'process'
+        self.detection_workers = int(os.environ.get('DETECTION_WORKERS', 0)) or None  # None = CPU count
+        
+        self._executor = None
+        self._batch_analyzer = None
+        self._process_pool = None
+        self._semaphore = None
+        self._in_flight = set()  # cabin numbers whose detection is still running
+        self._scheduler = PollScheduler(self.min_interval, self.poll_interval, self.max_staleness,
+                                        self.quiet_max_interval)
+        self._next_sync = 0.0  # when to reload the cabin list even if nothing is due
+        self._poll_count = 0
+        self._started_at = None
+        
     async def start(self):
         """Start the tracking service"""
         if self.running:
             return
         
         self.running = True
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix='cabin-detect'
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._started_at = asyncio.get_running_loop().time()
+        if self.detection_mode == 'batched' and self.detection_backend == 'process':
+            # The batched pass runs in this process on frames it decoded itself
+            logger.warning("DETECTION_BACKEND=process does not apply to DETECTION_MODE=batched, using per_cabin")
+            self.detection_mode = 'per_cabin'
+        if self.detection_backend == 'process':
+            from detection_pool import ProcessDetectionPool
+            self._process_pool = ProcessDetectionPool(self.detection_workers)
+            self._process_pool.start()
         self.tracking_task = asyncio.create_task(self._tracking_loop())
-        logger.info("Tracker service started")
+        logger.info(f"Tracker service started (concurrency={self.max_concurrency}, deadline={self.cabin_timeout}s)")
         
     async def stop(self):
         """Stop the tracking service"""
@@ -45,138 +174,329 @@ class TrackerService:
                 await self.tracking_task
             except asyncio.CancelledError:
                 pass
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if self._process_pool:
+            self._process_pool.shutdown()
+            self._process_pool = None
+        
+        from camera_detector import detector
+        await detector.aclose()
         logger.info("Tracker service stopped")
     
     async def _tracking_loop(self):
         """Main tracking loop - uses real camera detection"""
-        from camera_detector import detector
-        import asyncio
+        loop = asyncio.get_running_loop()
         
         while self.running:
             try:
-                # Get all cabins
-                cabins = await db.cabins.find().to_list(1000)
-                
-                # Update cabin statuses using REAL camera detection
-                for cabin in cabins:
-                    # Skip if no student assigned
-                    if not cabin.get('student_id'):
-                        continue
-                    
-                    # Analyze camera feed
-                    camera_url = cabin.get('camera_url')
-                    if not camera_url:
-                        continue
-                    
-                    # Run detection in thread pool to avoid blocking
-                    try:
-                        result = await asyncio.get_event_loop().run_in_executor(
-                            None, 
-                            detector.analyze_cabin,
-                            cabin['cabin_no'],
-                            camera_url
-                        )
-                        
-                        # Determine status based on detection
-                        if result.get('error'):
-                            # Camera offline - keep last known status
-                            new_status = cabin.get('status', 'empty')
-                            # Create camera offline alert
-                            existing_alert = await db.alerts.find_one({
-                                'cabin_no': cabin['cabin_no'],
-                                'type': 'camera_offline',
-                                'resolved': False
-                            })
-                            if not existing_alert:
-                                await db.alerts.insert_one({
-                                    '_id': f"alert_camera_{cabin['cabin_no']}_{int(datetime.now(timezone.utc).timestamp())}",
-                                    'type': 'camera_offline',
-                                    'cabin_no': cabin['cabin_no'],
-                                    'student_name': cabin.get('student_name'),
-                                    'message': 'Kamera bağlantısı kesildi',
-                                    'severity': 'error',
-                                    'resolved': False,
-                                    'created_at': datetime.now(timezone.utc)
-                                })
-                        elif result['is_active']:
-                            new_status = 'active'
-                            # Resolve camera offline alert if exists
-                            await db.alerts.update_many(
-                                {'cabin_no': cabin['cabin_no'], 'type': 'camera_offline'},
-                                {'$set': {'resolved': True}}
-                            )
-                        elif result['brightness'] > 0.3:
-                            # Lights on but no motion - idle
-                            new_status = 'idle'
-                        else:
-                            # Lights off, no motion - long break or empty
-                            new_status = 'long_break'
-                        
-                    except Exception as e:
-                        logger.error(f"Detection error for cabin {cabin.get('cabin_no', 'unknown')}: {e}")
-                        new_status = cabin.get('status', 'idle')  # Keep current status on error
-                    
-                    # Update cabin data (moved outside try-except to fix scope issue)
-                    update_data = {
-                        'status': new_status,
-                        'last_activity': datetime.now(timezone.utc),
-                        'updated_at': datetime.now(timezone.utc)
-                    }
-                    
-                    if new_status == 'active':
-                        if not cabin.get('current_session_start'):
-                            # Start new session
-                            update_data['current_session_start'] = datetime.now(timezone.utc)
-                            update_data['current_session_duration'] = 0
-                        else:
-                            # Calculate real duration from start time
-                            start = cabin.get('current_session_start')
-                            if start.tzinfo is None:
-                                start = start.replace(tzinfo=timezone.utc)
-                            duration = int((datetime.now(timezone.utc) - start).total_seconds())
-                            update_data['current_session_duration'] = duration
-                    else:
-                        # End session if moving from active to other
-                        if cabin.get('status') == 'active' and cabin.get('current_session_start'):
-                            duration = cabin.get('current_session_duration', 0)
-                            if duration > 60:  # Minimum 1 minute
-                                # Create session record
-                                session = {
-                                    '_id': f"session_{cabin['cabin_no']}_{int(datetime.now(timezone.utc).timestamp())}",
-                                    'cabin_no': cabin['cabin_no'],
-                                    'student_id': cabin.get('student_id'),
-                                    'student_name': cabin.get('student_name'),
-                                    'start_time': cabin.get('current_session_start'),
-                                    'end_time': datetime.now(timezone.utc),
-                                    'duration': duration,
-                                    'detection_method': 'camera_tracking',
-                                    'created_at': datetime.now(timezone.utc)
-                                }
-                                await db.sessions.insert_one(session)
-                        
-                        update_data['current_session_start'] = None
-                        update_data['current_session_duration'] = 0
-                    
-                    # Update cabin in database
-                    await db.cabins.update_one(
-                        {'_id': cabin['_id']},
-                        {'$set': update_data}
-                    )
-                        
-                        # Broadcast update via WebSocket
-                        await self.broadcast_cabin_update(cabin['cabin_no'])
-                
-                # Check for alerts after each cabin
-                await self.check_and_create_alerts(cabin)
-                
-                # Wait before next check (optimized: 10 seconds instead of 5)
-                await asyncio.sleep(10)
-                
+                await self._poll_due()
             except Exception as e:
                 logger.error(f"Error in tracking loop: {e}")
-                
-            # Wait before next check (optimized: 10 seconds instead of 5)
-            await asyncio.sleep(10)
+            
+            # Sleep until the next cabin is due, waking up at least every
+            # second so new cabins and shutdown are noticed quickly
+            next_due = self._scheduler.next_due()
+            delay = 1.0 if next_due is None else next_due - loop.time()
+            await asyncio.sleep(min(max(delay, 0.1), 1.0))
+    
+    async def _poll_due(self):
+        """Poll the cabins whose next poll is due"""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        
+        if now < self._next_sync and not self._scheduler.has_due(now):
+            return
+        
+        # Get all cabins (from memory, no storage access)
+        cabins = cabin_store.all()
+        
+        # Only cabins with a student and a camera are monitored
+        monitored = {c['cabin_no']: c for c in cabins if c.get('student_id') and c.get('camera_url')}
+        self._scheduler.sync(monitored.keys(), now)
+        self._next_sync = now + self.poll_interval
+        
+        due = [monitored[cabin_no] for cabin_no in self._scheduler.pop_due(now)]
+        if due:
+            await self._sweep(due)
+    
+    async def _sweep(self, cabins):
+        """Poll the given cabins concurrently and apply the results"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        self._poll_count += len(cabins)
+        
+        # Cabins are polled in parallel, bounded by the semaphore, so a sweep
+        # takes as long as the slowest camera rather than the sum of all cameras
+        if self.detection_mode == 'batched':
+            await self._sweep_batched(cabins)
+        else:
+            await asyncio.gather(*(self._poll_cabin(cabin) for cabin in cabins))
+        
+        logger.debug(f"Sweep of {len(cabins)} cabins took {loop.time() - started:.2f}s")
+    
+    def stats(self):
+        """Polling statistics"""
+        elapsed = asyncio.get_running_loop().time() - self._started_at if self._started_at else 0
+        return {
+            'scheduled_cabins': len(self._scheduler),
+            'polls': self._poll_count,
+            'polls_per_hour': round(self._poll_count * 3600 / elapsed) if elapsed > 0 else 0
+        }
+    
+    def _skip_in_flight(self, cabin):
+        """A previous detection that overran its deadline may still be running"""
+        if cabin['cabin_no'] in self._in_flight:
+            logger.warning(f"Cabin {cabin['cabin_no']} still being analyzed, skipping this sweep")
+            self._scheduler.reschedule(cabin['cabin_no'], asyncio.get_running_loop().time(), 'offline')
+            return True
+        return False
+    
+    async def _poll_cabin(self, cabin):
+        """Run detection for one cabin within its deadline and store the result"""
+        from camera_detector import detector
+        
+        cabin_no = cabin['cabin_no']
+        if self._skip_in_flight(cabin):
+            return
+        
+        async with self._semaphore:
+            try:
+                result = await self._with_deadline(cabin_no, self._start_detection(cabin))
+            except asyncio.TimeoutError:
+                logger.warning(f"Detection for cabin {cabin_no} exceeded {self.cabin_timeout}s deadline")
+                result = detector.offline_result('Detection timed out')
+            except Exception as e:
+                logger.error(f"Detection error for cabin {cabin_no}: {e}")
+                result = None  # Keep current status on error
+            
+            await self._store_result(cabin, result)
+    
+    async def _sweep_batched(self, cabins):
+        """Fetch all frames concurrently, then analyze them in one vectorized pass"""
+        from camera_detector import BatchFrameAnalyzer, detector
+        
+        cabins = [cabin for cabin in cabins if not self._skip_in_flight(cabin)]
+        frames = await asyncio.gather(*(self._fetch_frame(cabin) for cabin in cabins))
+        
+        if self._batch_analyzer is None:
+            self._batch_analyzer = BatchFrameAnalyzer(detector)
+        
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(
+            self._executor,
+            self._batch_analyzer.analyze,
+            {cabin['cabin_no']: frame for cabin, frame in zip(cabins, frames)},
+            {cabin['cabin_no']: cabin.get('motion_engine') for cabin in cabins}
+        )
+        
+        await asyncio.gather(*(self._store_result(cabin, results.get(cabin['cabin_no'])) for cabin in cabins))
+    
+    async def _fetch_frame(self, cabin):
+        """Fetch and decode one cabin's frame within its deadline (None if unavailable)"""
+        cabin_no = cabin['cabin_no']
+        
+        async with self._semaphore:
+            try:
+                return await self._with_deadline(cabin_no, self._start_fetch(cabin))
+            except asyncio.TimeoutError:
+                logger.warning(f"Fetching frame of cabin {cabin_no} exceeded {self.cabin_timeout}s deadline")
+            except Exception as e:
+                logger.error(f"Fetch error for cabin {cabin_no}: {e}")
+            return None
+    
+    def _start_detection(self, cabin):
+        """Start fetching and analyzing a cabin's frame, return its future"""
+        from camera_detector import detector
+        
+        if self._process_pool:
+            # Fetch here, analyze in the worker process that owns the cabin
+            return asyncio.ensure_future(self._detect_in_process(cabin))
+        
+        if self.fetch_mode == 'async':
+            # Fetch on the event loop, only decoding/analysis use the pool
+            return asyncio.ensure_future(
+                detector.analyze_cabin_async(
+                    cabin['cabin_no'],
+                    cabin['camera_url'],
+                    executor=self._executor,
+                    motion_engine=cabin.get('motion_engine')
+                )
+            )
+        
+        # Run detection in the tracker's own pool to avoid blocking
+        return asyncio.get_running_loop().run_in_executor(
+            self._executor,
+            detector.analyze_cabin,
+            cabin['cabin_no'],
+            cabin['camera_url'],
+            cabin.get('motion_engine')
+        )
+    
+    async def _detect_in_process(self, cabin):
+        """Fetch JPEG bytes and analyze them in the process pool"""
+        from camera_detector import detector
+        
+        if self.fetch_mode == 'async':
+            content = await detector.fetch_bytes_async(cabin['camera_url'])
+        else:
+            content = await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                detector.fetch_bytes,
+                cabin['camera_url']
+            )
+        
+        if content is None:
+            return detector.offline_result()
+        
+        return await self._process_pool.analyze(cabin['cabin_no'], content, cabin.get('motion_engine'))
+    
+    def _start_fetch(self, cabin):
+        """Start fetching and decoding a cabin's frame, return its future"""
+        from camera_detector import detector
+        
+        if self.fetch_mode == 'async':
+            return asyncio.ensure_future(self._fetch_frame_async(cabin['camera_url']))
+        
+        return asyncio.get_running_loop().run_in_executor(
+            self._executor,
+            detector.fetch_image,
+            cabin['camera_url']
+        )
+    
+    async def _fetch_frame_async(self, camera_url):
+        """Fetch on the event loop and decode in the pool"""
+        from camera_detector import detector
+        
+        content = await detector.fetch_bytes_async(camera_url)
+        if content is None:
+            return None
+        return await asyncio.get_running_loop().run_in_executor(self._executor, detector.decode_image, content)
+    
+    async def _with_deadline(self, cabin_no, future):
+        """Await a cabin's detection future, raising asyncio.TimeoutError after the deadline"""
+        self._in_flight.add(cabin_no)
+        future.add_done_callback(lambda _: self._in_flight.discard(cabin_no))
+        
+        # shield() keeps the worker's future alive so _in_flight is only
+        # cleared once the thread has really finished
+        return await asyncio.wait_for(asyncio.shield(future), timeout=self.cabin_timeout)
+    
+    async def _store_result(self, cabin, result):
+        """Apply a detection result and schedule the cabin's next poll"""
+        new_status = None
+        try:
+            new_status = await self._apply_detection(cabin, result)
+        except Exception as e:
+            logger.error(f"Error updating cabin {cabin['cabin_no']}: {e}")
+        
+        if result is None or result.get('error'):
+            outcome = 'offline'
+        elif new_status != cabin.get('status') or result.get('smoothed'):
+            # Status changed, or smoothing is holding back a possible change
+            outcome = 'changed'
+        elif new_status == 'active':
+            outcome = 'active'
+        else:
+            outcome = 'quiet'
+        self._scheduler.reschedule(cabin['cabin_no'], asyncio.get_running_loop().time(), outcome)
+    
+    async def _apply_detection(self, cabin, result):
+        """Update cabin status, sessions and alerts from a detection result"""
+        if result is None:
+            new_status = cabin.get('status', 'idle')
+        elif result.get('error'):
+            # Camera offline - keep last known status
+            new_status = cabin.get('status', 'empty')
+            # Create camera offline alert
+            existing_alert = await db.alerts.find_one({
+                'cabin_no': cabin['cabin_no'],
+                'type': 'camera_offline',
+                'resolved': False
+            })
+            if not existing_alert:
+                await self._create_alert({
+                    '_id': f"alert_camera_{cabin['cabin_no']}_{int(datetime.now(timezone.utc).timestamp())}",
+                    'type': 'camera_offline',
+                    'cabin_no': cabin['cabin_no'],
+                    'student_name': cabin.get('student_name'),
+                    'message': 'Kamera bağlantısı kesildi',
+                    'severity': 'error',
+                    'resolved': False,
+                    'created_at': datetime.now(timezone.utc)
+                })
+        elif result['is_active']:
+            new_status = 'active'
+            # Resolve camera offline alert if exists
+            resolved = await db.alerts.update_many(
+                {'cabin_no': cabin['cabin_no'], 'type': 'camera_offline', 'resolved': False},
+                {'$set': {'resolved': True}}
+            )
+            if resolved.modified_count:
+                response_cache.invalidate(ALERTS)
+                broadcast_hub.resolve_alerts(cabin['cabin_no'], 'camera_offline')
+        elif result['brightness'] > 0.3:
+            # Lights on but no motion - idle
+            new_status = 'idle'
+        else:
+            # Lights off, no motion - long break or empty
+            new_status = 'long_break'
+        
+        # Update cabin data
+        update_data = {
+            'status': new_status,
+            'last_activity': datetime.now(timezone.utc),
+            'updated_at': datetime.now(timezone.utc)
+        }
+        
+        if new_status == 'active':
+            if not cabin.get('current_session_start'):
+                # Start new session
+                update_data['current_session_start'] = datetime.now(timezone.utc)
+                update_data['current_session_duration'] = 0
+            else:
+                # Calculate real duration from start time
+                start = cabin.get('current_session_start')
+                if start.tzinfo is None:
+                    start = start.replace(tzinfo=timezone.utc)
+                duration = int((datetime.now(timezone.utc) - start).total_seconds())
+                update_data['current_session_duration'] = duration
+        else:
+            # End session if moving from active to other
+            if cabin.get('status') == 'active' and cabin.get('current_session_start'):
+                duration = cabin.get('current_session_duration', 0)
+                if duration > 60:  # Minimum 1 minute
+                    # Create session record
+                    session = {
+                        '_id': f"session_{cabin['cabin_no']}_{int(datetime.now(timezone.utc).timestamp())}",
+                        'cabin_no': cabin['cabin_no'],
+                        'student_id': cabin.get('student_id'),
+                        'student_name': cabin.get('student_name'),
+                        'start_time': cabin.get('current_session_start'),
+                        'end_time': datetime.now(timezone.utc),
+                        'duration': duration,
+                        'detection_method': 'camera_tracking',
+                        'created_at': datetime.now(timezone.utc)
+                    }
+                    await db.sessions.insert_one(session)
+                    await session_rollups.record(session)
+                    response_cache.invalidate(SESSIONS)
+                    broadcast_hub.publish_session()
+            
+            update_data['current_session_start'] = None
+            update_data['current_session_duration'] = 0
+        
+        # Update cabin in the store (written to the database on the next flush)
+        await cabin_store.update(cabin['cabin_no'], update_data, write_behind=True)
+        
+        # Broadcast changed fields via WebSocket
+        self.broadcast_cabin_update(cabin['cabin_no'])
+        
+        # Check for alerts with the freshly stored state
+        await self.check_and_create_alerts({**cabin, **update_data})
+        
+        return new_status
     
     async def check_and_create_alerts(self, cabin):
         """Check cabin status and create alerts if needed"""
@@ -209,7 +529,7 @@ class TrackerService:
                                 'resolved': False,
                                 'created_at': datetime.now(timezone.utc)
                             }
-                            await db.alerts.insert_one(alert)
+                            await self._create_alert(alert)
             
             # No data alert (24 hours without activity)
             if cabin.get('last_activity'):
@@ -237,49 +557,40 @@ class TrackerService:
                             'resolved': False,
                             'created_at': datetime.now(timezone.utc)
                         }
-                        await db.alerts.insert_one(alert)
+                        await self._create_alert(alert)
                         
         except Exception as e:
             logger.error(f"Error checking alerts: {e}")
     
-    async def broadcast_cabin_update(self, cabin_no: int):
-        """Broadcast cabin update to all WebSocket connections"""
+    async def _create_alert(self, alert: Dict):
+        """Store a new alert and send it to dashboard clients"""
+        await db.alerts.insert_one(alert)
+        response_cache.invalidate(ALERTS)
+        broadcast_hub.publish_alert(jsonable_encoder(Alert(**alert)))
+    
+    def broadcast_cabin_update(self, cabin_no: int):
+        """Publish the cabin's changed fields to WebSocket clients (sent with the next tick)"""
         try:
-            cabin = await db.cabins.find_one({'cabin_no': cabin_no})
+            cabin = cabin_store.get(cabin_no)
             if cabin:
-                # Convert MongoDB document to dict
-                cabin_data = {
+                changed = broadcast_hub.publish_cabin({
                     'cabin_no': cabin['cabin_no'],
                     'status': cabin.get('status'),
                     'student_id': cabin.get('student_id'),
                     'student_name': cabin.get('student_name'),
                     'current_session_duration': cabin.get('current_session_duration', 0),
                     'last_activity': cabin.get('last_activity').isoformat() if cabin.get('last_activity') else None
-                }
-                
-                # Send to all connected WebSocket clients
-                import json
-                message = json.dumps({
-                    'type': 'cabin_update',
-                    'data': cabin_data
                 })
-                
-                # Remove disconnected clients
-                disconnected = set()
-                for connection in active_connections:
-                    try:
-                        await connection.send_text(message)
-                    except:
-                        disconnected.add(connection)
-                
-                active_connections.difference_update(disconnected)
+                # Stats count statuses and students
+                if changed.keys() & {'status', 'student_id'}:
+                    response_cache.invalidate(CABINS)
         except Exception as e:
             logger.error(f"Error broadcasting update: {e}")
     
     async def process_detection(self, cabin_no: int, detection_data: Dict):
         """Process detection data from tracking script"""
         try:
-            cabin = await db.cabins.find_one({'cabin_no': cabin_no})
+            cabin = cabin_store.get(cabin_no)
             if not cabin:
                 logger.warning(f"Cabin {cabin_no} not found")
                 return
@@ -308,13 +619,10 @@ class TrackerService:
                     duration = int((datetime.now(timezone.utc) - start).total_seconds())
                     update_data['current_session_duration'] = duration
             
-            await db.cabins.update_one(
-                {'cabin_no': cabin_no},
-                {'$set': update_data}
-            )
+            await cabin_store.update(cabin_no, update_data, write_behind=True)
             
             # Broadcast update
-            await self.broadcast_cabin_update(cabin_no)
+            self.broadcast_cabin_update(cabin_no)
             
         except Exception as e:
             logger.error(f"Error processing detection: {e}")
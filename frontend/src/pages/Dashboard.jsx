@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { Camera, Users, Clock, TrendingUp, AlertTriangle, Activity } from 'lucide-react';
 import { Card, CardContent, CardHeader, CardTitle } from '../components/ui/card';
@@ -20,6 +20,10 @@ const Dashboard = () => {
   const [weeklyActivity, setWeeklyActivity] = useState([]);
   const [filterStatus, setFilterStatus] = useState('all');
   const [loading, setLoading] = useState(true);
+  // Set once a WebSocket snapshot arrived; REST answers must not overwrite it
+  const liveRef = useRef(false);
+  const cabinsRef = useRef(cabins);
+  cabinsRef.current = cabins;
 
   // Check authentication and setup WebSocket
   useEffect(() => {
@@ -29,14 +33,20 @@ const Dashboard = () => {
       return;
     }
     
+    liveRef.current = false;
     fetchData();
     
-    // Connect WebSocket for real-time updates
+    // Cabins, stats and alerts then follow the WebSocket snapshot and deltas
     wsService.connect();
     wsService.subscribe('dashboard', handleWebSocketMessage);
     
-    // Refresh data every 30 seconds
-    const interval = setInterval(fetchData, 30000);
+    // Fall back to polling while the WebSocket is down
+    const interval = setInterval(() => {
+      if (!wsService.isConnected()) {
+        liveRef.current = false;
+        fetchData();
+      }
+    }, 30000);
     
     return () => {
       clearInterval(interval);
@@ -45,54 +55,112 @@ const Dashboard = () => {
   }, [navigate]);
 
   const handleWebSocketMessage = (message) => {
-    if (message.type === 'cabin_update') {
-      const updatedCabin = message.data;
-      setCabins(prev => prev.map(cabin => 
-        cabin.cabin_no === updatedCabin.cabin_no 
-          ? { ...cabin, ...updatedCabin } 
-          : cabin
-      ));
+    if (message.type === 'snapshot') {
+      liveRef.current = true;
+      setCabins(message.cabins);
+      setStats(message.stats);
+      setAlerts(message.alerts);
+      setLoading(false);
+    } else if (message.type === 'delta') {
+      if (message.removed_cabins || message.cabins) {
+        // A delta only has the changed fields, cabins we don't know yet are fetched whole
+        const unknown = (message.cabins || [])
+          .filter(updated => !cabinsRef.current.some(cabin => cabin.cabin_no === updated.cabin_no))
+          .map(updated => updated.cabin_no);
+        
+        setCabins(prev => {
+          let next = prev;
+          if (message.removed_cabins) {
+            next = next.filter(cabin => !message.removed_cabins.includes(cabin.cabin_no));
+          }
+          (message.cabins || []).forEach(updatedCabin => {
+            next = next.map(cabin => cabin.cabin_no === updatedCabin.cabin_no ? { ...cabin, ...updatedCabin } : cabin);
+          });
+          return next;
+        });
+        
+        unknown.forEach(fetchCabin);
+      }
+      
+      if (message.stats) {
+        setStats(message.stats);
+      }
+      
+      if (message.alerts || message.resolved_alerts) {
+        setAlerts(prev => {
+          let next = prev;
+          (message.resolved_alerts || []).forEach(resolved => {
+            next = next.filter(alert => !(alert.cabin_no === resolved.cabin_no && alert.type === resolved.type));
+          });
+          // A delta may repeat an alert the snapshot already holds
+          const known = new Set(next.map(alert => alert.id));
+          return [...next, ...(message.alerts || []).filter(alert => !known.has(alert.id))];
+        });
+      }
       
-      // Recalculate stats
-      fetchStats();
+      // A recorded session changes the activity charts
+      if (message.sessions) {
+        fetchActivity();
+      }
     }
   };
 
-  const fetchStats = async () => {
+  const fetchCabin = async (cabinNo) => {
     try {
-      const statsRes = await api.stats.getStats();
-      setStats(statsRes.data);
+      const cabinRes = await api.cabins.getOne(cabinNo);
+      setCabins(prev => [
+        ...prev.filter(cabin => cabin.cabin_no !== cabinNo),
+        cabinRes.data
+      ].sort((a, b) => a.cabin_no - b.cabin_no));
     } catch (error) {
-      console.error('Error fetching stats:', error);
+      console.error('Error fetching cabin:', error);
     }
   };
 
   const fetchData = async () => {
     try {
-      const [cabinsRes, statsRes, alertsRes, dailyRes, weeklyRes] = await Promise.all([
+      const [cabinsRes, statsRes, alertsRes] = await Promise.all([
         api.cabins.getAll(),
         api.stats.getStats(),
-        api.stats.getAlerts(),
+        api.stats.getAlerts()
+      ]);
+
+      if (!liveRef.current) {
+        setCabins(cabinsRes.data);
+        setStats(statsRes.data);
+        setAlerts(alertsRes.data);
+      }
+      setLoading(false);
+    } catch (error) {
+      console.error('Error fetching dashboard data:', error);
+      // If API fails, use mock data
+      import('../mock').then(mockModule => {
+        if (!liveRef.current) {
+          setCabins(mockModule.mockCabins);
+          setStats(mockModule.mockStats);
+          setAlerts(mockModule.mockAlerts);
+        }
+        setLoading(false);
+      });
+    }
+    fetchActivity();
+  };
+
+  const fetchActivity = async () => {
+    try {
+      const [dailyRes, weeklyRes] = await Promise.all([
         api.stats.getDailyActivity(),
         api.stats.getWeeklyActivity()
       ]);
 
-      setCabins(cabinsRes.data);
-      setStats(statsRes.data);
-      setAlerts(alertsRes.data);
       setDailyActivity(dailyRes.data);
       setWeeklyActivity(weeklyRes.data);
-      setLoading(false);
     } catch (error) {
-      console.error('Error fetching dashboard data:', error);
+      console.error('Error fetching activity data:', error);
       // If API fails, use mock data
       import('../mock').then(mockModule => {
-        setCabins(mockModule.mockCabins);
-        setStats(mockModule.mockStats);
-        setAlerts(mockModule.mockAlerts);
         setDailyActivity(mockModule.mockActivityData.daily);
         setWeeklyActivity(mockModule.mockActivityData.weekly);
-        setLoading(false);
       });
     }
   };
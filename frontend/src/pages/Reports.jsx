@@ -39,17 +39,49 @@ const Reports = () => {
     setShowGenerateDialog(true);
   };
 
+  const waitForReportJob = async (jobId) => {
+    while (true) {
+      const { data: job } = await api.reports.getJob(jobId);
+      if (job.status !== 'pending') {
+        return job;
+      }
+      await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+  };
+
+  const reportPayload = () => ({
+    type: selectedReportType,
+    cabin_no: reportForm.cabin_no ? parseInt(reportForm.cabin_no) : null,
+    date: reportForm.date || null
+  });
+
+  const previewReport = async () => {
+    try {
+      const response = await api.reports.preview(reportPayload());
+      const url = URL.createObjectURL(new Blob([response.data], { type: 'application/pdf' }));
+      window.open(url, '_blank');
+      setTimeout(() => URL.revokeObjectURL(url), 60000);
+    } catch (error) {
+      console.error('Error previewing report:', error);
+      alert('❌ Önizleme oluşturulamadı: ' + error.message);
+    }
+  };
+
   const submitGenerateReport = async () => {
     try {
-      const payload = {
-        type: selectedReportType,
-        cabin_no: reportForm.cabin_no ? parseInt(reportForm.cabin_no) : null,
-        date: reportForm.date || null
-      };
+      const payload = reportPayload();
       
       const response = await api.reports.generate(payload);
       setShowGenerateDialog(false);
+      
+      // The PDF is rendered in the background, wait for the job to finish
+      // (no job if an identical report was already rendered)
+      const job = response.data.job ? await waitForReportJob(response.data.job.id) : { status: 'done' };
       fetchReports();
+      if (job.status !== 'done') {
+        alert('❌ Rapor oluşturulamadı: ' + (job.error || 'bilinmeyen hata'));
+        return;
+      }
       
       const summary = response.data.summary;
       alert(`✅ Rapor Oluşturuldu!\n\n` +
@@ -323,6 +355,13 @@ const Reports = () => {
               >
                 Rapor Oluştur
               </Button>
+              <Button
+                onClick={previewReport}
+                variant="outline"
+                className="flex-1 border-orange-300 text-orange-600 hover:bg-orange-50"
+              >
+                Önizle
+              </Button>
               <Button
                 onClick={() => setShowGenerateDialog(false)}
                 variant="outline"
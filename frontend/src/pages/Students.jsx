@@ -24,8 +24,11 @@ const Students = () => {
 
   const fetchStudents = async () => {
     try {
-      // Get all cabins (both assigned and unassigned)
-      const response = await api.cabins.getAll();
+      // Get all cabins (both assigned and unassigned) with their totals in one request
+      const response = await api.students.getAll({
+        include_unassigned: true,
+        fields: 'cabin_no,student_id,student_name,status,daily_total,weekly_total'
+      });
       setAssignedCabins(response.data);
       setLoading(false);
     } catch (error) {
@@ -212,7 +215,7 @@ const Students = () => {
                     };
 
                     return (
-                      <tr key={cabin.id} className="border-b border-gray-100 hover:bg-orange-50 transition-colors duration-150">
+                      <tr key={cabin.cabin_no} className="border-b border-gray-100 hover:bg-orange-50 transition-colors duration-150">
                         <td className="py-4 px-4">
                           <span className="font-semibold text-gray-800">Kabin {cabin.cabin_no}</span>
                         </td>
@@ -84,8 +84,9 @@ export const cabinsApi = {
 
 // Students API
 export const studentsApi = {
-  getAll: () => 
-    apiClient.get('/students')
+  // params: { skip, limit, fields, include_unassigned }
+  getAll: (params = {}) => 
+    apiClient.get('/students', { params })
 };
 
 // Reports API
@@ -96,6 +97,13 @@ export const reportsApi = {
   generate: (data) => 
     apiClient.post('/reports/generate', data),
   
+  // Rendered in memory, nothing is stored
+  preview: (data) => 
+    apiClient.post('/reports/preview', data, { responseType: 'blob' }),
+  
+  getJob: (jobId) => 
+    apiClient.get(`/reports/jobs/${jobId}`),
+  
   download: (reportId) => 
     apiClient.get(`/reports/${reportId}/download`, { responseType: 'blob' }),
   
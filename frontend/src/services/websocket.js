@@ -1,4 +1,6 @@
-// WebSocket service for real-time cabin updates
+// WebSocket service for real-time dashboard updates
+// The server sends a snapshot on connect, then delta frames with sequence
+// numbers; on reconnect we pass the last applied seq to only get what we missed.
 
 class WebSocketService {
   constructor() {
@@ -7,14 +9,23 @@ class WebSocketService {
     this.maxReconnectAttempts = 10;
     this.reconnectDelay = 3000;
     this.listeners = new Map();
+    this.seq = null;
+    this.epoch = null;
   }
 
-  connect() {
+  connect(resume = false) {
+    // A new subscriber needs a full snapshot, only reconnects resume
+    if (!resume) {
+      this.seq = null;
+      this.epoch = null;
+    }
+    
     const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
     const wsUrl = BACKEND_URL.replace('https://', 'wss://').replace('http://', 'ws://');
     
     try {
-      this.ws = new WebSocket(`${wsUrl}/api/ws`);
+      const query = this.seq !== null ? `?since=${this.seq}&epoch=${this.epoch}` : '';
+      this.ws = new WebSocket(`${wsUrl}/api/ws${query}`);
 
       this.ws.onopen = () => {
         console.log('WebSocket connected');
@@ -32,6 +43,13 @@ class WebSocketService {
         try {
           const data = JSON.parse(event.data);
           
+          if (data.type === 'snapshot') {
+            this.epoch = data.epoch;
+          }
+          if (data.seq !== undefined) {
+            this.seq = data.seq;
+          }
+          
           // Notify all listeners
           this.listeners.forEach((callback) => {
             callback(data);
@@ -68,7 +86,7 @@ class WebSocketService {
     console.log(`Reconnecting... Attempt ${this.reconnectAttempts}`);
 
     setTimeout(() => {
-      this.connect();
+      this.connect(true);
     }, this.reconnectDelay);
   }
 
@@ -81,6 +99,12 @@ class WebSocketService {
       this.ws = null;
     }
     this.listeners.clear();
+    this.seq = null;
+    this.epoch = null;
+  }
+
+  isConnected() {
+    return this.ws !== null && this.ws.readyState === WebSocket.OPEN;
   }
 
   subscribe(id, callback) {
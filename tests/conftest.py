@@ -0,0 +1,19 @@
+"""
+Shared test setup
+Backend modules are imported by name, as server.py does
+"""
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'backend'))
+
+@pytest.fixture
+def memory_db():
+    """Empty in-memory Mongita database behind the async wrapper"""
+    from mongita import MongitaClientMemory
+    from db_connector import AsyncMongitaDatabase
+
+    return AsyncMongitaDatabase(MongitaClientMemory()[f"test_{uuid.uuid4().hex}"])
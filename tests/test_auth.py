@@ -0,0 +1,156 @@
+"""
+Auth: session exchange against auth_stub_server.py (retries, 503) and the session cache
+"""
+import asyncio
+import socket
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import uvicorn
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import auth
+from auth_stub_server import create_app
+
+@pytest.fixture(scope='module')
+def auth_stub():
+    """Stub auth app served by uvicorn on a free local port"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    app = create_app(delay=2)
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        assert time.monotonic() < deadline, 'auth stub did not start'
+        time.sleep(0.01)
+
+    yield app, f"http://127.0.0.1:{port}/auth/v1/env/oauth/session-data"
+    server.should_exit = True
+    thread.join(5)
+
+@pytest.fixture
+def stub(auth_stub, memory_db, monkeypatch):
+    app, url = auth_stub
+    app.state.requests = 0
+    monkeypatch.setattr(auth, 'EMERGENT_AUTH_URL', url)
+    monkeypatch.setattr(auth, 'AUTH_HTTP_TIMEOUT', 0.3)
+    monkeypatch.setattr(auth, 'AUTH_HTTP_RETRIES', 2)
+    monkeypatch.setattr(auth, 'AUTH_HTTP_RETRY_DELAY', 0.01)
+    # The client belongs to the event loop of one test
+    monkeypatch.setattr(auth, '_http_client', None)
+    auth.set_database(memory_db)
+    auth.invalidate_session_cache()
+    return app
+
+def _request(session_token):
+    return Request({'type': 'http', 'method': 'GET', 'path': '/api/auth/me', 'query_string': b'',
+                    'headers': [(b'authorization', f"Bearer {session_token}".encode())]})
+
+async def _exchange(session_id):
+    try:
+        return await auth.process_google_session(session_id)
+    finally:
+        await auth.close_http_client()
+
+async def _add_session(db, token, user_id='u1', expires_in=timedelta(days=1)):
+    if not await db.users.find_one({'_id': user_id}):
+        await db.users.insert_one({'_id': user_id, 'email': f"{user_id}@test", 'name': user_id,
+                                   'created_at': datetime.now(timezone.utc)})
+    await db.user_sessions.insert_one({'_id': f"sess_{token}", 'user_id': user_id, 'session_token': token,
+                                       'expires_at': datetime.now(timezone.utc) + expires_in})
+
+def test_session_exchange_creates_user_and_session(stub, memory_db):
+    async def scenario():
+        data = await _exchange('google-abc')
+        assert data.id.startswith('stub_') and data.email == f"{data.id}@stub.local"
+        assert await memory_db.users.find_one({'_id': data.id}) is not None
+
+        user = await auth.get_current_user(_request(data.session_token))
+        assert user.id == data.id
+
+    asyncio.run(scenario())
+    assert stub.state.requests == 1
+
+def test_rejected_session_is_not_retried(stub):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(_exchange('invalid-abc'))
+    assert error.value.status_code == 401
+    assert stub.state.requests == 1
+
+def test_server_errors_are_retried_then_503(stub):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(_exchange('error-abc'))
+    assert error.value.status_code == 503
+    assert 'HTTP 500' in error.value.detail
+    assert stub.state.requests == 3
+
+def test_timeouts_are_retried_then_503(stub):
+    started = time.monotonic()
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(_exchange('slow-abc'))
+    assert error.value.status_code == 503
+    assert 'Timeout' in error.value.detail
+    assert stub.state.requests == 3
+    # Three attempts of 0.3 seconds, not the stub's 2 second delay each
+    assert time.monotonic() - started < 2
+
+def test_validated_session_skips_the_database(stub, memory_db):
+    async def scenario():
+        await _add_session(memory_db, 'tok')
+        assert (await auth.get_current_user(_request('tok'))).id == 'u1'
+
+        await memory_db.user_sessions.delete_many({})
+        assert (await auth.get_current_user(_request('tok'))).id == 'u1'
+
+        auth.invalidate_session_cache('tok')
+        with pytest.raises(HTTPException) as error:
+            await auth.get_current_user(_request('tok'))
+        assert error.value.status_code == 401
+
+    asyncio.run(scenario())
+
+def test_session_cache_evicts_least_recently_used(stub, memory_db, monkeypatch):
+    monkeypatch.setattr(auth, 'AUTH_CACHE_SIZE', 2)
+
+    async def scenario():
+        for token in ('a', 'b', 'c'):
+            await _add_session(memory_db, token)
+        await auth.get_current_user(_request('a'))
+        await auth.get_current_user(_request('b'))
+        # Using 'a' again makes 'b' the least recently used
+        await auth.get_current_user(_request('a'))
+        await auth.get_current_user(_request('c'))
+        assert list(auth._session_cache) == ['a', 'c']
+
+    asyncio.run(scenario())
+
+def test_cache_never_outlives_the_session(stub, memory_db):
+    async def scenario():
+        await _add_session(memory_db, 'short', expires_in=timedelta(seconds=0.2))
+        await auth.get_current_user(_request('short'))
+        await asyncio.sleep(0.3)
+
+        with pytest.raises(HTTPException) as error:
+            await auth.get_current_user(_request('short'))
+        assert error.value.detail == 'Session expired'
+        assert 'short' not in auth._session_cache
+
+    asyncio.run(scenario())
+
+def test_logout_drops_the_cached_session(stub, memory_db):
+    async def scenario():
+        await _add_session(memory_db, 'tok')
+        await auth.get_current_user(_request('tok'))
+        await auth.logout_user('tok')
+
+        with pytest.raises(HTTPException):
+            await auth.get_current_user(_request('tok'))
+
+    asyncio.run(scenario())
@@ -0,0 +1,70 @@
+"""
+Batched detection: same decisions as per-cabin analysis, per-cabin engines honoured
+"""
+import asyncio
+
+import numpy as np
+
+from camera_detector import BatchFrameAnalyzer, CameraDetector
+from tracker_service import TrackerService
+
+# Block x position per sweep: still, moving, then still again
+POSITIONS = [40, 40, 40, 240, 440, 240, 240, 240, 240]
+
+def _frame(x):
+    """Dark 640x480 color frame with a bright 200x200 block at x"""
+    frame = np.full((480, 640, 3), 20, np.uint8)
+    frame[140:340, x:x + 200] = 230
+    return frame
+
+def _sweeps():
+    # Cabin 1 moves, cabin 2 stays still
+    return [{1: _frame(x), 2: _frame(40)} for x in POSITIONS]
+
+def _decisions(results):
+    return [(result['motion_detected'], result['is_active']) for result in results]
+
+def test_batch_matches_per_cabin_analysis():
+    batch = BatchFrameAnalyzer(CameraDetector())
+    single = CameraDetector()
+    batched, per_cabin = {1: [], 2: []}, {1: [], 2: []}
+    for frames in _sweeps():
+        for cabin_no, result in batch.analyze(frames).items():
+            batched[cabin_no].append(result)
+        for cabin_no, frame in frames.items():
+            per_cabin[cabin_no].append(single.analyze_frame(cabin_no, frame))
+
+    assert _decisions(batched[1]) == _decisions(per_cabin[1])
+    assert _decisions(batched[2]) == _decisions(per_cabin[2])
+    assert any(active for _, active in _decisions(batched[1]))
+    assert not any(active for _, active in _decisions(batched[2]))
+
+def test_batch_uses_the_cabin_motion_engine():
+    batch_detector = CameraDetector()
+    batch = BatchFrameAnalyzer(batch_detector)
+    single = CameraDetector()
+    engines = {1: 'mog2', 2: None}
+    batched, per_cabin = [], []
+    for frames in _sweeps():
+        batched.append(batch.analyze(frames, engines)[1])
+        per_cabin.append(single.analyze_frame(1, frames[1], 'mog2'))
+
+    assert _decisions(batched) == _decisions(per_cabin)
+    # Only the engine's own model saw the cabin
+    assert batch_detector.background_models[1][0] == 'mog2'
+    assert list(batch._slots) == [2]
+
+def test_process_backend_falls_back_to_per_cabin_detection():
+    async def scenario():
+        service = TrackerService()
+        service.detection_mode = 'batched'
+        service.detection_backend = 'process'
+        service.detection_workers = 1
+        await service.start()
+        try:
+            assert service.detection_mode == 'per_cabin'
+            assert service._process_pool is not None
+        finally:
+            await service.stop()
+
+    asyncio.run(scenario())
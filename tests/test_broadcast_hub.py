@@ -0,0 +1,236 @@
+"""
+Broadcast hub: snapshots, resume, slow client policies and the snapshot race
+"""
+import asyncio
+import json
+
+from broadcast_hub import BroadcastHub
+
+class FakeWebSocket:
+    """Records sent messages; sending waits while `blocked` is clear"""
+
+    def __init__(self):
+        self.messages = []
+        self.blocked = asyncio.Event()
+        self.blocked.set()
+
+    async def send_text(self, text):
+        await self.blocked.wait()
+        self.messages.append(json.loads(text))
+
+    async def close(self):
+        pass
+
+def _hub(policy='coalesce', queue_size=256):
+    hub = BroadcastHub()
+    hub.policy = policy
+    hub.queue_size = queue_size
+
+    async def snapshot():
+        return {'cabins': list(hub._cabins.values()), 'alerts': []}
+
+    hub.set_providers(snapshot, None)
+    return hub
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+async def _publish(hub, cabin_no, status):
+    hub.publish_cabin({'cabin_no': cabin_no, 'status': status})
+    return await hub.flush_tick()
+
+def test_new_client_gets_snapshot_then_deltas():
+    async def scenario():
+        hub = _hub()
+        await _publish(hub, 1, 'active')
+        ws = FakeWebSocket()
+        hub.connect(ws)
+        await _settle()
+        await _publish(hub, 1, 'idle')
+        await _settle()
+        await hub.stop()
+
+        snapshot, delta = ws.messages
+        assert snapshot['type'] == 'snapshot' and snapshot['seq'] == 1 and snapshot['epoch'] == hub.epoch
+        assert snapshot['cabins'] == [{'cabin_no': 1, 'status': 'active'}]
+        assert delta == {'type': 'delta', 'seq': 2, 'cabins': [{'cabin_no': 1, 'status': 'idle'}]}
+
+    asyncio.run(scenario())
+
+def test_resume_sends_only_missed_frames():
+    async def scenario():
+        hub = _hub()
+        for i in range(3):
+            await _publish(hub, 1, f"s{i}")
+
+        resumed = FakeWebSocket()
+        hub.connect(resumed, since=1, epoch=hub.epoch)
+        other_epoch = FakeWebSocket()
+        hub.connect(other_epoch, since=1, epoch='old')
+        await _settle()
+        await hub.stop()
+
+        assert [(m['type'], m['seq']) for m in resumed.messages] == [('delta', 2), ('delta', 3)]
+        assert [m['type'] for m in other_epoch.messages] == ['snapshot']
+
+    asyncio.run(scenario())
+
+def test_resume_past_the_buffer_gets_snapshot():
+    async def scenario():
+        hub = _hub()
+        hub._history = type(hub._history)(maxlen=2)
+        for i in range(5):
+            await _publish(hub, 1, f"s{i}")
+
+        ws = FakeWebSocket()
+        hub.connect(ws, since=1, epoch=hub.epoch)
+        await _settle()
+        await hub.stop()
+
+        assert [(m['type'], m['seq']) for m in ws.messages] == [('snapshot', 5)]
+
+    asyncio.run(scenario())
+
+def test_slow_client_frames_are_coalesced():
+    async def scenario():
+        hub = _hub(queue_size=1)
+        ws = FakeWebSocket()
+        hub.connect(ws)
+        await _settle()
+        ws.blocked.clear()
+
+        for cabin_no, status in [(1, 'active'), (1, 'idle'), (2, 'active'), (1, 'long_break')]:
+            await _publish(hub, cabin_no, status)
+        ws.blocked.set()
+        await _settle()
+        await hub.stop()
+
+        # The first frame fit in the outbox, the other three were merged
+        assert [(m['type'], m['seq']) for m in ws.messages] == [('snapshot', 0), ('delta', 1), ('delta', 4)]
+        assert sorted(ws.messages[-1]['cabins'], key=lambda c: c['cabin_no']) == [
+            {'cabin_no': 1, 'status': 'long_break'}, {'cabin_no': 2, 'status': 'active'}]
+        assert hub.stats()['coalesced'] == 3
+
+    asyncio.run(scenario())
+
+def test_slow_client_frames_are_dropped_for_a_snapshot():
+    async def scenario():
+        hub = _hub(policy='drop', queue_size=1)
+        ws = FakeWebSocket()
+        hub.connect(ws)
+        await _settle()
+        ws.blocked.clear()
+
+        for status in ['active', 'idle', 'long_break', 'empty']:
+            await _publish(hub, 1, status)
+        ws.blocked.set()
+        await _settle()
+        await hub.stop()
+
+        # The queued frames were discarded for one snapshot of the final state
+        assert [(m['type'], m['seq']) for m in ws.messages] == [('snapshot', 0), ('snapshot', 4)]
+        assert ws.messages[-1]['cabins'] == [{'cabin_no': 1, 'status': 'empty'}]
+        assert hub.stats()['dropped'] >= 1
+
+    asyncio.run(scenario())
+
+def _apply(messages):
+    """Dashboard state after applying the frames the way the client does"""
+    cabins, alerts = {}, {}
+    for message in messages:
+        if message['type'] == 'snapshot':
+            cabins = {cabin['cabin_no']: dict(cabin) for cabin in message.get('cabins', [])}
+            alerts = {}
+        for cabin in message.get('cabins', []) if message['type'] == 'delta' else []:
+            cabins.setdefault(cabin['cabin_no'], {}).update(cabin)
+        for alert in message.get('alerts', []):
+            alerts.setdefault(alert['id'], alert)
+    return cabins, list(alerts.values())
+
+def test_delta_flushed_while_snapshot_provider_is_suspended_is_not_lost():
+    async def scenario():
+        hub = _hub()
+        await _publish(hub, 1, 'active')
+        reading = asyncio.Event()
+        release = asyncio.Event()
+
+        async def snapshot():
+            # Cabins read first, then an await for the alerts
+            cabins = [dict(cabin) for cabin in hub._cabins.values()]
+            reading.set()
+            await release.wait()
+            return {'cabins': cabins, 'alerts': []}
+
+        hub.set_providers(snapshot, None)
+        ws = FakeWebSocket()
+        hub.connect(ws)
+        await reading.wait()
+
+        await _publish(hub, 1, 'idle')
+        release.set()
+        await _settle()
+        await hub.stop()
+
+        assert [(m['type'], m['seq']) for m in ws.messages] == [('snapshot', 1), ('delta', 2)]
+        assert _apply(ws.messages)[0] == {1: {'cabin_no': 1, 'status': 'idle'}}
+
+    asyncio.run(scenario())
+
+def test_alert_flushed_during_snapshot_read_is_applied_once():
+    async def scenario():
+        hub = _hub()
+        reading = asyncio.Event()
+        release = asyncio.Event()
+        alert = {'id': 'alert_1', 'cabin_no': 1, 'type': 'long_break'}
+
+        async def snapshot():
+            reading.set()
+            await release.wait()
+            return {'alerts': [alert]}
+
+        hub.set_providers(snapshot, None)
+        ws = FakeWebSocket()
+        hub.connect(ws)
+        await reading.wait()
+
+        # The alert is stored and published while the snapshot is being read
+        hub.publish_alert(alert)
+        await hub.flush_tick()
+        release.set()
+        await _settle()
+        await _publish(hub, 1, 'idle')
+        await _settle()
+        await hub.stop()
+
+        assert [(m['type'], m['seq']) for m in ws.messages] == [('snapshot', 0), ('delta', 1), ('delta', 2)]
+        assert _apply(ws.messages)[1] == [alert]
+
+    asyncio.run(scenario())
+
+def test_resync_during_snapshot_read_reads_again():
+    async def scenario():
+        hub = _hub()
+        reads = []
+        release = asyncio.Event()
+
+        async def snapshot():
+            reads.append(len(reads))
+            if len(reads) == 1:
+                await release.wait()
+            return {'read': len(reads)}
+
+        hub.set_providers(snapshot, None)
+        ws = FakeWebSocket()
+        hub.connect(ws)
+        await _settle()
+
+        hub.resync_all()
+        release.set()
+        await _settle()
+        await hub.stop()
+
+        assert len(reads) == 2
+        assert [(m['type'], m['read']) for m in ws.messages] == [('snapshot', 2)]
+
+    asyncio.run(scenario())
@@ -0,0 +1,156 @@
+"""
+Cabin store: copies, deletes, write-behind flushes, retries and the timestamp granularity
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import cabin_store as cabin_store_module
+from cabin_store import CabinStore
+from db_connector import AsyncMongitaWrapper
+
+NOW = datetime(2026, 10, 14, 9, tzinfo=timezone.utc)
+
+@pytest.fixture
+def store(memory_db, monkeypatch):
+    monkeypatch.setattr(cabin_store_module, 'db', memory_db)
+    store = CabinStore()
+    store.timestamp_granularity = 60
+
+    async def load():
+        await memory_db.cabins.insert_many([
+            {'_id': f"cabin_{i}", 'cabin_no': i, 'status': 'empty', 'last_activity': NOW} for i in (1, 2)
+        ])
+        await store.load()
+
+    asyncio.run(load())
+    return store
+
+@pytest.fixture
+def bulk_writes(monkeypatch):
+    """Operation lists passed to bulk_write"""
+    writes = []
+    bulk_write = AsyncMongitaWrapper.bulk_write
+
+    async def counting_bulk_write(self, operations, **kwargs):
+        writes.append(list(operations))
+        return await bulk_write(self, operations, **kwargs)
+
+    monkeypatch.setattr(AsyncMongitaWrapper, 'bulk_write', counting_bulk_write)
+    return writes
+
+async def _stored(db, cabin_no):
+    return await db.cabins.find_one({'cabin_no': cabin_no})
+
+def test_flush_coalesces_updates_into_one_write(store, memory_db, bulk_writes):
+    async def scenario():
+        await store.update(1, {'status': 'active'}, write_behind=True)
+        await store.update(1, {'status': 'idle', 'student_name': 'Ali'}, write_behind=True)
+        await store.update(2, {'status': 'active'}, write_behind=True)
+        # Back to the stored value: nothing to write
+        await store.update(2, {'status': 'empty'}, write_behind=True)
+        assert (await _stored(memory_db, 1))['status'] == 'empty'
+
+        assert await store.flush() == 1
+        assert len(bulk_writes) == 1 and len(bulk_writes[0]) == 1
+        stored = await _stored(memory_db, 1)
+        assert (stored['status'], stored['student_name']) == ('idle', 'Ali')
+        assert store.stats() == {'updates': 4, 'writes': 1, 'pending': 0}
+
+        # Flushed changes are not written again
+        assert await store.flush(force=True) == 0
+        assert len(bulk_writes) == 1
+
+    asyncio.run(scenario())
+
+def test_failed_flush_keeps_newer_pending_fields(store, memory_db, monkeypatch):
+    bulk_write = AsyncMongitaWrapper.bulk_write
+
+    async def failing_bulk_write(self, operations, **kwargs):
+        # A tracker update arrives while the write is in flight
+        await store.update(1, {'status': 'long_break'}, write_behind=True)
+        raise RuntimeError('database unavailable')
+
+    async def scenario():
+        await store.update(1, {'status': 'active', 'student_name': 'Ali'}, write_behind=True)
+        monkeypatch.setattr(AsyncMongitaWrapper, 'bulk_write', failing_bulk_write)
+        assert await store.flush() == 0
+        assert store._pending[1] == {'status': 'long_break', 'student_name': 'Ali'}
+
+        monkeypatch.setattr(AsyncMongitaWrapper, 'bulk_write', bulk_write)
+        assert await store.flush() == 1
+        stored = await _stored(memory_db, 1)
+        assert (stored['status'], stored['student_name']) == ('long_break', 'Ali')
+
+    asyncio.run(scenario())
+
+def test_small_time_changes_wait_for_force(store, memory_db, bulk_writes):
+    async def scenario():
+        await store.update(1, {'last_activity': NOW + timedelta(seconds=30)}, write_behind=True)
+        assert await store.flush() == 0
+        assert store.stats()['pending'] == 1
+
+        # Past the granularity it is written
+        await store.update(1, {'last_activity': NOW + timedelta(seconds=90)}, write_behind=True)
+        await store.update(2, {'last_activity': NOW + timedelta(seconds=10)}, write_behind=True)
+        assert await store.flush() == 1
+        assert (await _stored(memory_db, 1))['last_activity'] == NOW + timedelta(seconds=90)
+
+        assert await store.flush(force=True) == 1
+        assert (await _stored(memory_db, 2))['last_activity'] == NOW + timedelta(seconds=10)
+        assert len(bulk_writes) == 2
+
+    asyncio.run(scenario())
+
+def test_write_through_merges_buffered_fields(store, memory_db, bulk_writes):
+    async def scenario():
+        await store.update(1, {'status': 'active', 'last_activity': NOW + timedelta(seconds=5)}, write_behind=True)
+        cabin = await store.update(1, {'status': 'idle', 'student_name': 'Ali'})
+
+        assert cabin['status'] == 'idle'
+        stored = await _stored(memory_db, 1)
+        assert (stored['status'], stored['student_name'], stored['last_activity']) == \
+            ('idle', 'Ali', NOW + timedelta(seconds=5))
+        assert store.stats()['pending'] == 0
+        assert await store.flush(force=True) == 0
+        assert bulk_writes == []
+
+    asyncio.run(scenario())
+
+def test_reads_return_copies(store):
+    async def scenario():
+        cabin = store.get(1)
+        cabin['status'] = 'active'
+        store.all()[1]['status'] = 'active'
+        assert [cabin['status'] for cabin in store.all()] == ['empty', 'empty']
+
+        updated = await store.update(1, {'status': 'idle'}, write_behind=True)
+        updated['status'] = 'active'
+        assert store.get(1)['status'] == 'idle'
+        assert store.get(3) is None
+
+    asyncio.run(scenario())
+
+def test_delete_and_clear_drop_buffered_and_persisted_state(store, memory_db, bulk_writes):
+    async def scenario():
+        await store.update(1, {'status': 'active'}, write_behind=True)
+        await store.update(2, {'status': 'active'}, write_behind=True)
+        assert await store.delete(1)
+        assert not await store.delete(1)
+        assert 1 not in store._pending and 1 not in store._persisted
+        assert await _stored(memory_db, 1) is None
+
+        # A cabin added again under the same number starts clean
+        await store.insert({'_id': 'cabin_1b', 'cabin_no': 1, 'status': 'empty'})
+        assert store._persisted[1] == {'_id': 'cabin_1b', 'cabin_no': 1, 'status': 'empty'}
+        assert await store.flush() == 1
+        assert [op._filter for op in bulk_writes[0]] == [{'_id': 'cabin_2'}]
+
+        await store.update(2, {'status': 'idle'}, write_behind=True)
+        assert await store.clear() == 2
+        assert (len(store), store._pending, store._persisted) == (0, {}, {})
+        assert await memory_db.cabins.count_documents({}) == 0
+        assert await store.flush(force=True) == 0
+
+    asyncio.run(scenario())
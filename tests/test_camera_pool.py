@@ -0,0 +1,68 @@
+"""
+Camera HTTP pool: keep-alive reuse and a bounded wait for a free connection
+"""
+import http.server
+import socketserver
+import threading
+import time
+
+import pytest
+
+from camera_detector import CameraDetector
+
+class _SlowCamera(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    delay = 0.5
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        self.send_response(200)
+        self.send_header('Content-Length', '4')
+        self.end_headers()
+        self.wfile.write(b'jpeg')
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def camera_url():
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), _SlowCamera)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/capture"
+    server.shutdown()
+    server.server_close()
+
+def _detector(monkeypatch, pool_timeout, cabin_timeout='8'):
+    monkeypatch.setenv('CAMERA_MAX_CONNECTIONS', '1')
+    monkeypatch.setenv('CAMERA_POOL_TIMEOUT', pool_timeout)
+    monkeypatch.setenv('TRACKER_CABIN_TIMEOUT', cabin_timeout)
+    return CameraDetector()
+
+def test_pool_timeout_is_bounded_by_cabin_timeout(monkeypatch):
+    assert _detector(monkeypatch, '3').pool_timeout == 3
+    assert _detector(monkeypatch, '30', cabin_timeout='5').pool_timeout == 5
+
+def test_waiting_for_a_connection_gives_up_after_pool_timeout(monkeypatch, camera_url):
+    detector = _detector(monkeypatch, '0.1')
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(detector.fetch_bytes(camera_url)))
+               for _ in range(2)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert time.monotonic() - started < 2
+    assert sorted(results, key=lambda r: r is None) == [b'jpeg', None]
+
+def test_waiters_reuse_the_connection(monkeypatch, camera_url):
+    detector = _detector(monkeypatch, '3')
+    threads = [threading.Thread(target=detector.fetch_bytes, args=(camera_url,)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert detector.connection_stats() == {'requests': 3, 'new_connections': 1, 'reused_connections': 2}
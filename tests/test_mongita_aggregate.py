@@ -0,0 +1,108 @@
+"""
+Mongita aggregation: the local pipeline stages, accumulators and expressions
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+START = datetime(2026, 10, 4, 22, tzinfo=timezone.utc)  # Sunday
+
+def _sessions():
+    return [{
+        '_id': f"s{i}",
+        'cabin_no': i % 2 + 1,
+        'student_name': ['Ali', 'Ayşe', 'Ali'][i % 3],
+        'start_time': START + timedelta(hours=i),
+        'duration': 600 * (i + 1),
+        'tags': ['a', 'b'] if i % 2 else ['a']
+    } for i in range(6)]
+
+def _aggregate(db, pipeline):
+    async def scenario():
+        await db.sessions.insert_many(_sessions())
+        await db.sessions.create_index([('cabin_no', 1), ('start_time', 1)])
+        return await db.sessions.aggregate(pipeline).to_list(None)
+    return asyncio.run(scenario())
+
+def test_match_and_group_accumulators(memory_db):
+    docs = _aggregate(memory_db, [
+        {'$match': {'start_time': {'$gte': START}}},
+        {'$group': {
+            '_id': '$cabin_no',
+            'total': {'$sum': '$duration'},
+            'sessions': {'$sum': 1},
+            'count': {'$count': {}},
+            'average': {'$avg': '$duration'},
+            'shortest': {'$min': '$duration'},
+            'longest': {'$max': '$duration'},
+            'first': {'$first': '$_id'},
+            'last': {'$last': '$_id'},
+            'students': {'$addToSet': '$student_name'},
+            'ids': {'$push': '$_id'}
+        }},
+        {'$sort': {'_id': 1}}
+    ])
+
+    assert docs == [
+        {'_id': 1, 'total': 5400, 'sessions': 3, 'count': 3, 'average': 1800, 'shortest': 600, 'longest': 3000,
+         'first': 's0', 'last': 's4', 'students': ['Ali', 'Ayşe'], 'ids': ['s0', 's2', 's4']},
+        {'_id': 2, 'total': 7200, 'sessions': 3, 'count': 3, 'average': 2400, 'shortest': 1200, 'longest': 3600,
+         'first': 's1', 'last': 's5', 'students': ['Ayşe', 'Ali'], 'ids': ['s1', 's3', 's5']},
+    ]
+
+def test_date_operators_group_in_utc(memory_db):
+    docs = _aggregate(memory_db, [
+        {'$group': {
+            '_id': {'day': {'$dayOfWeek': '$start_time'}, 'hour': {'$hour': '$start_time'}},
+            'count': {'$sum': 1}
+        }},
+        {'$sort': {'_id.day': 1, '_id.hour': 1}},
+        {'$limit': 3}
+    ])
+    # 22:00 and 23:00 are on Sunday (1), the rest on Monday (2)
+    assert docs == [
+        {'_id': {'day': 1, 'hour': 22}, 'count': 1},
+        {'_id': {'day': 1, 'hour': 23}, 'count': 1},
+        {'_id': {'day': 2, 'hour': 0}, 'count': 1},
+    ]
+
+def test_project_add_fields_sort_skip_limit(memory_db):
+    docs = _aggregate(memory_db, [
+        {'$match': {'cabin_no': 2}},
+        {'$addFields': {'minutes': {'$divide': ['$duration', 60]}}},
+        {'$project': {'_id': 0, 'minutes': 1, 'hours': {'$divide': ['$minutes', 60]},
+                      'label': {'$ifNull': ['$missing', 'yok']}}},
+        {'$sort': {'minutes': -1}},
+        {'$skip': 1},
+        {'$limit': 1}
+    ])
+    assert docs == [{'minutes': 40, 'hours': 40 / 60, 'label': 'yok'}]
+
+def test_lazy_stages_keep_their_own_spec(memory_db):
+    docs = _aggregate(memory_db, [
+        {'$match': {'cabin_no': 1}},
+        {'$project': {'duration': 1}},
+        {'$match': {'duration': {'$gte': 1800}}},
+        {'$addFields': {'long': True}},
+        {'$project': {'_id': 1, 'long': 1}}
+    ])
+    assert docs == [{'_id': 's2', 'long': True}, {'_id': 's4', 'long': True}]
+
+def test_unwind_and_count(memory_db):
+    assert _aggregate(memory_db, [{'$unwind': '$tags'}, {'$match': {'tags': 'b'}}, {'$count': 'n'}]) == [{'n': 3}]
+
+def test_sort_with_limit_keeps_order_of_a_full_sort(memory_db):
+    docs = _aggregate(memory_db, [{'$sort': {'student_name': 1, 'duration': -1}}, {'$limit': 4}])
+    assert [doc['_id'] for doc in docs] == ['s5', 's3', 's2', 's0']
+
+def test_unsupported_pipeline_parts_are_errors(memory_db):
+    with pytest.raises(ValueError, match='Desteklenmeyen aggregate aşaması: \\$lookup'):
+        _aggregate(memory_db, [{'$lookup': {'from': 'cabins'}}])
+    with pytest.raises(ValueError, match='Desteklenmeyen \\$group operatörü: \\$stdDevPop'):
+        asyncio.run(memory_db.sessions.aggregate([{'$group': {'_id': None, 'x': {'$stdDevPop': '$duration'}}}])
+                    .to_list(None))
+    with pytest.raises(ValueError, match='Desteklenmeyen aggregate ifadesi: \\$concat'):
+        asyncio.run(memory_db.sessions.aggregate([{'$project': {'x': {'$concat': ['$student_name', '!']}}}]).to_list(None))
+    with pytest.raises(ValueError, match='Geçersiz aggregate aşaması'):
+        asyncio.run(memory_db.sessions.aggregate([{'$match': {}, '$limit': 1}]).to_list(None))
@@ -0,0 +1,72 @@
+"""
+Mongita bulk_write: one lock acquisition, batched inserts, indexes kept current
+"""
+import asyncio
+
+from pymongo import DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+
+def test_bulk_write_applies_ops_in_order(memory_db):
+    async def scenario():
+        await memory_db.cabins.create_index('status')
+        result = await memory_db.cabins.bulk_write([
+            InsertOne({'_id': 'c1', 'cabin_no': 1, 'status': 'empty'}),
+            InsertOne({'_id': 'c2', 'cabin_no': 2, 'status': 'empty'}),
+            UpdateOne({'cabin_no': 1}, {'$set': {'status': 'active'}}),
+            InsertOne({'_id': 'c3', 'cabin_no': 3, 'status': 'empty'}),
+            UpdateMany({'status': 'empty'}, {'$set': {'status': 'idle'}}),
+            UpdateOne({'cabin_no': 4}, {'$set': {'status': 'active'}}, upsert=True),
+            ReplaceOne({'cabin_no': 3}, {'cabin_no': 3, 'status': 'long_break'}),
+            DeleteOne({'cabin_no': 2}),
+        ])
+
+        assert (result.inserted_count, result.matched_count, result.modified_count,
+                result.deleted_count, result.upserted_count) == (3, 4, 4, 1, 1)
+        assert list(result.upserted_ids) == [5]
+
+        statuses = {doc['cabin_no']: doc['status'] for doc in await memory_db.cabins.find().to_list(None)}
+        assert statuses == {1: 'active', 3: 'long_break', 4: 'active'}
+        # Index lookups see every write
+        assert sorted(doc['cabin_no'] for doc in await memory_db.cabins.find({'status': 'active'}).to_list(None)) == [1, 4]
+        assert await memory_db.cabins.count_documents({'status': 'idle'}) == 0
+
+    asyncio.run(scenario())
+
+def test_bulk_write_takes_the_lock_once_and_batches_inserts(memory_db, monkeypatch):
+    collection = memory_db.sessions
+    batches = []
+
+    class CountingLock:
+        """Counts outermost acquisitions of the reentrant lock"""
+
+        def __init__(self, lock):
+            self._lock = lock
+            self.depth = 0
+            self.acquired = 0
+
+        def __enter__(self):
+            self._lock.__enter__()
+            self.depth += 1
+            self.acquired += self.depth == 1
+
+        def __exit__(self, *exc):
+            self.depth -= 1
+            return self._lock.__exit__(*exc)
+
+    async def scenario():
+        await collection.create_index('cabin_no')
+        insert_many = collection._collection.insert_many
+        monkeypatch.setattr(collection._collection, 'insert_many',
+                            lambda docs, **kwargs: batches.append(len(docs)) or insert_many(docs, **kwargs))
+        lock = CountingLock(collection._indexes.lock)
+        monkeypatch.setattr(collection._indexes, 'lock', lock)
+
+        ops = [InsertOne({'_id': f"s{i}", 'cabin_no': i % 3}) for i in range(50)]
+        ops += [DeleteOne({'cabin_no': 0}), UpdateMany({'cabin_no': 2}, {'$set': {'cabin_no': 1}})]
+        ops += [InsertOne({'_id': f"t{i}", 'cabin_no': 1}) for i in range(5)]
+        await collection.bulk_write(ops)
+
+        assert lock.acquired == 1
+        assert batches == [50, 5]
+        assert await collection.count_documents({'cabin_no': 1}) == 17 + 16 + 5
+
+    asyncio.run(scenario())
@@ -0,0 +1,101 @@
+"""
+Mongita secondary indexes: planning, candidates and queries matching a full scan
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from db_connector import SecondaryIndex
+
+START = datetime(2026, 10, 1, tzinfo=timezone.utc)
+
+def _index(docs):
+    index = SecondaryIndex(['cabin_no', 'start_time'])
+    index.build(docs)
+    return index
+
+def _docs():
+    return [{'_id': f"s{i}", 'cabin_no': i % 3, 'start_time': START + timedelta(hours=i)} for i in range(12)]
+
+def _candidates(index, filter_query):
+    _, prefix, bounds = index.plan(filter_query)
+    return index.candidates(prefix, bounds)
+
+def test_plan_uses_equality_prefix_then_one_range():
+    index = _index(_docs())
+    assert index.plan({'cabin_no': 1})[:2] == (1, ((1, 1),))
+    assert index.plan({'cabin_no': {'$eq': 1}})[:2] == (1, ((1, 1),))
+    score, prefix, bounds = index.plan({'cabin_no': 1, 'start_time': {'$gte': START}})
+    assert score == 2 and set(bounds) == {'$gte'}
+    # A leading field without a condition leaves nothing to narrow
+    assert index.plan({'start_time': {'$gte': START}}) == (0, (), None)
+    # Operators other than ranges stop the plan
+    assert index.plan({'cabin_no': {'$in': [1, 2]}}) == (0, (), None)
+
+def test_candidates_follow_key_order_and_range_bounds():
+    index = _index(_docs())
+    assert _candidates(index, {'cabin_no': 1}) == ['s1', 's4', 's7', 's10']
+
+    low, high = START + timedelta(hours=4), START + timedelta(hours=10)
+    assert _candidates(index, {'cabin_no': 1, 'start_time': {'$gte': low, '$lt': high}}) == ['s4', 's7']
+    assert _candidates(index, {'cabin_no': 1, 'start_time': {'$gt': low, '$lte': high}}) == ['s7', 's10']
+    assert _candidates(index, {'cabin_no': 1, 'start_time': {'$lt': low}}) == ['s1']
+
+def test_values_of_different_types_do_not_mix():
+    index = SecondaryIndex(['cabin_no'])
+    index.build([{'_id': 'a', 'cabin_no': 1}, {'_id': 'b', 'cabin_no': '1'},
+                 {'_id': 'c', 'cabin_no': None}, {'_id': 'd', 'cabin_no': 2.5}])
+    assert _candidates(index, {'cabin_no': {'$gte': 0}}) == ['a', 'd']
+    assert _candidates(index, {'cabin_no': {'$gte': ''}}) == ['b']
+    assert _candidates(index, {'cabin_no': None}) == ['c']
+
+def test_unindexable_values_are_always_candidates():
+    index = SecondaryIndex(['tags'])
+    index.build([{'_id': 'a', 'tags': 'x'}, {'_id': 'b', 'tags': ['x', 'y']}])
+    assert _candidates(index, {'tags': 'y'}) == ['b']
+    assert len(index) == 2
+    assert index.sort_plan({}, [('tags', 1)]) is None
+
+def test_add_moves_and_remove_forgets_keys():
+    index = _index(_docs())
+    index.add({'_id': 's1', 'cabin_no': 2, 'start_time': START})
+    assert 's1' not in _candidates(index, {'cabin_no': 1})
+    assert _candidates(index, {'cabin_no': 2})[0] == 's1'
+
+    for doc_id in ('s2', 's5', 's8', 's11'):
+        index.remove(doc_id)
+    assert _candidates(index, {'cabin_no': 2}) == ['s1']
+    index.remove('missing')
+    assert len(index) == 8
+
+def test_indexed_queries_match_a_full_scan(memory_db):
+    docs = _docs() + [{'_id': 'naive', 'cabin_no': 1, 'start_time': datetime(2026, 10, 1, 5)},
+                      {'_id': 'nostart', 'cabin_no': 1}]
+    low, high = START + timedelta(hours=2), START + timedelta(hours=9)
+    queries = [
+        {'cabin_no': 1},
+        {'cabin_no': 1, 'start_time': {'$gte': low, '$lt': high}},
+        {'start_time': {'$gte': low}},
+        {'cabin_no': 0, 'start_time': {'$lte': high.replace(tzinfo=None)}},
+        {'cabin_no': 5},
+    ]
+
+    async def results(db):
+        return [sorted(doc['_id'] for doc in await db.sessions.find(query).to_list(None)) for query in queries]
+
+    async def scenario():
+        await memory_db.sessions.insert_many(docs)
+        scanned = await results(memory_db)
+        # Naive datetimes count as UTC
+        assert scanned[1] == ['naive', 's4', 's7']
+        await memory_db.sessions.create_index([('cabin_no', 1), ('start_time', 1)])
+        await memory_db.sessions.create_index('start_time')
+        assert await results(memory_db) == scanned
+
+        # Writes keep the indexes current
+        await memory_db.sessions.update_one({'_id': 's4'}, {'$set': {'cabin_no': 0}})
+        await memory_db.sessions.delete_one({'_id': 's7'})
+        assert sorted(d['_id'] for d in await memory_db.sessions.find({'cabin_no': 1}).to_list(None)) == \
+            ['naive', 'nostart', 's1', 's10']
+        assert await memory_db.sessions.count_documents({'cabin_no': 0, 'start_time': {'$gte': START}}) == 5
+
+    asyncio.run(scenario())
@@ -0,0 +1,122 @@
+"""
+Sorted Mongita cursors read from an index in key order instead of sorting in memory
+"""
+import asyncio
+import random
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+import db_connector
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+def _sessions(count, seed=1):
+    rng = random.Random(seed)
+    return [{
+        '_id': f"s{i:06d}",
+        'cabin_no': rng.randint(1, 5),
+        'student_name': f"Öğrenci {i % 7}",
+        # Whole minutes, so many sessions share a start time
+        'start_time': START + timedelta(minutes=rng.randint(0, count // 2)),
+        'duration': rng.randint(60, 7200)
+    } for i in range(count)]
+
+async def _setup(db, sessions):
+    await db.sessions.create_index([("cabin_no", 1), ("start_time", 1)])
+    await db.sessions.create_index("start_time")
+    await db.sessions.insert_many(sessions)
+
+def _expected(sessions, match, sort_spec):
+    docs = [s for s in sessions if match(s)]
+    for field, direction in reversed(sort_spec):
+        docs.sort(key=lambda s: s[field], reverse=direction == -1)
+    return [s['_id'] for s in docs]
+
+def test_sorted_queries_use_index_order(memory_db):
+    sessions = _sessions(600)
+    low, high = START + timedelta(minutes=50), START + timedelta(minutes=200)
+    cases = [
+        ({'start_time': {'$gte': low, '$lt': high}}, [('start_time', 1), ('_id', 1)],
+         lambda s: low <= s['start_time'] < high),
+        ({'start_time': {'$gte': low, '$lt': high}, 'cabin_no': 3}, [('start_time', 1), ('_id', 1)],
+         lambda s: low <= s['start_time'] < high and s['cabin_no'] == 3),
+        ({'start_time': {'$gte': low, '$lt': high}, 'cabin_no': {'$in': [2, 4]}}, [('start_time', 1), ('_id', 1)],
+         lambda s: low <= s['start_time'] < high and s['cabin_no'] in (2, 4)),
+        ({'cabin_no': 1}, [('start_time', -1), ('_id', -1)], lambda s: s['cabin_no'] == 1),
+        ({}, [('start_time', 1)], lambda s: True),
+    ]
+
+    async def scenario():
+        await _setup(memory_db, sessions)
+        for query, sort_spec, match in cases:
+            assert memory_db.sessions._iter_sorted(query, sort_spec) is not None
+            docs = await memory_db.sessions.find(query, {'start_time': 1}).sort(sort_spec).to_list(None)
+            ids = [doc['_id'] for doc in docs]
+            expected = _expected(sessions, match, sort_spec)
+            if sort_spec[-1][0] == '_id':
+                assert ids == expected
+            else:
+                # Ties on start_time may come in any order
+                assert sorted(ids) == sorted(expected)
+                assert [doc['start_time'] for doc in docs] == sorted(doc['start_time'] for doc in docs)
+
+    asyncio.run(scenario())
+
+def test_sort_without_matching_index_falls_back(memory_db):
+    sessions = _sessions(200)
+
+    async def scenario():
+        await _setup(memory_db, sessions)
+        assert memory_db.sessions._iter_sorted({}, [('duration', 1)]) is None
+        assert memory_db.sessions._iter_sorted({}, [('start_time', 1), ('duration', 1)]) is None
+        docs = await memory_db.sessions.find({}).sort('duration', 1).to_list(None)
+        assert [doc['duration'] for doc in docs] == sorted(s['duration'] for s in sessions)
+
+    asyncio.run(scenario())
+
+def test_ordered_iteration_survives_writes_between_chunks(memory_db, monkeypatch):
+    monkeypatch.setattr(db_connector, '_SCAN_CHUNK', 10)
+    sessions = [{'_id': f"s{i:03d}", 'cabin_no': 1, 'start_time': START + timedelta(minutes=i)} for i in range(100)]
+
+    async def scenario():
+        await _setup(memory_db, sessions)
+        seen = []
+        async for doc in memory_db.sessions.find({}).sort([('start_time', 1), ('_id', 1)]):
+            seen.append(doc['_id'])
+            if len(seen) == 15:
+                # Earlier key (already passed) and a later one
+                await memory_db.sessions.insert_one({'_id': 'early', 'cabin_no': 1, 'start_time': START})
+                await memory_db.sessions.insert_one({'_id': 'late', 'cabin_no': 1, 'start_time': START + timedelta(days=1)})
+        assert seen == [s['_id'] for s in sessions] + ['late']
+
+    asyncio.run(scenario())
+
+def test_sorted_report_query_memory_is_bounded(memory_db):
+    sessions = _sessions(20000)
+    query = {'start_time': {'$gte': START, '$lt': START + timedelta(days=30)}}
+    sort_spec = [('start_time', 1), ('_id', 1)]
+
+    async def peak(cursor):
+        tracemalloc.start()
+        try:
+            count = 0
+            async for _ in cursor:
+                count += 1
+            return count, tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    async def scenario():
+        await _setup(memory_db, sessions)
+        indexed = await peak(memory_db.sessions.find(query, {'start_time': 1}).sort(sort_spec))
+
+        # Same query sorted in memory (no usable index)
+        cursor = memory_db.sessions.find(query, {'start_time': 1}).sort(sort_spec)
+        cursor._ordered_source = None
+        in_memory = await peak(cursor)
+        return indexed, in_memory
+
+    (count, indexed_peak), (_, in_memory_peak) = asyncio.run(scenario())
+    assert count == len(sessions)
+    assert indexed_peak < 2 * 1024 * 1024
+    assert indexed_peak * 4 < in_memory_peak
@@ -0,0 +1,52 @@
+"""
+Motion detection: the same occupied/empty decisions at every decode scale and with every engine
+"""
+import cv2
+import numpy as np
+import pytest
+
+from camera_detector import MOTION_ENGINES, REDUCED_GRAYSCALE_FLAGS, CameraDetector
+
+def _jpeg(x, size):
+    """Dark 640x480 JPEG with a bright size x size block at x"""
+    frame = np.full((480, 640, 3), 20, np.uint8)
+    frame[140:140 + size, x:x + size] = 230
+    return cv2.imencode('.jpg', frame)[1].tobytes()
+
+# Still, a large movement, then still again
+LARGE = [_jpeg(x, 200) for x in (40, 40, 40, 240, 440, 240, 40, 40, 40, 40)]
+# Movement smaller than min_area
+SMALL = [_jpeg(x, 12) for x in (100, 100, 124, 148, 172, 196, 220)]
+
+def _detector(decode_scale):
+    detector = CameraDetector()
+    detector.decode_scale = decode_scale
+    return detector
+
+def _decisions(detector, frames, engine=None):
+    results = [detector.analyze_content(1, content, engine) for content in frames]
+    return [(result['motion_detected'], result['is_active']) for result in results]
+
+@pytest.mark.parametrize('decode_scale', sorted(REDUCED_GRAYSCALE_FLAGS))
+def test_reduced_decode_decides_like_full_decode(decode_scale):
+    assert _detector(decode_scale).decode_image(LARGE[0]).shape == (480 // decode_scale, 640 // decode_scale)
+
+    full = _decisions(_detector(1), LARGE)
+    assert _decisions(_detector(decode_scale), LARGE) == full
+    assert full[4] == (True, True) and full[-1] == (False, False)
+
+    # The minimum area is scaled with the frame, small movements stay below it
+    assert not any(motion for motion, _ in _decisions(_detector(decode_scale), SMALL))
+    assert not any(motion for motion, _ in _decisions(_detector(1), SMALL))
+
+@pytest.mark.parametrize('engine', MOTION_ENGINES)
+def test_every_engine_decides_empty_then_occupied(engine):
+    # An empty cabin long enough for the background models to settle, then
+    # someone moving across it (MOG2 learns positions it sees again)
+    empty = [_jpeg(40, 200)] * 30
+    moving = [_jpeg(x, 200) for x in (100, 160, 220, 280, 340, 400)]
+    detector = _detector(1)
+
+    assert _decisions(detector, empty, engine)[-1] == (False, False)
+    assert _decisions(detector, moving, engine)[-1] == (True, True)
+    assert detector.background_models.get(1, (engine,))[0] == engine
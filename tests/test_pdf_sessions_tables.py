@@ -0,0 +1,75 @@
+"""
+PDF sessions section: page-sized tables with a repeated header, built lazily
+"""
+import csv
+from datetime import datetime, timedelta
+
+from reportlab.platypus import doctemplate
+
+from pdf_generator import SESSIONS_HEADER, SESSIONS_PER_TABLE, _LazyStory, pdf_generator
+
+def _rows(count):
+    start = datetime(2026, 10, 1, 8)
+    return [pdf_generator.session_row({
+        'cabin_no': 1, 'student_name': 'Ali', 'start_time': start + timedelta(minutes=i),
+        'end_time': start + timedelta(minutes=i + 1), 'duration': 60
+    }) for i in range(count)]
+
+def _report_data(tmp_path, count):
+    path = tmp_path / 'rows.csv'
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(_rows(count))
+    return {
+        'type': 'monthly', 'title': 'Aylık', 'period': '01/10/2026 - 01/11/2026',
+        'student_name': 'Ali', 'cabin_no': 1, 'stats': {'Toplam': '1 saat'},
+        'sessions_file': str(path), 'sessions_count': count, 'daily_breakdown': None
+    }
+
+def test_tables_are_page_sized_with_repeated_header():
+    tables = list(pdf_generator.iter_sessions_tables(_rows(2 * SESSIONS_PER_TABLE + 5)))
+
+    assert [len(table._cellvalues) - 1 for table in tables] == [SESSIONS_PER_TABLE, SESSIONS_PER_TABLE, 5]
+    assert all(table._cellvalues[0] == SESSIONS_HEADER for table in tables)
+    assert all(table.repeatRows == 1 for table in tables)
+
+def test_lazy_story_pulls_flowables_on_demand():
+    pulled = []
+
+    def flowables():
+        for i in range(10):
+            pulled.append(i)
+            yield i
+
+    story = _LazyStory(flowables(), lookahead=3)
+    assert pulled == []
+    assert len(story) == 3 and pulled == [0, 1, 2]
+    del story[0]
+    assert len(story) == 3 and pulled == [0, 1, 2, 3]
+
+def test_report_lists_every_session_with_bounded_story(tmp_path, monkeypatch):
+    count = 10 * SESSIONS_PER_TABLE + 1
+    buffered = []
+    tables = []
+    handle_flowable = doctemplate.BaseDocTemplate.handle_flowable
+    create_sessions_table = pdf_generator.create_sessions_table
+
+    def track_handle(self, flowables):
+        buffered.append(list.__len__(flowables))
+        return handle_flowable(self, flowables)
+
+    def track_table(rows):
+        table = create_sessions_table(rows)
+        tables.append(len(table._cellvalues) - 1)
+        return table
+
+    monkeypatch.setattr(doctemplate.BaseDocTemplate, 'handle_flowable', track_handle)
+    monkeypatch.setattr(pdf_generator, 'create_sessions_table', track_table)
+
+    output = tmp_path / 'report.pdf'
+    pdf_generator.generate_report(_report_data(tmp_path, count), str(output))
+
+    assert sum(tables) == count
+    assert len(tables) == 11
+    # Tables are created while the document is laid out, never all at once
+    assert max(buffered) <= 2 * 4
+    assert output.read_bytes().startswith(b'%PDF')
@@ -0,0 +1,76 @@
+"""
+Adaptive poll scheduler: due order, backoff and its caps
+"""
+from tracker_service import PollScheduler
+
+def _scheduler():
+    return PollScheduler(min_interval=5, base_interval=10, max_staleness=60)
+
+def test_new_cabins_are_due_immediately_and_removed_ones_forgotten():
+    scheduler = _scheduler()
+    scheduler.sync([1, 2, 3], now=0)
+    assert sorted(scheduler.pop_due(0)) == [1, 2, 3]
+
+    for cabin_no in (1, 2, 3):
+        scheduler.reschedule(cabin_no, 0, 'active')
+    scheduler.sync([1, 3, 4], now=1)
+    assert len(scheduler) == 3
+    assert scheduler.pop_due(1) == [4]
+    assert sorted(scheduler.pop_due(10)) == [1, 3]
+    assert scheduler.next_due() is None
+
+def test_outcomes_set_the_next_interval():
+    scheduler = _scheduler()
+    scheduler.sync([1, 2], now=0)
+    scheduler.pop_due(0)
+    scheduler.reschedule(1, 0, 'changed')
+    scheduler.reschedule(2, 0, 'active')
+
+    assert scheduler.next_due() == 5
+    assert scheduler.pop_due(5) == [1]
+    assert scheduler.pop_due(9.9) == []
+    assert scheduler.pop_due(10) == [2]
+
+def _backoff(scheduler, outcome, polls=6):
+    """Intervals of a cabin polled repeatedly with the same outcome"""
+    scheduler.sync([1], now=0)
+    now, intervals = 0, []
+    for _ in range(polls):
+        assert scheduler.pop_due(now) == [1]
+        scheduler.reschedule(1, now, outcome)
+        intervals.append(scheduler.next_due() - now)
+        now = scheduler.next_due()
+    return now, intervals
+
+def test_offline_cabins_back_off_up_to_max_staleness():
+    assert _backoff(_scheduler(), 'offline')[1] == [10, 20, 40, 60, 60, 60]
+
+def test_quiet_cabins_back_off_up_to_the_quiet_cap():
+    scheduler = _scheduler()
+    assert scheduler.quiet_max_interval == 30
+    now, intervals = _backoff(scheduler, 'quiet')
+    assert intervals == [10, 20, 30, 30, 30, 30]
+
+    # A change resets the backoff
+    scheduler.pop_due(now)
+    scheduler.reschedule(1, now, 'changed')
+    assert scheduler.next_due() - now == 5
+    now = scheduler.next_due()
+    scheduler.pop_due(now)
+    scheduler.reschedule(1, now, 'offline')
+    assert scheduler.next_due() - now == 10
+
+def test_rescheduling_replaces_the_previous_due_time():
+    scheduler = _scheduler()
+    scheduler.sync([1], now=0)
+    scheduler.pop_due(0)
+    scheduler.reschedule(1, 0, 'quiet')
+    scheduler.reschedule(1, 0, 'changed')
+
+    assert scheduler.pop_due(5) == [1]
+    assert scheduler.pop_due(100) == []
+
+def test_quiet_cap_is_configurable_within_max_staleness():
+    assert PollScheduler(5, 10, 60, quiet_max_interval=15).quiet_max_interval == 15
+    assert PollScheduler(5, 10, 60, quiet_max_interval=120).quiet_max_interval == 60
+    assert PollScheduler(5, 30, 60).quiet_max_interval == 60
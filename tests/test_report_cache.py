@@ -0,0 +1,109 @@
+"""
+Report cache: fingerprints, lookups and the disk budget
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import report_cache as report_cache_module
+from models import ReportType
+from report_builder import ReportBuilder
+from report_cache import ReportCache, ReportFingerprint
+
+PERIOD = (datetime(2026, 10, 1, tzinfo=timezone.utc), datetime(2026, 10, 2, tzinfo=timezone.utc),
+          '2026-10-01', 'Günlük Aktivite Raporu')
+
+def _session(i, duration=600):
+    start = PERIOD[0] + timedelta(hours=i)
+    return {'_id': f"s{i}", 'cabin_no': 1, 'student_name': 'Ali', 'start_time': start,
+            'end_time': start + timedelta(seconds=duration), 'duration': duration}
+
+def _fingerprint(sessions, student_name='Ali'):
+    fingerprint = ReportFingerprint(ReportType.daily, PERIOD, 1, student_name)
+    for session in sessions:
+        fingerprint.add(session)
+    return fingerprint.hexdigest()
+
+@pytest.fixture
+def cache(memory_db, tmp_path):
+    report_cache_module.set_database(memory_db)
+    cache = ReportCache()
+    cache.max_bytes = 250
+    return cache
+
+async def _store(db, tmp_path, name, size, created_at, fingerprint=None):
+    path = tmp_path / f"{name}.pdf"
+    path.write_bytes(b'x' * size)
+    await db.reports.insert_one({'_id': name, 'fingerprint': fingerprint or name,
+                                 'file_path': str(path), 'created_at': created_at})
+    return path
+
+def test_fingerprint_depends_on_inputs(monkeypatch):
+    sessions = [_session(i) for i in range(3)]
+    assert _fingerprint(sessions) == _fingerprint([dict(s) for s in sessions])
+    assert _fingerprint(sessions) != _fingerprint(sessions[:2])
+    assert _fingerprint(sessions) != _fingerprint(sessions[:2] + [_session(2, duration=601)])
+    assert _fingerprint(sessions) != _fingerprint(sessions, student_name='Veli')
+
+    before = _fingerprint(sessions)
+    monkeypatch.setattr(report_cache_module, 'TEMPLATE_VERSION', report_cache_module.TEMPLATE_VERSION + 1)
+    assert _fingerprint(sessions) != before
+
+def test_report_filename_uses_type_value():
+    builder = ReportBuilder(ReportType.weekly, 1, PERIOD, 'Ali')
+    _, report, _ = builder.finish()
+    assert report.filename.startswith('report_weekly_2026-10-01_cabin1_')
+    assert report.fingerprint[:12] in report.filename
+
+def test_lookup_removes_records_without_file(cache, memory_db, tmp_path):
+    async def scenario():
+        now = datetime.now(timezone.utc)
+        path = await _store(memory_db, tmp_path, 'a', 10, now)
+        assert (await cache.lookup('a'))['_id'] == 'a'
+
+        os.remove(path)
+        assert await cache.lookup('a') is None
+        assert await memory_db.reports.count_documents({}) == 0
+        assert cache.stats() == {'hits': 1, 'misses': 1, 'evicted': 0}
+
+    asyncio.run(scenario())
+
+def test_enforce_budget_evicts_oldest(cache, memory_db, tmp_path):
+    async def scenario():
+        now = datetime.now(timezone.utc)
+        old = await _store(memory_db, tmp_path, 'old', 100, now - timedelta(hours=2))
+        await _store(memory_db, tmp_path, 'mid', 100, now - timedelta(hours=1))
+        await _store(memory_db, tmp_path, 'new', 100, now)
+
+        assert await cache.enforce_budget() == 1
+        assert not old.exists()
+        assert sorted(r['_id'] for r in await memory_db.reports.find().to_list(None)) == ['mid', 'new']
+
+    asyncio.run(scenario())
+
+def test_enforce_budget_keeps_requested_fingerprints(cache, memory_db, tmp_path):
+    async def scenario():
+        now = datetime.now(timezone.utc)
+        old = await _store(memory_db, tmp_path, 'old', 100, now - timedelta(hours=2))
+        mid = await _store(memory_db, tmp_path, 'mid', 100, now - timedelta(hours=1))
+        await _store(memory_db, tmp_path, 'new', 100, now)
+
+        # The oldest report was just returned to a client, the next one goes instead
+        assert await cache.enforce_budget(keep={'old'}) == 1
+        assert old.exists() and not mid.exists()
+
+    asyncio.run(scenario())
+
+def test_enforce_budget_drops_records_without_file(cache, memory_db, tmp_path):
+    async def scenario():
+        now = datetime.now(timezone.utc)
+        gone = await _store(memory_db, tmp_path, 'gone', 10, now)
+        await _store(memory_db, tmp_path, 'kept', 10, now - timedelta(hours=1))
+        os.remove(gone)
+
+        assert await cache.enforce_budget() == 1
+        assert [r['_id'] for r in await memory_db.reports.find().to_list(None)] == ['kept']
+
+    asyncio.run(scenario())
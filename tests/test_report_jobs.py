@@ -0,0 +1,83 @@
+"""
+Report jobs: rendering in the process pool, pending lookups and spool cleanup
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+from models import ReportType
+from report_builder import ReportBuilder
+from report_jobs import ReportJobQueue
+
+PERIOD = (datetime(2026, 10, 1, tzinfo=timezone.utc), datetime(2026, 10, 2, tzinfo=timezone.utc),
+          '2026-10-01', 'Günlük Aktivite Raporu')
+
+def _builder(sessions=3, rows='spool'):
+    builder = ReportBuilder(ReportType.daily, 1, PERIOD, 'Ali', rows=rows)
+    for i in range(sessions):
+        start = PERIOD[0] + timedelta(hours=i)
+        builder.add({'_id': f"s{i}", 'cabin_no': 1, 'student_name': 'Ali', 'start_time': start,
+                     'end_time': start + timedelta(minutes=10), 'duration': 600})
+    return builder
+
+def test_builder_without_rows_writes_no_spool():
+    counted, spooled = _builder(rows=None), _builder()
+    _, counted_report, counted_summary = counted.finish()
+    pdf_data, spooled_report, spooled_summary = spooled.finish()
+
+    assert counted.sessions_file is None
+    assert counted_report.fingerprint == spooled_report.fingerprint
+    assert counted_summary == spooled_summary
+    assert os.path.exists(pdf_data['sessions_file'])
+    spooled.discard()
+    assert not os.path.exists(pdf_data['sessions_file'])
+
+def test_job_renders_stores_and_removes_spool(tmp_path):
+    async def scenario():
+        queue = ReportJobQueue()
+        queue.workers = 1
+        pdf_data, report, _ = _builder().finish()
+        # The output directory does not exist yet
+        output = tmp_path / 'reports' / report.filename
+        completed = []
+
+        async def on_complete(rendered):
+            completed.append(rendered)
+            return [{'_id': report.id}]
+
+        try:
+            job = queue.submit([(pdf_data, str(output))], on_complete, fingerprints=[report.fingerprint])
+            assert queue.pending_for(report.fingerprint)['id'] == job['id']
+            assert queue.pending_fingerprints() == {report.fingerprint}
+
+            await asyncio.gather(*queue._tasks)
+        finally:
+            await queue.stop()
+
+        state = queue.get(job['id'])
+        assert state['status'] == 'done'
+        assert state['report_ids'] == [report.id]
+        assert (state['total'], state['rendered'], state['failed']) == (1, 1, 0)
+        assert completed == [[True]]
+        assert output.read_bytes().startswith(b'%PDF')
+        assert not os.path.exists(pdf_data['sessions_file'])
+        assert queue.pending_for(report.fingerprint) is None
+
+    asyncio.run(scenario())
+
+def test_preview_render_stays_in_memory():
+    async def scenario():
+        queue = ReportJobQueue()
+        queue.workers = 1
+        builder = _builder(rows='memory')
+        pdf_data, _, _ = builder.finish()
+        try:
+            pdf_bytes = await queue.render(pdf_data)
+        finally:
+            await queue.stop()
+
+        assert builder.sessions_file is None
+        assert len(pdf_data['session_rows']) == 3
+        assert pdf_bytes.startswith(b'%PDF')
+
+    asyncio.run(scenario())
@@ -0,0 +1,133 @@
+"""
+Response cache: single-flight misses, cancellation, invalidation and ETags
+"""
+import asyncio
+
+from starlette.requests import Request
+
+from response_cache import CABINS, SESSIONS, ResponseCache
+
+def _request(path='/api/cabins', if_none_match=None):
+    headers = [(b'if-none-match', if_none_match.encode())] if if_none_match else []
+    return Request({'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'', 'headers': headers})
+
+def test_concurrent_misses_share_one_computation():
+    async def scenario():
+        cache = ResponseCache()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {'cabins': [1, 2]}
+
+        responses = await asyncio.gather(*(cache.respond(_request(), {CABINS}, compute) for _ in range(5)))
+        assert len(calls) == 1
+        assert {r.body for r in responses} == {b'{"cabins":[1,2]}'}
+        assert cache.stats()['misses'] == 1 and cache.stats()['hits'] == 4
+
+    asyncio.run(scenario())
+
+def test_cancelled_leader_does_not_cancel_waiters():
+    async def scenario():
+        cache = ResponseCache()
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def compute():
+            started.set()
+            await release.wait()
+            return {'ok': True}
+
+        leader = asyncio.create_task(cache.respond(_request(), {CABINS}, compute))
+        await started.wait()
+        waiter = asyncio.create_task(cache.respond(_request(), {CABINS}, compute))
+        await asyncio.sleep(0)
+
+        # Client of the first request disconnects
+        leader.cancel()
+        await asyncio.sleep(0)
+        assert leader.cancelled()
+
+        release.set()
+        response = await waiter
+        assert response.body == b'{"ok":true}'
+        assert cache.stats()['entries'] == 1
+        assert cache._inflight == {}
+
+    asyncio.run(scenario())
+
+def test_result_of_cancelled_caller_is_still_cached():
+    async def scenario():
+        cache = ResponseCache()
+        release = asyncio.Event()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await release.wait()
+            return {'ok': True}
+
+        leader = asyncio.create_task(cache.respond(_request(), {CABINS}, compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+        release.set()
+        await asyncio.sleep(0.01)
+
+        response = await cache.respond(_request(), {CABINS}, compute)
+        assert response.body == b'{"ok":true}'
+        assert len(calls) == 1
+
+    asyncio.run(scenario())
+
+def test_failure_reaches_every_waiter():
+    async def scenario():
+        cache = ResponseCache()
+
+        async def compute():
+            await asyncio.sleep(0.01)
+            raise RuntimeError('db down')
+
+        results = await asyncio.gather(*(cache.respond(_request(), {CABINS}, compute) for _ in range(3)),
+                                       return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert cache.stats()['entries'] == 0 and cache._inflight == {}
+
+    asyncio.run(scenario())
+
+def test_invalidation_during_compute_is_not_stored():
+    async def scenario():
+        cache = ResponseCache()
+        values = iter([{'v': 1}, {'v': 2}])
+
+        async def compute():
+            value = next(values)
+            if value['v'] == 1:
+                cache.invalidate(SESSIONS)
+            return value
+
+        first = await cache.respond(_request(), {CABINS, SESSIONS}, compute)
+        second = await cache.respond(_request(), {CABINS, SESSIONS}, compute)
+        assert first.body == b'{"v":1}'
+        assert second.body == b'{"v":2}'
+
+        cache.invalidate(CABINS)
+        assert cache.stats()['entries'] == 0
+
+    asyncio.run(scenario())
+
+def test_matching_etag_gets_not_modified():
+    async def scenario():
+        cache = ResponseCache()
+
+        async def compute():
+            return {'ok': True}
+
+        response = await cache.respond(_request(), {CABINS}, compute)
+        etag = response.headers['etag']
+        assert (await cache.respond(_request(if_none_match=etag), {CABINS}, compute)).status_code == 304
+        assert (await cache.respond(_request(if_none_match=f"W/{etag}"), {CABINS}, compute)).status_code == 304
+        assert (await cache.respond(_request(if_none_match='"other"'), {CABINS}, compute)).status_code == 200
+        assert cache.stats()['not_modified'] == 2
+
+    asyncio.run(scenario())
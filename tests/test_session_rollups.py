@@ -0,0 +1,132 @@
+"""
+Session rollups: record, rebuild parity, the in-memory window and cabin removal
+"""
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+import session_rollups as session_rollups_module
+from session_rollups import SessionRollups
+
+TODAY = date(2026, 10, 14)
+
+def _session(i, cabin_no, start, duration=600, created_at=None):
+    return {'_id': f"s{i}", 'cabin_no': cabin_no, 'start_time': start, 'duration': duration,
+            'created_at': created_at or datetime.now(timezone.utc)}
+
+def _at(day, hour):
+    return datetime(day.year, day.month, day.day, hour, tzinfo=timezone.utc)
+
+@pytest.fixture
+def rollups(memory_db, monkeypatch):
+    monkeypatch.setattr(session_rollups_module, 'db', memory_db)
+    monkeypatch.setattr(SessionRollups, '_today', lambda self: TODAY)
+    rollups = SessionRollups()
+    rollups.window_days = 3
+    rollups._reset()
+    return rollups
+
+def _state(rollups):
+    return rollups._hours, rollups._cabin_days, rollups._day_totals, rollups._hour_counts
+
+async def _stored(db):
+    return sorted((doc['_id'], doc['count'], doc['duration']) for doc in await db.session_rollups.find().to_list(None))
+
+def _sessions():
+    yesterday = TODAY - timedelta(days=1)
+    old = TODAY - timedelta(days=10)
+    return [_session(0, 1, _at(TODAY, 9)), _session(1, 1, _at(TODAY, 9) + timedelta(minutes=30), 1200),
+            _session(2, 2, _at(TODAY, 14), 300), _session(3, 1, _at(yesterday, 23), 900),
+            # Naive start times count as UTC
+            _session(4, 2, datetime(yesterday.year, yesterday.month, yesterday.day, 8), 60),
+            _session(5, 1, _at(old, 10), 3600), _session(6, 1, _at(old, 10), 60)]
+
+def test_recorded_sessions_match_a_rebuild(rollups, memory_db):
+    async def scenario():
+        for session in _sessions():
+            await memory_db.sessions.insert_one(session)
+            await rollups.record(session)
+        recorded, stored = _state(rollups), await _stored(memory_db)
+
+        rebuilt = SessionRollups()
+        rebuilt.window_days = 3
+        rebuilt._reset()
+        assert await rebuilt.rebuild() == 5
+        assert _state(rebuilt) == recorded
+        assert await _stored(memory_db) == stored
+
+        assert rollups.total_seconds(TODAY) == 2100
+        assert rollups.cabin_totals(TODAY - timedelta(days=1)) == {1: 2700, 2: 360}
+        assert rollups.hourly_counts(TODAY) == {9: 2, 14: 1}
+        # Days older than the window are only stored
+        assert (f"1_{(TODAY - timedelta(days=10)).isoformat()}_10", 2, 3660) in stored
+
+    asyncio.run(scenario())
+
+def test_window_rolls_past_midnight(rollups, monkeypatch):
+    async def scenario():
+        for session in _sessions():
+            await rollups.record(session)
+        oldest = TODAY - timedelta(days=2)
+        assert rollups.daily_seconds(oldest) == {oldest: 0, TODAY - timedelta(days=1): 960, TODAY: 2100}
+
+        tomorrow = TODAY + timedelta(days=1)
+        monkeypatch.setattr(SessionRollups, '_today', lambda self: tomorrow)
+        assert rollups.daily_seconds(oldest) == {TODAY - timedelta(days=1): 960, TODAY: 2100, tomorrow: 0}
+
+        # Two days on, yesterday's sessions left the window
+        monkeypatch.setattr(SessionRollups, '_today', lambda self: tomorrow + timedelta(days=1))
+        await rollups.record(_session(7, 2, _at(tomorrow, 7), 120))
+        assert rollups.cabin_totals(TODAY) == {1: 1800, 2: 420}
+        assert all(day >= TODAY for _, day, _ in rollups._hours)
+
+    asyncio.run(scenario())
+
+def test_record_during_rebuild_is_counted_once(rollups, memory_db, monkeypatch):
+    reading = asyncio.Event()
+    release = asyncio.Event()
+    aggregate = SessionRollups._aggregate
+
+    async def slow_aggregate(self, now):
+        rollups = await aggregate(self, now)
+        reading.set()
+        await release.wait()
+        return rollups
+
+    monkeypatch.setattr(SessionRollups, '_aggregate', slow_aggregate)
+
+    async def scenario():
+        before = _session(0, 1, _at(TODAY, 9), created_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+        await memory_db.sessions.insert_one(before)
+        rebuild = asyncio.create_task(rollups.rebuild())
+        await reading.wait()
+
+        # Created before the rebuild started: already in its result
+        waiting = asyncio.create_task(rollups.record(before))
+        # Created while the sessions were read: applied after the rebuild
+        after = _session(1, 1, _at(TODAY, 9), 300)
+        await memory_db.sessions.insert_one(after)
+        recorded = asyncio.create_task(rollups.record(after))
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(rebuild, waiting, recorded)
+
+        assert rollups._hours == {(1, TODAY, 9): [2, 900]}
+        assert await _stored(memory_db) == [(f"1_{TODAY.isoformat()}_09", 2, 900)]
+
+    asyncio.run(scenario())
+
+def test_remove_cabin_keeps_the_other_cabins(rollups, memory_db):
+    async def scenario():
+        for session in _sessions():
+            await rollups.record(session)
+        await rollups.remove_cabin(1)
+
+        assert rollups.cabin_totals(TODAY - timedelta(days=2)) == {2: 360}
+        assert rollups.total_seconds(TODAY) == 300
+        assert rollups.hourly_counts(TODAY) == {14: 1}
+        assert await memory_db.session_rollups.count_documents({'cabin_no': 1}) == 0
+        assert await memory_db.session_rollups.count_documents({}) == 2
+
+    asyncio.run(scenario())
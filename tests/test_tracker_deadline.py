@@ -0,0 +1,70 @@
+"""
+Tracker deadlines: a timed-out detection stays in flight and is not resubmitted
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import camera_detector
+from tracker_service import TrackerService
+
+CABIN = {'cabin_no': 1, 'camera_url': 'http://camera.test/capture', 'student_id': 's1', 'status': 'active'}
+
+@pytest.fixture
+def blocking_detector(monkeypatch):
+    """Detector whose analysis blocks until `release` is set"""
+    release = threading.Event()
+    calls = []
+
+    def analyze_cabin(cabin_no, camera_url, motion_engine=None):
+        calls.append(cabin_no)
+        release.wait(5)
+        return {'is_active': True, 'motion_detected': True, 'confidence': 1.0, 'brightness': 0.2}
+
+    monkeypatch.setattr(camera_detector.detector, 'analyze_cabin', analyze_cabin)
+    yield release, calls
+    release.set()
+
+def test_timed_out_cabin_is_skipped_until_its_detection_finishes(blocking_detector):
+    release, calls = blocking_detector
+    service = TrackerService()
+    service.cabin_timeout = 0.1
+    service.detection_mode = 'per_cabin'
+    service.detection_backend = 'thread'
+    service.fetch_mode = 'thread'
+    stored = []
+
+    async def apply_detection(cabin, result):
+        stored.append(result)
+        return cabin['status']
+
+    service._apply_detection = apply_detection
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        service._executor = ThreadPoolExecutor(max_workers=2)
+        service._semaphore = asyncio.Semaphore(2)
+        service._scheduler.sync([1], loop.time())
+        try:
+            await service._sweep([CABIN])
+            assert stored[-1]['error'] == 'Detection timed out'
+            assert service._in_flight == {1}
+
+            # Still running: skipped instead of queued behind it
+            await service._sweep([CABIN])
+            assert calls == [1]
+            assert len(stored) == 1
+            assert service._scheduler.next_due() > loop.time()
+
+            release.set()
+            while service._in_flight:
+                await asyncio.sleep(0.01)
+            await service._sweep([CABIN])
+            assert calls == [1, 1]
+            assert stored[-1]['is_active']
+        finally:
+            service._executor.shutdown(wait=True)
+
+    asyncio.run(scenario())